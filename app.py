@@ -1,18 +1,44 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, send_file
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, send_file, Response, abort
 from flask_sqlalchemy import SQLAlchemy
-from models import db, User, Employee, Process, Order, WorkLog, Payment, OrderStatus, Overage, WorkLogOverage
+from models import db, User, Employee, Process, Order, WorkLog, Payment, OrderStatus, Overage, WorkLogOverage, OrderProcessTotal
+from queries import (work_logs_with, overages_with, work_logs_for_order_process,
+                     parse_work_log_filters, work_log_page, parse_order_filters, order_page)
+from pagination import InvalidCursor, parse_page_size
+from payroll import month_bounds, get_monthly_payment, refresh_monthly_payments
+from payslips import (payslip_data, payslip_filename, render_payslip, start_batch_job, get_batch_job,
+                      batch_filename)
+from query_budget import init_query_budget
+from report_cache import init_report_cache, get_report_cache, report_data_version
+from order_totals import get_order_process_total, get_totals_for_orders, delete_totals
+from migrations import upgrade_database
+from overage_ledger import overage_units
+from overage_attribution import get_attributions
+from sqlite_profile import init_sqlite_profile, profile_report
+from backup_store import BackupStore
+from database_restore import hold_gate_until_closed, init_request_gate, restore_database
+from search_index import search_notes, SOURCES as SEARCH_SOURCES
+from order_search import order_search_index, DEFAULT_LIMIT as TYPEAHEAD_LIMIT, MAX_LIMIT as TYPEAHEAD_MAX_LIMIT
+from reference_api import RESOURCES, InvalidQuery, parse_query, conditional_response
+from order_progress import get_order_progress
+from dashboard_stats import dashboard_cache, get_dashboard_stats
+from work_log_batch import apply_work_log_batch, BatchError
+from exports import (WORK_LOG_COLUMNS, PAYROLL_COLUMNS, EXPORT_MIMETYPES, work_log_export_query,
+                     payroll_export_query, iter_export)
+# Registers the flush handlers that keep the daily rollups in step with work_logs
+import rollups
+from reports import (DIMENSIONS, MEASURES as REPORT_MEASURES, MAX_ROW_DIMENSIONS, ReportError,
+                     parse_report_params, pivot_cache, get_pivot)
+from production_board import broadcaster, board_snapshot
+from work_log_import import import_work_logs as run_work_log_import, format_from_filename, ImportFormatError
 import os
 import sys
-import shutil
 from datetime import datetime, date, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.datastructures import MultiDict
 from sqlalchemy import func, and_, inspect
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
 from io import BytesIO
+import multiprocessing
+import threading
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.urandom(24)
@@ -24,7 +50,8 @@ def _resolve_base_dir():
     return os.path.dirname(os.path.abspath(__file__))
 
 BASE_DIR = _resolve_base_dir()
-DATABASE_PATH = os.path.join(BASE_DIR, 'oleema.db')
+# OLEEMA_DATABASE_PATH points the app at another file (the tests use a temporary one)
+DATABASE_PATH = os.environ.get('OLEEMA_DATABASE_PATH') or os.path.join(BASE_DIR, 'oleema.db')
 INSTANCE_DB_PATH = os.path.join(BASE_DIR, 'instance', 'oleema.db')
 
 app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{DATABASE_PATH}"
@@ -33,90 +60,124 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 # Session timeout configuration (2 hours = 7200 seconds)
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=2)
 
+# Hold requests back while a restore swaps the database file (see database_restore.py)
+init_request_gate(app)
+
+@app.before_request
+def ensure_started():
+    """Run startup() on the first request when served by something other than `python app.py`"""
+    startup()
+
+# Opt-in per-request SQL statement budgets (see query_budget.py)
+app.config['QUERY_BUDGET_ENABLED'] = os.environ.get('OLEEMA_QUERY_BUDGET') == '1'
+init_query_budget(app)
+
+# Upper bound on processes used to render batch payslips (see payslips.py)
+app.config['PAYSLIP_MAX_WORKERS'] = int(os.environ.get('OLEEMA_PAYSLIP_WORKERS', 4))
+
+# Rendered payment-report PDFs (see report_cache.py)
+app.config['REPORT_CACHE_MEMORY_MB'] = int(os.environ.get('OLEEMA_REPORT_CACHE_MEMORY_MB', 32))
+app.config['REPORT_CACHE_DISK_MB'] = int(os.environ.get('OLEEMA_REPORT_CACHE_DISK_MB', 256))
+
+# Seconds the dashboard counters may be served from memory (see dashboard_stats.py)
+app.config['DASHBOARD_CACHE_TTL'] = int(os.environ.get('OLEEMA_DASHBOARD_CACHE_TTL', 30))
+dashboard_cache.ttl = app.config['DASHBOARD_CACHE_TTL']
+
+# Seconds a finished pivot report may be served from memory (see reports.py)
+app.config['REPORTS_CACHE_TTL'] = int(os.environ.get('OLEEMA_REPORTS_CACHE_TTL', 300))
+pivot_cache.ttl = app.config['REPORTS_CACHE_TTL']
+
 # Initialize database
 db.init_app(app)
 
-# Ensure database exists and is initialized (first run handling)
-with app.app_context():
-    try:
-        # Ensure containing directory exists
-        os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
-    except Exception:
-        pass
-    try:
-        existing_tables = set(inspect(db.engine).get_table_names())
-        if 'users' not in existing_tables:
-            db.create_all()
-            # Seed default admin
-            if not User.query.first():
-                admin_user = User(username='admin', role='admin')
-                admin_user.set_password('admin123')
-                db.session.add(admin_user)
-            # Seed sample processes
-            if not Process.query.first():
-                processes = [
-                    Process(name='Cutting', pay_rate=5.0, description='Fabric cutting process'),
-                    Process(name='Sewing', pay_rate=8.0, description='Garment sewing process'),
-                    Process(name='Finishing', pay_rate=3.0, description='Final finishing process'),
-                    Process(name='Quality Check', pay_rate=4.0, description='Quality control process'),
-                ]
-                db.session.add_all(processes)
+def init_database():
+    """Ensure database exists and is initialized (first run handling)"""
+    with app.app_context():
+        try:
+            # Ensure containing directory exists
+            os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
+        except Exception:
+            pass
+        try:
+            first_run = 'users' not in inspect(db.engine).get_table_names()
+            # Create a new database or apply pending schema migrations (see migrations.py)
+            upgrade_database()
+            if first_run:
+                # Seed default admin
+                if not User.query.first():
+                    admin_user = User(username='admin', role='admin')
+                    admin_user.set_password('admin123')
+                    db.session.add(admin_user)
+                # Seed sample processes
+                if not Process.query.first():
+                    processes = [
+                        Process(name='Cutting', pay_rate=5.0, description='Fabric cutting process'),
+                        Process(name='Sewing', pay_rate=8.0, description='Garment sewing process'),
+                        Process(name='Finishing', pay_rate=3.0, description='Final finishing process'),
+                        Process(name='Quality Check', pay_rate=4.0, description='Quality control process'),
+                    ]
+                    db.session.add_all(processes)
             db.session.commit()
-    except Exception as e:
-        print(f"Database initialization check failed: {e}")
+        except Exception as e:
+            print(f"Database initialization check failed: {e}")
+
+_startup_lock = threading.Lock()
+_started = False
+
+def startup(upgrade=True):
+    """
+    Per-process setup: connection pragmas, the report cache and (unless
+    upgrade=False) creating or migrating the database. Called by
+    `python app.py` and the scripts rather than on import, because payslip
+    worker processes re-import the main module and must not repeat it.
+    """
+    global _started
+    with _startup_lock:
+        if _started:
+            return
+        # Connection pragmas (WAL, busy timeout, foreign keys, ...); see sqlite_profile.py
+        with app.app_context():
+            init_sqlite_profile(app, db, DATABASE_PATH)
+        init_report_cache(app, BASE_DIR)
+        if upgrade:
+            init_database()
+        _started = True
 
 # Create backup directory if it doesn't exist
 BACKUP_DIR = os.path.join(BASE_DIR, 'backups')
 if not os.path.exists(BACKUP_DIR):
     os.makedirs(BACKUP_DIR)
 
+# Deduplicated, compressed snapshots with GFS retention (see backup_store.py)
+app.config['BACKUP_RETENTION'] = {'recent_hours': 24, 'daily': 7, 'weekly': 5, 'monthly': 12}
+# Plain file copies made by earlier versions are brought in with import_legacy_backups.py
+backup_store = BackupStore(BACKUP_DIR, app.config['BACKUP_RETENTION'])
+
 def create_backup():
-    """Create a backup of the database"""
+    """Snapshot the database into the backup store; returns (success, catalog entry or error)"""
     try:
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_filename = f'oleema_backup_{timestamp}.db'
-        backup_path = os.path.join(BACKUP_DIR, backup_filename)
-        
-        # Copy the database file
-        shutil.copy2(DATABASE_PATH, backup_path)
+        snapshot = backup_store.take_snapshot(DATABASE_PATH)
         
-        # Keep only last 7 days of backups
+        # Thin out old snapshots (daily/weekly/monthly)
         cleanup_old_backups()
         
-        return True, backup_path
+        return True, snapshot
     except Exception as e:
         return False, str(e)
 
 def cleanup_old_backups():
-    """Remove backups older than 7 days"""
+    """Apply the grandfather-father-son retention policy"""
     try:
-        current_time = datetime.now()
-        for filename in os.listdir(BACKUP_DIR):
-            if filename.startswith('oleema_backup_') and filename.endswith('.db'):
-                file_path = os.path.join(BACKUP_DIR, filename)
-                file_time = datetime.fromtimestamp(os.path.getctime(file_path))
-                if (current_time - file_time).days > 7:
-                    os.remove(file_path)
+        backup_store.apply_retention()
     except Exception as e:
         print(f"Error cleaning up old backups: {e}")
 
 def get_last_backup_info():
-    """Get information about the last backup"""
-    try:
-        backups = []
-        for filename in os.listdir(BACKUP_DIR):
-            if filename.startswith('oleema_backup_') and filename.endswith('.db'):
-                file_path = os.path.join(BACKUP_DIR, filename)
-                file_time = datetime.fromtimestamp(os.path.getctime(file_path))
-                backups.append((file_time, file_path))
-        
-        if backups:
-            latest_backup = max(backups, key=lambda x: x[0])
-            return latest_backup[0], latest_backup[1]
-        return None, None
-    except Exception as e:
-        print(f"Error getting backup info: {e}")
-        return None, None
+    """Get information about the last backup (time, snapshot id)"""
+    latest = backup_store.latest_snapshot()
+    if latest:
+        return latest['created_at'], latest['id']
+    return None, None
 
 def check_session_timeout():
     """Check if session has timed out"""
@@ -174,25 +235,10 @@ def dashboard():
     if not session.get('logged_in'):
         return redirect(url_for('login'))
     
-    # Get dashboard statistics
-    total_employees = Employee.query.filter_by(is_active=True).count()
-    total_orders = Order.query.count()
-    pending_orders = Order.query.filter_by(status='pending').count()
-    completed_orders = Order.query.filter_by(status='completed').count()
+    # Counters and recent items, from memory unless something changed (see dashboard_stats.py)
+    stats = get_dashboard_stats()
     
-    # Recent orders
-    recent_orders = Order.query.order_by(Order.created_at.desc()).limit(5).all()
-    
-    # Recent work logs
-    recent_work_logs = WorkLog.query.order_by(WorkLog.created_at.desc()).limit(5).all()
-    
-    return render_template('pages/dashboard.html',
-                         total_employees=total_employees,
-                         total_orders=total_orders,
-                         pending_orders=pending_orders,
-                         completed_orders=completed_orders,
-                         recent_orders=recent_orders,
-                         recent_work_logs=recent_work_logs)
+    return render_template('pages/dashboard.html', **stats)
 
 @app.route('/employees')
 def employees():
@@ -298,12 +344,51 @@ def new_order():
 
 @app.route('/orders')
 def orders():
-    """View all orders"""
+    """View orders, one keyset page at a time"""
     if not session.get('logged_in'):
         return redirect(url_for('login'))
     
-    orders = Order.query.order_by(Order.created_at.desc()).all()
-    return render_template('pages/orders.html', orders=orders)
+    filters = parse_order_filters(request.args)
+    try:
+        page = order_page(filters, request.args.get('cursor'), parse_page_size(request.args.get('limit')))
+    except InvalidCursor:
+        flash('That page link is no longer valid. Showing the newest orders.', 'warning')
+        page = order_page(filters)
+    
+    return render_template('pages/orders.html',
+                         orders=page.items,
+                         next_cursor=page.next_cursor)
+
+@app.route('/api/orders/list')
+def api_order_list():
+    """API endpoint for the next page of orders (infinite scroll)"""
+    if not session.get('logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    filters = parse_order_filters(request.args)
+    try:
+        page = order_page(filters, request.args.get('cursor'), parse_page_size(request.args.get('limit')))
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'items': [{
+            'id': order.id,
+            'order_no': order.order_no,
+            'date': order.date.isoformat(),
+            'color': order.color,
+            'size': order.size,
+            'quantity': order.quantity,
+            'status': order.status,
+            'notes': order.notes,
+            'created_at': order.created_at.isoformat() if order.created_at else None
+        } for order in page.items],
+        'next_cursor': page.next_cursor,
+        'html': render_template('components/order_cards.html', orders=page.items)
+    })
+
+# Work logs listed on the order page
+ORDER_WORK_LOGS_SHOWN = 50
 
 @app.route('/orders/<int:order_id>')
 def view_order(order_id):
@@ -312,36 +397,23 @@ def view_order(order_id):
         return redirect(url_for('login'))
     
     order = Order.query.get_or_404(order_id)
-    work_logs = WorkLog.query.filter_by(order_id=order_id).all()
     
-    # Calculate totals
-    total_processed = sum(wl.quantity for wl in work_logs)
-    total_payment = sum(wl.quantity * wl.process.pay_rate for wl in work_logs)
+    # Totals, labour cost and per-process completion from one grouped query (cached per order)
+    progress = get_order_progress(order)
     
-    # Calculate progress per process
-    processes = Process.query.filter_by(is_active=True).all()
-    process_progress = {}
-    
-    for process in processes:
-        process_work_logs = [wl for wl in work_logs if wl.process_id == process.id]
-        process_total = sum(wl.quantity for wl in process_work_logs)
-        process_completion = min(process_total / order.quantity * 100, 100) if order.quantity > 0 else 0
-        process_progress[process.name] = {
-            'total': process_total,
-            'completion': process_completion
-        }
-    
-    # Overall progress (average of all processes that have work)
-    active_processes = [p for p in process_progress.values() if p['total'] > 0]
-    overall_progress = sum(p['completion'] for p in active_processes) / len(active_processes) if active_processes else 0
+    # Only the latest work logs are listed; the rest are on the work logs page
+    work_logs = work_logs_with('employee', 'process').filter_by(order_id=order_id).order_by(
+        WorkLog.date.desc(), WorkLog.id.desc()
+    ).limit(ORDER_WORK_LOGS_SHOWN).all()
     
     return render_template('pages/view_order.html', 
                          order=order, 
                          work_logs=work_logs,
-                         total_processed=total_processed,
-                         total_payment=total_payment,
-                         progress_percent=overall_progress,
-                         process_progress=process_progress)
+                         work_log_count=progress['log_count'],
+                         total_processed=progress['total_processed'],
+                         total_payment=progress['total_payment'],
+                         progress_percent=progress['progress_percent'],
+                         process_progress=progress['process_progress'])
 
 @app.route('/api/orders')
 def api_orders():
@@ -349,14 +421,142 @@ def api_orders():
     if not session.get('logged_in'):
         return jsonify({'error': 'Unauthorized'}), 401
     
-    orders = Order.query.filter(Order.status.in_(['pending', 'in_progress'])).all()
-    return jsonify([{
-        'id': order.id,
-        'order_no': order.order_no,
-        'color': order.color,
-        'size': order.size,
-        'quantity': order.quantity
-    } for order in orders])
+    return conditional_response('orders', ['id', 'order_no', 'color', 'size', 'quantity'],
+                                {'status': ['in_progress', 'pending']})
+
+@app.route('/api/v1/<resource>')
+def api_reference_data(resource):
+    """Read-only orders, processes and employees with ?fields= and filters, answered 304 when unchanged"""
+    if not session.get('logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    if resource not in RESOURCES:
+        return jsonify({'error': f"Unknown resource '{resource}'"}), 404
+    try:
+        fields, filters = parse_query(RESOURCES[resource], request.args)
+    except InvalidQuery as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return conditional_response(resource, fields, filters)
+
+def _search_request():
+    """(query, kinds, page, hits, has_more) for /search and /api/search"""
+    query = request.args.get('q', '').strip()
+    kinds = [kind for kind in request.args.getlist('kind') if kind in {source.kind for source in SEARCH_SOURCES}]
+    page = max(request.args.get('page', 1, type=int), 1)
+    hits, has_more = search_notes(query, kinds, page) if query else ([], False)
+    return query, kinds, page, hits, has_more
+
+@app.route('/search')
+def search():
+    """Full-text search over order, work log and overage notes"""
+    if not session.get('logged_in'):
+        return redirect(url_for('login'))
+    
+    query, kinds, page, hits, has_more = _search_request()
+    return render_template('pages/search.html',
+                         query=query,
+                         kinds=kinds,
+                         page=page,
+                         hits=hits,
+                         has_more=has_more)
+
+@app.route('/api/search')
+def api_search():
+    """Ranked full-text search results as JSON"""
+    if not session.get('logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    query, kinds, page, hits, has_more = _search_request()
+    return jsonify({
+        'query': query,
+        'page': page,
+        'has_more': has_more,
+        'results': [{
+            'kind': hit.kind,
+            'id': hit.id,
+            'title': hit.title,
+            'subtitle': hit.subtitle,
+            'snippet': str(hit.snippet),
+            'url': url_for(hit.url_args[0], **hit.url_args[1])
+        } for hit in hits]
+    })
+
+@app.route('/reports')
+def reports():
+    """Pivot reports over the daily production rollups"""
+    if not session.get('logged_in'):
+        return redirect(url_for('login'))
+    
+    wants_json = request.args.get('format') == 'json'
+    pivot = cached = None
+    try:
+        params = parse_report_params(request.args)
+        # The bare page shows the form; a submitted form (or JSON) runs the report
+        if 'rows' in request.args or wants_json:
+            pivot, cached = get_pivot(params)
+    except ReportError as e:
+        if wants_json:
+            return jsonify({'error': str(e)}), 400
+        flash(str(e), 'error')
+        params = parse_report_params(MultiDict())
+    
+    if wants_json:
+        return jsonify(_pivot_json(pivot, cached))
+    
+    return render_template('pages/reports.html',
+                         params=params,
+                         pivot=pivot,
+                         cached=cached,
+                         dimensions=DIMENSIONS,
+                         measures=REPORT_MEASURES,
+                         max_row_dimensions=MAX_ROW_DIMENSIONS)
+
+def _pivot_json(pivot, cached):
+    params = pivot.params
+    return {
+        'rows': list(params.rows),
+        'column': params.column,
+        'measures': list(params.measures),
+        'date_from': params.date_from.isoformat(),
+        'date_to': params.date_to.isoformat(),
+        'columns': [{'key': key, 'label': label} for key, label in pivot.columns],
+        'data': [{
+            'labels': list(labels),
+            'cells': [{'column': key, **values} for key, values in by_column.items()],
+            'total': row_total
+        } for labels, by_column, row_total in pivot.rows],
+        'total': pivot.total,
+        'truncated': pivot.truncated,
+        'sources': pivot.sources,
+        'cached': cached,
+        'elapsed_ms': round(pivot.elapsed * 1000, 1)
+    }
+
+@app.route('/production')
+def production():
+    """Live production board for wall screens"""
+    if not session.get('logged_in'):
+        return redirect(url_for('login'))
+    
+    return render_template('pages/production.html')
+
+@app.route('/production/stream')
+def production_stream():
+    """Server-Sent Events: a snapshot, then deltas as work logs, orders and overages commit"""
+    if not session.get('logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    # Subscribe before reading the snapshot so nothing committed in between is missed
+    subscription = broadcaster.subscribe()
+    try:
+        snapshot = board_snapshot()
+    except Exception:
+        broadcaster.unsubscribe(subscription)
+        raise
+    return Response(broadcaster.stream(subscription, snapshot),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/api/check-order-number/<order_no>')
 def check_order_number(order_no):
@@ -364,14 +564,26 @@ def check_order_number(order_no):
     if not session.get('logged_in'):
         return jsonify({'error': 'Unauthorized'}), 401
     
-    existing = Order.query.filter_by(order_no=order_no).first()
-    return jsonify({'exists': existing is not None})
+    # Answered from the in-memory order index (see order_search.py)
+    return jsonify({'exists': order_search_index.exists(order_no)})
+
+@app.route('/api/orders/typeahead')
+def order_typeahead():
+    """Top matches for ?q= over order number, color and size (?open=1 for pending/in-progress only)"""
+    if not session.get('logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    limit = min(max(request.args.get('limit', TYPEAHEAD_LIMIT, type=int), 1), TYPEAHEAD_MAX_LIMIT)
+    matches = order_search_index.search(request.args.get('q', ''), limit,
+                                        open_only=request.args.get('open') == '1')
+    return jsonify({'matches': matches})
 
 def cleanup_overages_for_order(order_id):
     """Clean up overages for a deleted order"""
     try:
         overages = Overage.query.filter_by(order_id=order_id).all()
         for overage in overages:
+            WorkLogOverage.query.filter_by(overage_id=overage.id).delete(synchronize_session=False)
             db.session.delete(overage)
         print(f"Cleaned up {len(overages)} overages for order {order_id}")
         return True
@@ -396,6 +608,7 @@ def cleanup_overages_for_process(process_id):
     try:
         overages = Overage.query.filter_by(process_id=process_id).all()
         for overage in overages:
+            WorkLogOverage.query.filter_by(overage_id=overage.id).delete(synchronize_session=False)
             db.session.delete(overage)
         print(f"Cleaned up {len(overages)} overages for process {process_id}")
         return True
@@ -403,64 +616,6 @@ def cleanup_overages_for_process(process_id):
         print(f"Error cleaning up overages for process {process_id}: {e}")
         return False
 
-def check_and_create_overage(order_id, process_id, new_quantity):
-    """Check if adding new work log creates an overage and handle it"""
-    try:
-        # Validate inputs
-        if not order_id or not process_id or not new_quantity:
-            return False, "Invalid input parameters"
-        
-        order = Order.query.get(order_id)
-        process = Process.query.get(process_id)
-        
-        if not order or not process:
-            return False, "Order or process not found"
-        
-        # Calculate current total for this process
-        existing_work_logs = WorkLog.query.filter_by(
-            order_id=order_id, 
-            process_id=process_id
-        ).all()
-        
-        current_total = sum(wl.quantity for wl in existing_work_logs)
-        new_total = current_total + new_quantity
-        
-        # Check if this creates an overage
-        if new_total > order.quantity:
-            overage_units = new_total - order.quantity
-            
-            # Check if overage already exists for this order/process
-            existing_overage = Overage.query.filter_by(
-                order_id=order_id,
-                process_id=process_id,
-                status='pending'
-            ).first()
-            
-            if existing_overage:
-                # Update existing overage
-                existing_overage.actual_units = new_total
-                existing_overage.overage_units = overage_units
-            else:
-                # Create new overage
-                overage = Overage(
-                    order_id=order_id,
-                    process_id=process_id,
-                    expected_units=order.quantity,
-                    actual_units=new_total,
-                    overage_units=overage_units
-                )
-                db.session.add(overage)
-            
-            db.session.commit()
-            return True, f"Overage detected: {overage_units} units over limit"
-        
-        return False, "No overage"
-        
-    except Exception as e:
-        print(f"Error in check_and_create_overage: {e}")
-        db.session.rollback()
-        return False, f"Error creating overage: {str(e)}"
-
 @app.route('/overages')
 def overages():
     """Overage dashboard page"""
@@ -468,11 +623,11 @@ def overages():
         return redirect(url_for('login'))
     
     # Get all pending overages
-    pending_overages = Overage.query.filter_by(status='pending').all()
+    pending_overages = overages_with('order', 'process').filter_by(status='pending').all()
     
     # Get resolved overages from last 30 days
     thirty_days_ago = datetime.now() - timedelta(days=30)
-    resolved_overages = Overage.query.filter(
+    resolved_overages = overages_with('order', 'process', 'resolver').filter(
         and_(
             Overage.status == 'resolved',
             Overage.resolved_at >= thirty_days_ago
@@ -492,20 +647,19 @@ def overage_detail(overage_id):
     overage = Overage.query.get_or_404(overage_id)
     
     # Get all work logs for this order/process with employee and process info
-    work_logs = WorkLog.query.filter_by(
-        order_id=overage.order_id,
-        process_id=overage.process_id
-    ).join(Employee).join(Process).order_by(WorkLog.date.desc()).all()
+    work_logs = work_logs_for_order_process(overage.order_id, overage.process_id).all()
+    
+    # Units each work log contributed to the overage (FIFO, see overage_attribution.py)
+    attributions = get_attributions(overage.id)
     
     # Debug: Print work logs info
     print(f"Overage Detail - Order: {overage.order_id}, Process: {overage.process_id}")
-    print(f"Found {len(work_logs)} work logs:")
-    for wl in work_logs:
-        print(f"  - {wl.employee.name}: {wl.quantity} units on {wl.date}")
+    print(f"Found {len(work_logs)} work logs, {len(attributions)} contributing to the overage")
     
     return render_template('pages/overage_detail.html', 
                          overage=overage,
-                         work_logs=work_logs)
+                         work_logs=work_logs,
+                         attributions=attributions)
 
 @app.route('/overages/<int:overage_id>/resolve', methods=['POST'])
 def resolve_overage(overage_id):
@@ -562,10 +716,24 @@ def work_log():
             print("Validation failed - missing required fields")
             flash('Please fill in all required fields', 'error')
         else:
-            # Check for overage before creating work log
-            has_overage, overage_message = check_and_create_overage(order_id, process_id, quantity)
+            work_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+            work_log = WorkLog(
+                employee_id=employee_id,
+                order_id=order_id,
+                process_id=process_id,
+                quantity=quantity,
+                date=work_date,
+                notes=notes
+            )
+            db.session.add(work_log)
             
-            if has_overage:
+            # Insert first, then check the running total in the same transaction
+            # (see overage_ledger.py); over the limit goes to approval instead
+            db.session.flush()
+            excess = overage_units(order_id, process_id)
+            if excess:
+                db.session.rollback()
+                overage_message = f"Overage detected: {excess} units over limit"
                 # Store work log data in session for approval
                 session['pending_work_log'] = {
                     'employee_id': employee_id,
@@ -579,18 +747,6 @@ def work_log():
                 flash(f'Overage detected! {overage_message} Please review and approve.', 'warning')
                 return redirect(url_for('approve_overage'))
             
-            # No overage, proceed normally
-            work_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-            work_log = WorkLog(
-                employee_id=employee_id,
-                order_id=order_id,
-                process_id=process_id,
-                quantity=quantity,
-                date=work_date,
-                notes=notes
-            )
-            db.session.add(work_log)
-            
             # Update order status to 'in_progress' if this is the first work log
             order = Order.query.get(order_id)
             if order and order.status == 'pending':
@@ -608,17 +764,14 @@ def work_log():
     processes = Process.query.filter_by(is_active=True).all()
     
     # Get recent work logs for display
-    recent_work_logs = WorkLog.query.order_by(WorkLog.date.desc()).limit(10).all()
-    
-    # Calculate current totals for each order/process combination
-    order_process_totals = {}
-    for order in orders:
-        for process in processes:
-            total = db.session.query(func.sum(WorkLog.quantity)).filter_by(
-                order_id=order.id, 
-                process_id=process.id
-            ).scalar() or 0
-            order_process_totals[f"{order.id}-{process.id}"] = total
+    recent_work_logs = work_logs_with('employee', 'order', 'process').order_by(WorkLog.date.desc()).limit(10).all()
+    
+    # Current totals for each order/process combination
+    totals = get_totals_for_orders(order.id for order in orders)
+    order_process_totals = {
+        f"{order_id}-{process_id}": total
+        for (order_id, process_id), total in totals.items()
+    }
     
     return render_template('pages/work_log.html',
                          employees=employees,
@@ -689,14 +842,122 @@ def approve_overage():
                          process=process,
                          employee=employee)
 
+# Rows shown in the import error table; the JSON response lists all of them
+IMPORT_ERRORS_SHOWN = 200
+
+@app.route('/work-logs/import', methods=['GET', 'POST'])
+def import_work_logs():
+    """Bulk import work logs from a CSV or JSON file"""
+    if not session.get('logged_in'):
+        return redirect(url_for('login'))
+    
+    report = None
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash('Please choose a CSV or JSON file to import', 'error')
+            return redirect(url_for('import_work_logs'))
+        
+        file_format = request.form.get('format') or format_from_filename(upload.filename)
+        dry_run = bool(request.form.get('dry_run'))
+        try:
+            report = run_work_log_import(upload.stream, file_format, dry_run=dry_run)
+        except (ImportFormatError, UnicodeDecodeError) as e:
+            flash(f'Could not read {upload.filename}: {e}', 'error')
+            return redirect(url_for('import_work_logs'))
+        
+        if request.args.get('format') == 'json' or request.accept_mimetypes.best == 'application/json':
+            return jsonify(report.to_dict())
+        
+        if dry_run:
+            flash(f'Dry run: {report.imported} of {report.rows_read} rows would be imported, '
+                  f'{len(report.errors)} rows have errors. Nothing was saved.', 'info')
+        elif report.imported:
+            flash(f'Imported {report.imported} of {report.rows_read} work logs in {report.duration:.1f}s.', 'success')
+        else:
+            flash('No work logs were imported.', 'error')
+    
+    return render_template('pages/import_work_logs.html',
+                         report=report.to_dict(IMPORT_ERRORS_SHOWN) if report else None)
+
 @app.route('/work-logs')
 def work_logs():
-    """View all work logs"""
+    """View work logs, one keyset page at a time"""
     if not session.get('logged_in'):
         return redirect(url_for('login'))
     
-    work_logs = WorkLog.query.order_by(WorkLog.date.desc()).all()
-    return render_template('pages/work_logs.html', work_logs=work_logs)
+    filters = parse_work_log_filters(request.args)
+    try:
+        page = work_log_page(filters, request.args.get('cursor'), parse_page_size(request.args.get('limit')))
+    except InvalidCursor:
+        flash('That page link is no longer valid. Showing the newest work logs.', 'warning')
+        page = work_log_page(filters)
+    
+    # Data for the filter dropdowns
+    employees = Employee.query.order_by(Employee.name).all()
+    orders = Order.query.filter(Order.status.in_(['pending', 'in_progress'])).order_by(Order.order_no).all()
+    processes = Process.query.filter_by(is_active=True).all()
+    
+    return render_template('pages/work_logs.html',
+                         work_logs=page.items,
+                         next_cursor=page.next_cursor,
+                         employees=employees,
+                         orders=orders,
+                         processes=processes)
+
+@app.route('/api/work-logs')
+def api_work_logs():
+    """API endpoint for the next page of work logs (infinite scroll)"""
+    if not session.get('logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    filters = parse_work_log_filters(request.args)
+    try:
+        page = work_log_page(filters, request.args.get('cursor'), parse_page_size(request.args.get('limit')))
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'items': [{
+            'id': wl.id,
+            'date': wl.date.isoformat(),
+            'employee': {'id': wl.employee.id, 'name': wl.employee.name},
+            'order': {'id': wl.order.id, 'order_no': wl.order.order_no},
+            'process': {'id': wl.process.id, 'name': wl.process.name, 'pay_rate': wl.process.pay_rate},
+            'quantity': wl.quantity,
+            'hours_worked': wl.hours_worked,
+            'notes': wl.notes,
+            'payment': wl.quantity * wl.process.pay_rate
+        } for wl in page.items],
+        'next_cursor': page.next_cursor,
+        'html': render_template('components/work_log_cards.html', work_logs=page.items)
+    })
+
+@app.route('/api/work-logs/batch', methods=['POST'])
+def api_work_logs_batch():
+    """Create many work logs in one transaction (shop-floor grid entry)
+    
+    Body: {"rows": [{employee_id, order_id, process_id, quantity, date,
+    hours_worked?, notes?, approve?}, ...], "approve_overages": false,
+    "dry_run": false} or just the list of rows.
+    """
+    if not session.get('logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    payload = request.get_json(silent=True)
+    if isinstance(payload, list):
+        payload = {'rows': payload}
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Expected a JSON object with a rows list'}), 400
+    
+    try:
+        result = apply_work_log_batch(payload.get('rows'),
+                                      approve_all=payload.get('approve_overages') is True,
+                                      dry_run=payload.get('dry_run') is True)
+    except BatchError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(result)
 
 @app.route('/work-logs/<int:work_log_id>/edit', methods=['GET', 'POST'])
 def edit_work_log(work_log_id):
@@ -723,23 +984,6 @@ def edit_work_log(work_log_id):
             print("Validation failed - missing required fields")
             flash('Please fill in all required fields', 'error')
         else:
-            # Calculate current total excluding this work log
-            current_total = db.session.query(func.sum(WorkLog.quantity)).filter(
-                and_(
-                    WorkLog.order_id == order_id,
-                    WorkLog.process_id == process_id,
-                    WorkLog.id != work_log_id
-                )
-            ).scalar() or 0
-            
-            new_total = current_total + quantity
-            order = Order.query.get(order_id)
-            
-            # Check for overage
-            if new_total > order.quantity:
-                overage_units = new_total - order.quantity
-                flash(f'Warning: This will create an overage of {overage_units} units. The work log will still be updated.', 'warning')
-            
             work_date = datetime.strptime(date_str, '%Y-%m-%d').date()
             
             # Update work log
@@ -750,6 +994,12 @@ def edit_work_log(work_log_id):
             work_log.date = work_date
             work_log.notes = notes
             
+            # The flush updates totals and the pending overages of the old and new order/process
+            db.session.flush()
+            excess = overage_units(order_id, process_id)
+            if excess:
+                flash(f'Warning: This creates an overage of {excess} units. The work log was still updated.', 'warning')
+            
             db.session.commit()
             print(f"Work log updated successfully: {work_log.id}")
             flash('Work log updated successfully!', 'success')
@@ -761,13 +1011,7 @@ def edit_work_log(work_log_id):
     processes = Process.query.filter_by(is_active=True).all()
     
     # Calculate current total excluding this work log
-    current_total = db.session.query(func.sum(WorkLog.quantity)).filter(
-        and_(
-            WorkLog.order_id == work_log.order_id,
-            WorkLog.process_id == work_log.process_id,
-            WorkLog.id != work_log_id
-        )
-    ).scalar() or 0
+    current_total = get_order_process_total(work_log.order_id, work_log.process_id) - work_log.quantity
     
     return render_template('pages/edit_work_log.html', 
                          work_log=work_log,
@@ -786,6 +1030,9 @@ def delete_work_log(work_log_id):
     
     print(f"Deleting work log {work_log_id}: {work_log.employee.name} - {work_log.order.order_no} - {work_log.process.name}")
     
+    # Foreign keys are enforced, so overage attributions go first; the flush
+    # retires the pending overage if the order/process is back within its quantity
+    WorkLogOverage.query.filter_by(work_log_id=work_log_id).delete(synchronize_session=False)
     db.session.delete(work_log)
     db.session.commit()
     
@@ -813,6 +1060,12 @@ def delete_order(order_id):
             # Clean up overages first
             cleanup_overages_for_order(order_id)
         
+        # Drop the (now zero) running totals for this order
+        delete_totals(order_id=order_id)
+        
+        # Status history rows reference the order
+        OrderStatus.query.filter_by(order_id=order_id).delete(synchronize_session=False)
+        
         print(f"Deleting order {order_id}: {order.order_no}")
         
         db.session.delete(order)
@@ -883,6 +1136,9 @@ def delete_process(process_id):
             # Clean up overages first
             cleanup_overages_for_process(process_id)
         
+        # Drop the (now zero) running totals for this process
+        delete_totals(process_id=process_id)
+        
         print(f"Deleting process {process_id}: {process.name}")
         
         db.session.delete(process)
@@ -950,15 +1206,6 @@ def payment_report():
                 return render_template('pages/payment_report.html',
                                      employees=employees,
                                      report_data=report_data)
-            # Calculate payment report
-            work_logs = WorkLog.query.filter(
-                and_(
-                    WorkLog.employee_id == employee_id,
-                    func.extract('month', WorkLog.date) == month,
-                    func.extract('year', WorkLog.date) == year
-                )
-            ).all()
-            
             # Check if employee exists
             employee = Employee.query.get(employee_id)
             if not employee:
@@ -967,14 +1214,19 @@ def payment_report():
                                      employees=employees,
                                      report_data=report_data)
             
-            total_quantity = sum(wl.quantity for wl in work_logs)
+            # Totals come from the payments table, recomputed only if stale
+            payment = get_monthly_payment(employee_id, month, year)
+            db.session.commit()
+            
+            start, end = month_bounds(month, year)
+            work_logs = work_logs_with('order', 'process').filter(
+                WorkLog.employee_id == employee_id,
+                WorkLog.date >= start,
+                WorkLog.date < end
+            ).order_by(WorkLog.date, WorkLog.id).all()
             
-            # Calculate total payment based on process pay rates (piece rate)
-            total_payment = 0
-            for wl in work_logs:
-                process = Process.query.get(wl.process_id)
-                if process:
-                    total_payment += wl.quantity * process.pay_rate
+            total_quantity = payment.total_quantity if payment else 0
+            total_payment = payment.total_payment if payment else 0
             
             report_data = {
                 'employee': employee,
@@ -982,6 +1234,7 @@ def payment_report():
                 'year': year,
                 'work_logs': work_logs,
                 'total_quantity': total_quantity,
+                'total_hours': payment.total_hours if payment else 0,
                 'total_payment': total_payment
             }
             
@@ -1022,125 +1275,47 @@ def download_payment_report_pdf():
             flash('Employee not found', 'error')
             return redirect(url_for('payment_report'))
         
-        # Get work logs
-        work_logs = WorkLog.query.filter(
-            and_(
-                WorkLog.employee_id == employee_id,
-                func.extract('month', WorkLog.date) == month,
-                func.extract('year', WorkLog.date) == year
+        # Totals come from the payments table, recomputed only if stale
+        payment = get_monthly_payment(employee_id, month, year)
+        db.session.commit()
+        total_quantity = payment.total_quantity if payment else 0
+        total_payment = payment.total_payment if payment else 0
+        
+        # Serve the cached PDF if nothing on the report changed since it was rendered
+        cache = get_report_cache()
+        cache_key = cache.key(employee_id, month, year, report_data_version(employee_id, month, year))
+        filename = payslip_filename(employee.employee_id, month, year)
+        pdf = cache.get(cache_key)
+        if pdf is not None:
+            return send_file(
+                BytesIO(pdf),
+                as_attachment=True,
+                download_name=filename,
+                mimetype='application/pdf'
             )
-        ).all()
         
-        # Calculate totals
-        total_quantity = sum(wl.quantity for wl in work_logs)
-        total_payment = 0
-        for wl in work_logs:
-            process = Process.query.get(wl.process_id)
-            if process:
-                total_payment += wl.quantity * process.pay_rate
+        # Get work logs
+        start, end = month_bounds(month, year)
+        work_logs = work_logs_with('order', 'process').filter(
+            WorkLog.employee_id == employee_id,
+            WorkLog.date >= start,
+            WorkLog.date < end
+        ).order_by(WorkLog.date, WorkLog.id).all()
         
         # Generate PDF
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        story = []
-        
-        # Get styles
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            spaceAfter=30,
-            alignment=1  # Center alignment
-        )
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=14,
-            spaceAfter=20
-        )
-        normal_style = styles['Normal']
-        
-        # Add title
-        story.append(Paragraph("OLEEMA - Payment Report", title_style))
-        story.append(Spacer(1, 20))
-        
-        # Add employee info
-        story.append(Paragraph(f"Employee: {employee.name} ({employee.employee_id})", heading_style))
-        story.append(Paragraph(f"Period: {month}/{year}", normal_style))
-        story.append(Spacer(1, 20))
-        
-        # Add summary
-        summary_data = [
-            ['Total Pieces', str(total_quantity)],
-            ['Total Payment', f"LKR {total_payment:.2f}"]
-        ]
-        summary_table = Table(summary_data, colWidths=[2*inch, 2*inch])
-        summary_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), colors.lightblue),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        story.append(summary_table)
-        story.append(Spacer(1, 20))
-        
-        # Add work logs table if any
-        if work_logs:
-            story.append(Paragraph("Work Log Details", heading_style))
-            
-            # Table headers
-            table_data = [['Date', 'Order', 'Process', 'Pieces', 'Rate/Piece', 'Payment']]
-            
-            # Add work log data
-            for wl in work_logs:
-                process = Process.query.get(wl.process_id)
-                order = Order.query.get(wl.order_id)
-                rate = process.pay_rate if process else 0
-                payment = wl.quantity * rate
-                
-                table_data.append([
-                    wl.date.strftime('%Y-%m-%d'),
-                    order.order_no if order else 'N/A',
-                    process.name if process else 'N/A',
-                    str(wl.quantity),
-                    f"LKR {rate:.2f}",
-                    f"LKR {payment:.2f}"
-                ])
-            
-            # Create table
-            work_log_table = Table(table_data, colWidths=[1*inch, 1.2*inch, 1.2*inch, 0.8*inch, 1*inch, 1*inch])
-            work_log_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ]))
-            story.append(work_log_table)
-        else:
-            story.append(Paragraph("No work logs found for the selected period.", normal_style))
-        
-        # Add footer
-        story.append(Spacer(1, 30))
-        story.append(Paragraph(f"Report generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", normal_style))
-        
-        # Build PDF
-        doc.build(story)
-        buffer.seek(0)
-        
-        # Generate filename
-        filename = f"payment_report_{employee.employee_id}_{year}_{month:02d}.pdf"
+        data = payslip_data(employee, month, year, total_quantity, total_payment, [
+            (wl.date,
+             wl.order.order_no if wl.order else None,
+             wl.process.name if wl.process else None,
+             wl.quantity,
+             wl.process.pay_rate if wl.process else 0)
+            for wl in work_logs
+        ])
+        pdf = render_payslip(data)
+        cache.put(cache_key, pdf)
         
         return send_file(
-            buffer,
+            BytesIO(pdf),
             as_attachment=True,
             download_name=filename,
             mimetype='application/pdf'
@@ -1151,6 +1326,137 @@ def download_payment_report_pdf():
         flash('Error generating PDF report', 'error')
         return redirect(url_for('payment_report'))
 
+@app.route('/payment-report/batch', methods=['POST'])
+def start_payslip_batch():
+    """Start rendering payslips for every active employee for a month"""
+    if not session.get('logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    try:
+        month = int(request.form.get('month'))
+        year = int(request.form.get('year'))
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Please select a month and year'}), 400
+    
+    if month < 1 or month > 12:
+        return jsonify({'error': 'Invalid month'}), 400
+    
+    if year < 2020 or year > 2030:
+        return jsonify({'error': 'Invalid year'}), 400
+    
+    output = request.form.get('output', 'zip')
+    if output not in ('zip', 'pdf'):
+        return jsonify({'error': 'Invalid output format'}), 400
+    
+    job_id = start_batch_job(app, month, year, output, app.config['PAYSLIP_MAX_WORKERS'])
+    if not job_id:
+        return jsonify({'error': 'A payslip batch is already running. Please wait for it to finish.'}), 409
+    
+    print(f"Started payslip batch {job_id} for {month}/{year} ({output})")
+    return jsonify({
+        'job_id': job_id,
+        'status_url': url_for('payslip_batch_status', job_id=job_id),
+        'download_url': url_for('download_payslip_batch', job_id=job_id)
+    }), 202
+
+@app.route('/payment-report/batch/<job_id>')
+def payslip_batch_status(job_id):
+    """Progress of a payslip batch"""
+    if not session.get('logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    job = get_batch_job(job_id)
+    if not job:
+        return jsonify({'error': 'Batch not found'}), 404
+    
+    return jsonify({
+        'status': job['status'],
+        'done': job['done'],
+        'total': job['total'],
+        'error': job['error']
+    })
+
+@app.route('/payment-report/batch/<job_id>/download')
+def download_payslip_batch(job_id):
+    """Download the output of a finished payslip batch"""
+    if not session.get('logged_in'):
+        return redirect(url_for('login'))
+    
+    job = get_batch_job(job_id)
+    if not job or job['status'] != 'finished':
+        flash('Payslip batch is not available for download', 'error')
+        return redirect(url_for('payment_report'))
+    
+    return send_file(
+        BytesIO(job['result']),
+        as_attachment=True,
+        download_name=batch_filename(job['month'], job['year'], job['output']),
+        mimetype='application/pdf' if job['output'] == 'pdf' else 'application/zip'
+    )
+
+def _export_response(file_format, columns, query, sheet_name, filename):
+    """Stream an export; rows are read and written while the response is sent"""
+    # A restore waits for the export to finish sending, not just for this view
+    return hold_gate_until_closed(Response(
+        iter_export(file_format, columns, query, sheet_name),
+        mimetype=EXPORT_MIMETYPES[file_format],
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}.{file_format}"',
+            'X-Accel-Buffering': 'no'
+        }
+    ))
+
+@app.route('/export/work-logs.<file_format>')
+def export_work_logs(file_format):
+    """Download the work logs matching the list filters as CSV or XLSX"""
+    if not session.get('logged_in'):
+        return redirect(url_for('login'))
+    if file_format not in EXPORT_MIMETYPES:
+        abort(404)
+
+    filters = parse_work_log_filters(request.args)
+    period = '_'.join(filters[key].isoformat() for key in ('date_from', 'date_to') if key in filters)
+    filename = f"work_logs_{period}" if period else 'work_logs'
+    return _export_response(file_format, WORK_LOG_COLUMNS, work_log_export_query(filters), 'Work Logs', filename)
+
+@app.route('/export/payroll.<file_format>')
+def export_payroll(file_format):
+    """Download one month's payroll (all employees, or one) as CSV or XLSX"""
+    if not session.get('logged_in'):
+        return redirect(url_for('login'))
+    if file_format not in EXPORT_MIMETYPES:
+        abort(404)
+
+    today = date.today()
+    month = request.args.get('month', today.month, type=int)
+    year = request.args.get('year', today.year, type=int)
+    if not 1 <= month <= 12:
+        flash('Invalid month. Please select a month between 1 and 12.', 'error')
+        return redirect(url_for('payment_report'))
+
+    # Bring the month's payment rows up to date first; the export reads committed data
+    refresh_monthly_payments(month, year)
+    db.session.commit()
+
+    query = payroll_export_query(month, year, request.args.get('employee_id', type=int))
+    return _export_response(file_format, PAYROLL_COLUMNS, query, 'Payroll', f"payroll_{year}_{month:02d}")
+
+@app.route('/api/database/profile')
+def database_profile():
+    """SQLite pragmas requested by the engine profile and the values in effect"""
+    if not session.get('logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    return jsonify(profile_report(db))
+
+@app.route('/api/report-cache/stats')
+def report_cache_stats():
+    """Hit/miss counters and sizes of the payment-report PDF cache"""
+    if not session.get('logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    return jsonify(get_report_cache().stats())
+
 @app.route('/processes')
 def processes():
     """View all processes"""
@@ -1253,46 +1559,46 @@ def backup():
         if action == 'create_backup':
             success, result = create_backup()
             if success:
-                flash(f'Backup created successfully! File: {os.path.basename(result)}', 'success')
+                flash(f"Backup created successfully! Snapshot {result['id']} "
+                      f"({result['size'] / 1024:.1f} KB, {result['new_bytes'] / 1024:.1f} KB new, "
+                      f"{result['duration']:.2f}s)", 'success')
             else:
                 flash(f'Backup failed: {result}', 'error')
         elif action == 'restore_backup':
-            backup_file = request.form.get('backup_file')
-            if backup_file and os.path.exists(backup_file):
+            snapshot_id = request.form.get('snapshot_id')
+            if snapshot_id and backup_store.get_snapshot(snapshot_id):
+                restore_path = os.path.join(BACKUP_DIR, 'restore.db.tmp')
                 try:
+                    # Reassemble and verify the snapshot before touching live data
+                    backup_store.restore_to(snapshot_id, restore_path)
+                    
                     # Create a backup before restoring
-                    create_backup()
+                    success, result = create_backup()
+                    if not success:
+                        raise Exception(f'could not back up current data first ({result})')
                     
-                    # Restore the selected backup
-                    shutil.copy2(backup_file, DATABASE_PATH)
-                    flash('Database restored successfully!', 'success')
+                    # Swap the file in while requests wait at the gate, then bring
+                    # an older backup's schema up to date before they resume
+                    paused = restore_database(db, restore_path, DATABASE_PATH, after_swap=upgrade_database)
+                    flash(f'Database restored successfully! (requests paused for {paused:.2f}s)', 'success')
                 except Exception as e:
                     flash(f'Restore failed: {str(e)}', 'error')
+                finally:
+                    if os.path.exists(restore_path):
+                        os.remove(restore_path)
             else:
-                flash('Invalid backup file selected', 'error')
+                flash('Invalid backup selected', 'error')
     
-    # Get backup information
+    # Backup information comes from the store catalog
     last_backup_time, last_backup_path = get_last_backup_info()
-    
-    # Get list of available backups
-    available_backups = []
-    if os.path.exists(BACKUP_DIR):
-        for filename in os.listdir(BACKUP_DIR):
-            if filename.startswith('oleema_backup_') and filename.endswith('.db'):
-                file_path = os.path.join(BACKUP_DIR, filename)
-                file_time = datetime.fromtimestamp(os.path.getctime(file_path))
-                available_backups.append({
-                    'filename': filename,
-                    'path': file_path,
-                    'created': file_time,
-                    'size': os.path.getsize(file_path)
-                })
-        available_backups.sort(key=lambda x: x['created'], reverse=True)
+    available_backups = backup_store.list_snapshots()
     
     return render_template('pages/backup.html',
                          last_backup_time=last_backup_time,
                          last_backup_path=last_backup_path,
-                         available_backups=available_backups)
+                         available_backups=available_backups,
+                         backup_stats=backup_store.stats(),
+                         retention=backup_store.retention)
 
 @app.route('/logout')
 def logout():
@@ -1302,4 +1608,7 @@ def logout():
     return redirect(url_for('login'))
 
 if __name__ == '__main__':
+    # Needed for the payslip process pool in frozen (PyInstaller) builds
+    multiprocessing.freeze_support()
+    startup()
     app.run(debug=True, host='0.0.0.0', port=5001)
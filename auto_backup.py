@@ -12,7 +12,7 @@ import sys
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from app import create_backup, get_last_backup_info
+from app import create_backup, get_last_backup_info, startup, DATABASE_PATH
 
 def main():
     """Create automatic daily backup"""
@@ -20,7 +20,7 @@ def main():
     print("=" * 30)
     
     # Check if database exists
-    db_path = 'instance/oleema.db'
+    db_path = DATABASE_PATH
     if not os.path.exists(db_path):
         print("❌ Database file not found!")
         print(f"Expected location: {db_path}")
@@ -32,7 +32,9 @@ def main():
     
     if success:
         print(f"✅ Backup created successfully!")
-        print(f"📁 File: {os.path.basename(result)}")
+        print(f"📁 Snapshot: {result['id']}")
+        print(f"📏 Size: {result['size'] / 1024:.1f} KB ({result['new_bytes'] / 1024:.1f} KB new after deduplication)")
+        print(f"⏱️  Duration: {result['duration']:.2f}s (integrity check passed)")
         
         # Get backup info
         last_backup_time, last_backup_path = get_last_backup_info()
@@ -45,5 +47,6 @@ def main():
         return False
 
 if __name__ == '__main__':
+    startup()
     success = main()
     sys.exit(0 if success else 1) 
\ No newline at end of file
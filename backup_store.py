@@ -0,0 +1,393 @@
+"""
+Deduplicated backup store
+A snapshot (a verified copy from backup_manager.backup_database()) is split
+into fixed-size chunks aligned to SQLite pages. Each chunk is stored once,
+zlib-compressed, under the SHA-256 of its contents, so pages that did not
+change between backups cost nothing. A snapshot is a manifest listing its
+chunks, and catalog.json summarises every snapshot so listing backups is a
+single small read.
+
+Retention is grandfather-father-son: everything from the last few hours plus
+the newest snapshot of each of the last N days, weeks and months is kept, and
+chunks no longer referenced by any kept snapshot are deleted.
+
+The web app and auto_backup.py share one store from separate processes, so
+every change (adding a snapshot, retention, chunk garbage collection) is made
+under a file lock on catalog.lock against catalog.json as just read from
+disk, and listings re-read catalog.json whenever it has changed on disk.
+
+Layout under the store directory:
+    catalog.json                 snapshot summaries, newest first
+    catalog.lock                 held by the process changing the store
+    manifests/<id>.json          chunk list and checksum of one snapshot
+    chunks/<ab>/<sha256>.z       compressed chunk contents
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from backup_manager import BackupError, backup_database, integrity_check
+
+# Bytes per chunk; a multiple of every SQLite page size up to 64 KB
+CHUNK_SIZE = 64 * 1024
+
+COMPRESSION_LEVEL = 6
+
+# Snapshots kept per period by apply_retention(); every snapshot younger than
+# recent_hours is kept so a manual backup is not replaced by the next one
+DEFAULT_RETENTION = {'recent_hours': 24, 'daily': 7, 'weekly': 5, 'monthly': 12}
+
+CATALOG_VERSION = 1
+
+if os.name == 'nt':
+    import msvcrt
+
+    def _lock_file(f):
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                pass  # LK_LOCK gives up after about 10 seconds; keep waiting
+
+    def _unlock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def _write_atomic(path, data):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+class BackupStore:
+    """Content-addressed, compressed snapshots of the database with a catalog"""
+
+    def __init__(self, directory, retention=None):
+        self.directory = directory
+        self.retention = dict(DEFAULT_RETENTION, **(retention or {}))
+        self.chunk_dir = os.path.join(directory, 'chunks')
+        self.manifest_dir = os.path.join(directory, 'manifests')
+        self._lock = threading.RLock()
+        self._lock_handle = None
+        self._lock_depth = 0
+        os.makedirs(self.chunk_dir, exist_ok=True)
+        os.makedirs(self.manifest_dir, exist_ok=True)
+        self._catalog_stat = None
+        self._catalog = self._load_catalog()
+
+    # Catalog
+
+    def _catalog_path(self):
+        return os.path.join(self.directory, 'catalog.json')
+
+    def _stat_catalog(self):
+        """Identifies the catalog file on disk; it is replaced, never rewritten in place"""
+        try:
+            stat = os.stat(self._catalog_path())
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _load_catalog(self):
+        path = self._catalog_path()
+        self._catalog_stat = self._stat_catalog()
+        if self._catalog_stat is None:
+            return {'version': CATALOG_VERSION, 'snapshots': [], 'stored_bytes': 0}
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_catalog(self):
+        data = json.dumps(self._catalog, indent=1).encode('utf-8')
+        _write_atomic(self._catalog_path(), data)
+        self._catalog_stat = self._stat_catalog()
+
+    def _refresh_catalog(self):
+        """Re-read catalog.json if another process changed it (called with the thread lock held)"""
+        if self._stat_catalog() != self._catalog_stat:
+            self._catalog = self._load_catalog()
+
+    @contextmanager
+    def _changing(self):
+        """
+        Hold the thread lock and the cross-process file lock, with the catalog
+        freshly read from disk. Reentrant within a process.
+        """
+        with self._lock:
+            if self._lock_depth == 0:
+                self._lock_handle = open(os.path.join(self.directory, 'catalog.lock'), 'a+b')
+                try:
+                    _lock_file(self._lock_handle)
+                except BaseException:
+                    self._lock_handle.close()
+                    raise
+                self._catalog = self._load_catalog()
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    try:
+                        _unlock_file(self._lock_handle)
+                    finally:
+                        self._lock_handle.close()
+                        self._lock_handle = None
+
+    def list_snapshots(self):
+        """Snapshot summaries, newest first (created_at is a datetime)"""
+        with self._lock:
+            self._refresh_catalog()
+            return [dict(entry, created_at=datetime.fromisoformat(entry['created_at']))
+                    for entry in self._catalog['snapshots']]
+
+    def latest_snapshot(self):
+        snapshots = self.list_snapshots()
+        return snapshots[0] if snapshots else None
+
+    def get_snapshot(self, snapshot_id):
+        return next((entry for entry in self.list_snapshots() if entry['id'] == snapshot_id), None)
+
+    def stats(self):
+        with self._lock:
+            self._refresh_catalog()
+            snapshots = self._catalog['snapshots']
+            logical = sum(entry['size'] for entry in snapshots)
+            stored = self._catalog['stored_bytes']
+            return {
+                'snapshots': len(snapshots),
+                'logical_bytes': logical,
+                'stored_bytes': stored,
+                'ratio': round(stored / logical, 3) if logical else None,
+            }
+
+    # Chunks
+
+    def _chunk_path(self, digest):
+        return os.path.join(self.chunk_dir, digest[:2], f"{digest}.z")
+
+    def _store_chunk(self, chunk):
+        """Store chunk if new; returns (digest, compressed bytes written)"""
+        digest = hashlib.sha256(chunk).hexdigest()
+        path = self._chunk_path(digest)
+        if os.path.exists(path):
+            return digest, 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        compressed = zlib.compress(chunk, COMPRESSION_LEVEL)
+        _write_atomic(path, compressed)
+        return digest, len(compressed)
+
+    def _read_chunk(self, digest):
+        with open(self._chunk_path(digest), 'rb') as f:
+            chunk = zlib.decompress(f.read())
+        if hashlib.sha256(chunk).hexdigest() != digest:
+            raise BackupError(f"Chunk {digest[:12]} is corrupt")
+        return chunk
+
+    # Snapshots
+
+    def _new_snapshot_id(self, created_at):
+        base = created_at.strftime('%Y%m%d_%H%M%S')
+        existing = {entry['id'] for entry in self._catalog['snapshots']}
+        snapshot_id, n = base, 1
+        while snapshot_id in existing:
+            n += 1
+            snapshot_id = f"{base}_{n}"
+        return snapshot_id
+
+    def add_file(self, path, created_at=None, duration=None, source=None):
+        """Chunk a verified database copy into the store; returns its catalog entry"""
+        created_at = created_at or datetime.now()
+        # Held until the catalog lists the snapshot, so no collection sees its new chunks as unused
+        with self._changing():
+            snapshot_id = self._new_snapshot_id(created_at)
+            chunks = []
+            written = 0
+            new_chunks = 0
+            whole = hashlib.sha256()
+            size = 0
+            with open(path, 'rb') as f:
+                while True:
+                    chunk = f.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    whole.update(chunk)
+                    size += len(chunk)
+                    digest, stored = self._store_chunk(chunk)
+                    chunks.append(digest)
+                    written += stored
+                    new_chunks += 1 if stored else 0
+
+            manifest = {
+                'id': snapshot_id,
+                'size': size,
+                'sha256': whole.hexdigest(),
+                'chunk_size': CHUNK_SIZE,
+                'chunks': chunks,
+            }
+            _write_atomic(os.path.join(self.manifest_dir, f"{snapshot_id}.json"),
+                          json.dumps(manifest).encode('utf-8'))
+
+            entry = {
+                'id': snapshot_id,
+                'created_at': created_at.isoformat(timespec='seconds'),
+                'size': size,
+                'new_bytes': written,
+                'chunks': len(chunks),
+                'new_chunks': new_chunks,
+                'duration': round(duration, 3) if duration is not None else None,
+            }
+            if source:
+                entry['source'] = source
+            self._catalog['snapshots'].insert(0, entry)
+            self._catalog['snapshots'].sort(key=lambda e: e['created_at'], reverse=True)
+            self._catalog['stored_bytes'] += written
+            self._save_catalog()
+            return dict(entry, created_at=created_at)
+
+    def take_snapshot(self, database_path):
+        """Online backup of the live database into the store; returns its catalog entry"""
+        temp_path = os.path.join(self.directory, 'snapshot.db.tmp')
+        with self._changing():
+            started = time.perf_counter()
+            result = backup_database(database_path, temp_path)
+            try:
+                return self.add_file(temp_path, result.created_at, time.perf_counter() - started)
+            finally:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+
+    def _load_manifest(self, snapshot_id):
+        with open(os.path.join(self.manifest_dir, f"{snapshot_id}.json"), encoding='utf-8') as f:
+            return json.load(f)
+
+    def restore_to(self, snapshot_id, path):
+        """Reassemble a snapshot into path, checking every chunk and the whole-file checksum"""
+        # Locked so retention in another process cannot remove chunks while they are read
+        with self._changing():
+            manifest = self._load_manifest(snapshot_id)
+            whole = hashlib.sha256()
+            with open(path, 'wb') as f:
+                for digest in manifest['chunks']:
+                    chunk = self._read_chunk(digest)
+                    whole.update(chunk)
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+        if whole.hexdigest() != manifest['sha256']:
+            raise BackupError(f"Snapshot {snapshot_id} does not match its checksum")
+        problems = integrity_check(path)
+        if problems:
+            raise BackupError(f"Snapshot {snapshot_id} failed integrity check: {'; '.join(problems[:5])}")
+        return path
+
+    # Retention
+
+    def _retained_ids(self, snapshots, now):
+        """Recent snapshots plus the newest per day/ISO week/month within the configured windows"""
+        keep = set()
+        if snapshots:
+            keep.add(snapshots[0]['id'])
+        recent_since = now - timedelta(hours=self.retention.get('recent_hours', 0))
+        for entry in snapshots:
+            if datetime.fromisoformat(entry['created_at']) >= recent_since:
+                keep.add(entry['id'])
+        periods = {
+            'daily': lambda d: d.date(),
+            'weekly': lambda d: d.isocalendar()[:2],
+            'monthly': lambda d: (d.year, d.month),
+        }
+        for name, bucket in periods.items():
+            limit = self.retention.get(name, 0)
+            seen = []
+            for entry in snapshots:  # newest first, so the first per bucket is the newest
+                key = bucket(datetime.fromisoformat(entry['created_at']))
+                if key in seen:
+                    continue
+                if len(seen) >= limit:
+                    break
+                seen.append(key)
+                keep.add(entry['id'])
+        return keep
+
+    def apply_retention(self, now=None):
+        """Drop snapshots outside the GFS windows and garbage-collect their chunks; returns removed ids"""
+        now = now or datetime.now()
+        with self._changing():
+            snapshots = self._catalog['snapshots']
+            keep = self._retained_ids(snapshots, now)
+            removed = [entry['id'] for entry in snapshots if entry['id'] not in keep]
+            if not removed:
+                return []
+            self._catalog['snapshots'] = [entry for entry in snapshots if entry['id'] in keep]
+            self._save_catalog()
+            for snapshot_id in removed:
+                try:
+                    os.remove(os.path.join(self.manifest_dir, f"{snapshot_id}.json"))
+                except OSError:
+                    pass
+            self._collect_garbage()
+            return removed
+
+    def _collect_garbage(self):
+        """Delete chunks no listed snapshot uses (called under _changing(), against the catalog just read)"""
+        live = set()
+        for entry in self._catalog['snapshots']:
+            live.update(self._load_manifest(entry['id'])['chunks'])
+        freed = 0
+        for prefix in os.listdir(self.chunk_dir):
+            prefix_dir = os.path.join(self.chunk_dir, prefix)
+            for filename in os.listdir(prefix_dir):
+                digest = filename.split('.')[0]
+                if digest not in live:
+                    path = os.path.join(prefix_dir, filename)
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+        self._catalog['stored_bytes'] = max(0, self._catalog['stored_bytes'] - freed)
+        self._save_catalog()
+        return freed
+
+    def import_legacy_backups(self, backup_dir):
+        """
+        Copy plain oleema_backup_*.db files from earlier versions into the
+        store. The originals are left in place; files already imported are
+        recognised by name and skipped.
+        """
+        imported = 0
+        with self._changing():
+            done = {entry.get('source') for entry in self._catalog['snapshots']}
+            for filename in sorted(os.listdir(backup_dir)):
+                if not (filename.startswith('oleema_backup_') and filename.endswith('.db')):
+                    continue
+                if filename in done:
+                    continue
+                path = os.path.join(backup_dir, filename)
+                if integrity_check(path):
+                    print(f"Skipping damaged legacy backup {filename}")
+                    continue
+                try:
+                    created_at = datetime.strptime(filename[len('oleema_backup_'):-3], '%Y%m%d_%H%M%S')
+                except ValueError:
+                    created_at = datetime.fromtimestamp(os.path.getmtime(path))
+                self.add_file(path, created_at, source=filename)
+                imported += 1
+        return imported
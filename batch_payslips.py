@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Generate payslips for every active employee for a month
+Usage:
+    python batch_payslips.py MONTH YEAR [--pdf] [--workers N] [--output PATH]
+By default writes a ZIP with one PDF per employee; --pdf writes one merged PDF.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+def main():
+    # Imported here rather than at module level: render workers re-run this
+    # module and only need payslip_render
+    from app import app, startup
+    from payslips import collect_month_payslips, render_payslips, batch_filename, worker_count
+
+    parser = argparse.ArgumentParser(description='Generate payslips for every active employee')
+    parser.add_argument('month', type=int)
+    parser.add_argument('year', type=int)
+    parser.add_argument('--pdf', action='store_true', help='write one merged PDF instead of a ZIP')
+    parser.add_argument('--workers', type=int, default=None, help='number of render processes')
+    parser.add_argument('--output', help='output file (default: payslips_YEAR_MONTH.zip/pdf)')
+    args = parser.parse_args()
+
+    if args.month < 1 or args.month > 12:
+        print("❌ Invalid month. Please use a month between 1 and 12.")
+        return False
+
+    output = 'pdf' if args.pdf else 'zip'
+    path = args.output or batch_filename(args.month, args.year, output)
+
+    print("Oleema Batch Payslips")
+    print("=" * 30)
+
+    startup()
+    started = time.time()
+    with app.app_context():
+        payslips = collect_month_payslips(args.month, args.year)
+    print(f"📋 {len(payslips)} active employees for {args.month}/{args.year}")
+    print(f"⚙️  Rendering with {worker_count(args.workers)} worker processes...")
+
+    def progress(done, total):
+        print(f"\r   {done}/{total} payslips rendered", end='', flush=True)
+
+    try:
+        result = render_payslips(payslips, output, args.workers, progress)
+    except Exception as e:
+        print(f"\n❌ Payslip generation failed: {e}")
+        return False
+
+    with open(path, 'wb') as f:
+        f.write(result)
+    print(f"\n✅ Wrote {path} ({len(result) // 1024} KB) in {time.time() - started:.1f}s")
+    return True
+
+if __name__ == '__main__':
+    success = main()
+    sys.exit(0 if success else 1)
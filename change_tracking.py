@@ -0,0 +1,154 @@
+"""
+Session change tracking for derived data
+Modules that keep tables derived from the core tables up to date register
+a flush handler here instead of patching every route that writes rows.
+In-memory caches register a commit handler, which only sees changes once
+they are durable and never sees rolled-back ones.
+"""
+
+from collections import namedtuple
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, attributes
+
+# One row-level change: action is 'insert', 'update' or 'delete'.
+# old/new are column snapshots (None for inserts/deletes respectively) and
+# changed is the set of column keys whose value differs.
+ModelChange = namedtuple('ModelChange', ['table', 'action', 'old', 'new', 'changed'])
+
+_flush_handlers = []
+_commit_handlers = []
+
+def on_flush(*tables):
+    """
+    Register handler(connection, changes) to run inside the flush for the given
+    tables. A handler may return changes it made itself (to tables written
+    with Core statements); they are passed on to the commit handlers.
+    """
+    def decorator(fn):
+        _flush_handlers.append((frozenset(tables), fn))
+        return fn
+    return decorator
+
+def on_commit(*tables):
+    """Register handler(changes) to run after the transaction commits for the given tables"""
+    def decorator(fn):
+        _commit_handlers.append((frozenset(tables), fn))
+        return fn
+    return decorator
+
+def _tracked_tables():
+    tables = set()
+    for handler_tables, _ in _flush_handlers + _commit_handlers:
+        tables |= handler_tables
+    return tables
+
+def _table_name(obj):
+    return getattr(obj, '__tablename__', None)
+
+def _old_snapshot(session, obj):
+    """Column values as they are in the database before this flush"""
+    state = inspect(obj)
+    values = {}
+    unknown = False
+    for attr in state.mapper.column_attrs:
+        history = attributes.get_history(obj, attr.key, passive=attributes.PASSIVE_NO_INITIALIZE)
+        if history.deleted:
+            values[attr.key] = history.deleted[0]
+        elif history.unchanged:
+            values[attr.key] = history.unchanged[0]
+        else:
+            unknown = True
+    if unknown:
+        # Attribute was expired (e.g. after a commit) and then overwritten
+        # without being read, so the original value has to come from the row
+        table = state.mapper.local_table
+        pk = state.mapper.primary_key_from_instance(obj)
+        criteria = [column == value for column, value in zip(state.mapper.primary_key, pk)]
+        row = session.connection().execute(select(table).where(*criteria)).mappings().first()
+        if row is not None:
+            for attr in state.mapper.column_attrs:
+                values.setdefault(attr.key, row[attr.columns[0].name])
+    return values
+
+def _new_snapshot(obj):
+    state = inspect(obj)
+    return {attr.key: getattr(obj, attr.key) for attr in state.mapper.column_attrs}
+
+@event.listens_for(Session, 'before_flush')
+def _capture_pending_changes(session, flush_context, instances):
+    """Record old values before the flush overwrites them"""
+    tables = _tracked_tables()
+    if not tables:
+        return
+    pending = session.info.setdefault('pending_changes', [])
+    for obj in session.new:
+        if _table_name(obj) in tables:
+            pending.append(('insert', obj, None))
+    for obj in session.dirty:
+        if _table_name(obj) in tables and session.is_modified(obj, include_collections=False):
+            pending.append(('update', obj, _old_snapshot(session, obj)))
+    for obj in session.deleted:
+        if _table_name(obj) in tables:
+            pending.append(('delete', obj, _old_snapshot(session, obj)))
+
+@event.listens_for(Session, 'after_flush')
+def _dispatch_flush_handlers(session, flush_context):
+    """Hand the flushed changes to every registered handler"""
+    pending = session.info.pop('pending_changes', None)
+    if not pending:
+        return
+    changes = []
+    for action, obj, old in pending:
+        table = _table_name(obj)
+        if action == 'delete':
+            changes.append(ModelChange(table, action, old, None, set(old)))
+            continue
+        new = _new_snapshot(obj)
+        if action == 'insert':
+            changes.append(ModelChange(table, action, None, new, set(new)))
+        else:
+            changed = {key for key, value in new.items() if old.get(key) != value}
+            if changed:
+                changes.append(ModelChange(table, action, old, new, changed))
+    publish_changes(session, changes)
+
+def publish_changes(session, changes, notify_commit=True):
+    """
+    Run flush handlers now and queue changes for commit handlers.
+    Also used by bulk paths that write with Core statements and bypass the ORM;
+    those can pass notify_commit=False and queue a smaller set with
+    queue_commit_changes() instead of holding every row until the commit.
+    """
+    connection = session.connection()
+    derived = []
+    for tables, handler in _flush_handlers:
+        relevant = [change for change in changes if change.table in tables]
+        if relevant:
+            derived.extend(handler(connection, relevant) or [])
+    if notify_commit:
+        queue_commit_changes(session, changes)
+    queue_commit_changes(session, derived)
+
+def queue_commit_changes(session, changes):
+    """Queue changes for commit handlers only"""
+    if _commit_handlers:
+        session.info.setdefault('committed_changes', []).extend(changes)
+
+@event.listens_for(Session, 'after_commit')
+def _dispatch_commit_handlers(session):
+    changes = session.info.pop('committed_changes', None)
+    if not changes:
+        return
+    for tables, handler in _commit_handlers:
+        relevant = [change for change in changes if change.table in tables]
+        if relevant:
+            try:
+                handler(relevant)
+            except Exception as e:
+                # The data is already committed; a failing cache must not break the request
+                print(f"Error in commit handler {handler.__name__}: {e}")
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_changes(session):
+    session.info.pop('pending_changes', None)
+    session.info.pop('committed_changes', None)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Check (and repair) references between tables
+Usage:
+    python check_integrity.py                    # report rows with dangling references, change nothing
+    python check_integrity.py --fix              # delete them (optional references are set to NULL)
+    python check_integrity.py --table overages   # only check one table (repeatable)
+See integrity.py for what is checked.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db, startup
+from integrity import check_integrity, integrity_checks
+
+def run_checks(tables=None, fix=False):
+    """Print one line per check; returns True when nothing (is left) to fix"""
+    with app.app_context():
+        known = {check.table.name for check in integrity_checks()}
+        unknown = set(tables or []) - known
+        if unknown:
+            print(f"❌ No references to check in: {', '.join(sorted(unknown))}")
+            print(f"   Tables with references: {', '.join(sorted(known))}")
+            return False
+
+        print(f"🔍 {'Checking and repairing' if fix else 'Checking'} references...")
+        started = time.perf_counter()
+        try:
+            results = check_integrity(tables, fix=fix)
+        except Exception as e:
+            print(f"❌ Integrity check failed: {e}")
+            return False
+
+        problems = 0
+        for result in results:
+            if not result.count:
+                print(f"  ✅ {result.check.name}")
+                continue
+            problems += result.count
+            sample = ', '.join(str(key) for key in result.sample)
+            more = ', ...' if result.count > len(result.sample) else ''
+            print(f"  ❌ {result.check.name}: {result.count} rows ({sample}{more})")
+            if fix:
+                print(f"     🔧 {result.check.repair}: {result.repaired} rows")
+            else:
+                print(f"     would {result.check.repair}")
+
+        elapsed = time.perf_counter() - started
+        if not problems:
+            print(f"✅ All {len(results)} references are valid ({elapsed:.2f}s)")
+            return True
+        if fix:
+            print(f"✅ Repaired {problems} rows ({elapsed:.2f}s)")
+            return True
+        print(f"⚠️  {problems} rows with invalid references ({elapsed:.2f}s); run with --fix to repair")
+        return False
+
+if __name__ == '__main__':
+    print("Oleema Integrity Check")
+    print("=" * 30)
+
+    parser = argparse.ArgumentParser(description='Check references between tables')
+    parser.add_argument('--fix', action='store_true', help='delete or repair rows with invalid references')
+    parser.add_argument('--table', action='append', help='only check this table (repeatable)')
+    args = parser.parse_args()
+
+    startup()
+    success = run_checks(args.table, fix=args.fix)
+    sys.exit(0 if success else 1)
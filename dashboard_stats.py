@@ -0,0 +1,110 @@
+"""
+Dashboard statistics
+The dashboard is everyone's landing page, so its counters come from one
+aggregated query (conditional sums over employees and orders) and, together
+with the recent orders and work logs, are kept in memory for a short TTL.
+A commit that touches orders, employees or work logs drops the cached copy,
+so the TTL only bounds staleness from writes made outside this process.
+"""
+
+import threading
+import time
+from sqlalchemy import select, func, case
+from models import db, Employee, Order, WorkLog
+from change_tracking import on_commit
+from database_restore import on_restore
+
+DEFAULT_TTL = 30  # seconds
+
+RECENT_ITEMS = 5
+
+def _count_where(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+def compute_dashboard_stats():
+    """Counters and recent items for the dashboard as plain values (safe to share between requests)"""
+    employee_counts = select(_count_where(Employee.is_active == True)).scalar_subquery()
+    order_counts = select(
+        func.count(Order.id),
+        _count_where(Order.status == 'pending'),
+        _count_where(Order.status == 'completed')
+    ).subquery()
+    total_employees, total_orders, pending_orders, completed_orders = db.session.execute(
+        select(employee_counts, *order_counts.c)
+    ).one()
+
+    recent_orders = db.session.execute(
+        select(Order.id, Order.order_no, Order.color, Order.size, Order.quantity, Order.status, Order.created_at)
+        .order_by(Order.created_at.desc()).limit(RECENT_ITEMS)
+    ).mappings().all()
+    recent_work_logs = db.session.execute(
+        select(WorkLog.id, WorkLog.employee_id, WorkLog.order_id, WorkLog.process_id,
+               WorkLog.quantity, WorkLog.date, WorkLog.created_at)
+        .order_by(WorkLog.created_at.desc()).limit(RECENT_ITEMS)
+    ).mappings().all()
+
+    return {
+        'total_employees': total_employees,
+        'total_orders': total_orders,
+        'pending_orders': pending_orders,
+        'completed_orders': completed_orders,
+        'recent_orders': [dict(row) for row in recent_orders],
+        'recent_work_logs': [dict(row) for row in recent_work_logs],
+    }
+
+class DashboardCache:
+    """One cached copy of the dashboard statistics with a TTL"""
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stats = None
+        self._expires = 0.0
+        # Bumped by every invalidation so a result computed before it is not stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self):
+        with self._lock:
+            if self._stats is not None and time.monotonic() < self._expires:
+                self.hits += 1
+                return self._stats
+            self.misses += 1
+            generation = self._generation
+        stats = compute_dashboard_stats()
+        with self._lock:
+            if generation == self._generation:
+                self._stats = stats
+                self._expires = time.monotonic() + self.ttl
+        return stats
+
+    def invalidate(self):
+        with self._lock:
+            self._stats = None
+            self._generation += 1
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'ttl': self.ttl,
+                'cached': self._stats is not None and time.monotonic() < self._expires,
+            }
+
+dashboard_cache = DashboardCache()
+
+def get_dashboard_stats():
+    return dashboard_cache.get()
+
+@on_commit('orders', 'employees', 'work_logs')
+def _invalidate_dashboard(changes):
+    dashboard_cache.invalidate()
+
+@on_restore
+def _invalidate_dashboard_after_restore():
+    dashboard_cache.invalidate()
@@ -0,0 +1,185 @@
+"""
+Live database restore
+A restore swaps the database file underneath a running app. It is prepared
+off to the side (the backup is validated and written to a temp file next to
+oleema.db), then the request gate stops new requests and waits for in-flight
+ones to finish (a streamed export counts until its body has been sent) and
+for report connections to be returned, the connection pools are closed, the
+temp file is renamed over the live one and connections are re-opened. Requests that arrive during
+the swap wait at the gate instead of failing, so the site only pauses.
+
+Modules that keep in-memory copies of database state register an on_restore
+hook to drop them once the new file is in place.
+"""
+
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from flask import g, request
+from sqlalchemy import text
+from backup_manager import BackupError, integrity_check
+from sqlite_profile import checkpoint_wal, dispose_read_only_engine, read_only_engine, wait_for_report_connections
+
+# Seconds a restore waits for in-flight requests before giving up
+DRAIN_TIMEOUT = 10.0
+
+# Seconds a request waits at a closed gate before getting a 503
+GATE_WAIT_TIMEOUT = 30.0
+
+# Tables a file must contain to be accepted as an Oleema database
+REQUIRED_TABLES = {'users', 'employees', 'orders', 'processes', 'work_logs'}
+
+_restore_hooks = []
+
+def on_restore(fn):
+    """Register fn() to run after the database file has been replaced"""
+    _restore_hooks.append(fn)
+    return fn
+
+class RestoreInProgress(Exception):
+    """Raised when a restore is requested while another one is running"""
+
+class RequestGate:
+    """Counts in-flight requests and can hold new ones back while the database is swapped"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._active = 0
+        self._closed = False
+        self.exempt_endpoints = {'static'}
+
+    def enter(self, timeout=GATE_WAIT_TIMEOUT):
+        with self._condition:
+            if not self._condition.wait_for(lambda: not self._closed, timeout):
+                return False
+            self._active += 1
+            return True
+
+    def leave(self):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    def close(self, timeout=DRAIN_TIMEOUT, own_requests=0):
+        """Stop admitting requests and wait until only own_requests are still in flight"""
+        with self._condition:
+            if self._closed:
+                raise RestoreInProgress('A restore is already in progress')
+            self._closed = True
+            if not self._condition.wait_for(lambda: self._active <= own_requests, timeout):
+                self._closed = False
+                self._condition.notify_all()
+                return False
+            return True
+
+    def open(self):
+        with self._condition:
+            self._closed = False
+            self._condition.notify_all()
+
+    @property
+    def active(self):
+        return self._active
+
+request_gate = RequestGate()
+
+def _enter_gate():
+    if request.endpoint in request_gate.exempt_endpoints:
+        return None
+    if not request_gate.enter():
+        return 'The database is being restored, please try again shortly.', 503
+    g.request_gate_entered = True
+    return None
+
+def _leave_gate(exception=None):
+    if g.pop('request_gate_entered', False):
+        request_gate.leave()
+
+def hold_gate_until_closed(response):
+    """
+    Keep a streamed response in flight until the server closes it. Teardown
+    runs before a streamed body is produced, so the request would otherwise
+    leave the gate while it still reads the database.
+    """
+    if g.pop('request_gate_entered', False):
+        response.call_on_close(request_gate.leave)
+    return response
+
+def init_request_gate(app):
+    """Install the gate; register it before other before_request hooks"""
+    app.before_request(_enter_gate)
+    app.teardown_request(_leave_gate)
+
+def validate_backup(path):
+    """Raise BackupError unless path is a sound SQLite file with the app's tables"""
+    problems = integrity_check(path)
+    if problems:
+        raise BackupError(f"Backup failed integrity check: {'; '.join(problems[:5])}")
+    connection = sqlite3.connect(path)
+    try:
+        tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    finally:
+        connection.close()
+    missing = REQUIRED_TABLES - tables
+    if missing:
+        raise BackupError(f"Backup is missing tables: {', '.join(sorted(missing))}")
+
+def _remove_sidecar_files(database_path):
+    """WAL and shared-memory files belong to the old database and must not be replayed over the new one"""
+    for suffix in ('-wal', '-shm', '-journal'):
+        try:
+            os.remove(database_path + suffix)
+        except FileNotFoundError:
+            pass
+
+def restore_database(db, backup_path, database_path, after_swap=None):
+    """
+    Replace the live database with backup_path without restarting.
+    Must be called inside a request or app context; after_swap() runs while
+    the gate is still closed (e.g. to apply schema migrations).
+    Returns the time in seconds requests were held at the gate.
+    """
+    validate_backup(backup_path)
+
+    # Same directory as the live file so the final rename is atomic
+    staged_path = f"{database_path}.restore"
+    shutil.copyfile(backup_path, staged_path)
+
+    own_requests = 1 if g.get('request_gate_entered') else 0
+    if not request_gate.close(own_requests=own_requests):
+        os.remove(staged_path)
+        raise BackupError('Timed out waiting for in-flight requests to finish')
+
+    paused_at = time.perf_counter()
+    try:
+        # The file cannot be replaced (on Windows) while a report connection still has it open
+        if not wait_for_report_connections(DRAIN_TIMEOUT):
+            raise BackupError('Timed out waiting for report queries to finish')
+        db.session.remove()
+        checkpoint_wal(database_path)
+        db.engine.dispose()
+        dispose_read_only_engine()
+
+        os.replace(staged_path, database_path)
+        _remove_sidecar_files(database_path)
+
+        # Re-warm both pools so the first request after the swap does not pay for it
+        with db.engine.connect() as connection:
+            connection.execute(text('SELECT 1'))
+        with read_only_engine().connect() as connection:
+            connection.execute(text('SELECT 1'))
+
+        if after_swap:
+            after_swap()
+        for hook in _restore_hooks:
+            try:
+                hook()
+            except Exception as e:
+                print(f"Error in restore hook {hook.__name__}: {e}")
+    finally:
+        if os.path.exists(staged_path):
+            os.remove(staged_path)
+        request_gate.open()
+    return time.perf_counter() - paused_at
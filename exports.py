@@ -0,0 +1,107 @@
+"""
+Streaming exports
+Work logs (joined to employees, orders and processes) and monthly payroll
+as CSV or XLSX. Rows are read from the read-only report connection in
+batches and written straight into the response as they arrive, so memory
+use stays flat whatever the number of rows.
+"""
+
+import csv
+import io
+from sqlalchemy import select
+from models import Employee, Order, Process, WorkLog, Payment
+from queries import filter_work_logs
+from sqlite_profile import report_connection
+from xlsx_stream import iter_xlsx
+
+# Rows fetched from SQLite per round trip
+FETCH_SIZE = 2000
+
+# Characters of CSV collected before they are sent
+CSV_CHUNK_SIZE = 64 * 1024
+
+WORK_LOG_COLUMNS = (
+    ('Date', WorkLog.date),
+    ('Employee ID', Employee.employee_id),
+    ('Employee', Employee.name),
+    ('Order No', Order.order_no),
+    ('Color', Order.color),
+    ('Size', Order.size),
+    ('Process', Process.name),
+    ('Quantity', WorkLog.quantity),
+    ('Rate', Process.pay_rate),
+    ('Amount', WorkLog.quantity * Process.pay_rate),
+    ('Hours', WorkLog.hours_worked),
+    ('Notes', WorkLog.notes),
+)
+
+PAYROLL_COLUMNS = (
+    ('Employee ID', Employee.employee_id),
+    ('Employee', Employee.name),
+    ('Month', Payment.month),
+    ('Year', Payment.year),
+    ('Pieces', Payment.total_quantity),
+    ('Hours', Payment.total_hours),
+    ('Payment', Payment.total_payment),
+)
+
+def work_log_export_query(filters):
+    """Work logs matching parse_work_log_filters() filters, oldest first"""
+    query = (
+        select(*(column for _, column in WORK_LOG_COLUMNS))
+        .select_from(WorkLog)
+        .join(Employee, Employee.id == WorkLog.employee_id)
+        .join(Order, Order.id == WorkLog.order_id)
+        .join(Process, Process.id == WorkLog.process_id)
+    )
+    # (date, id) is indexed, so rows come out in order without a sort
+    return filter_work_logs(query, filters).order_by(WorkLog.date, WorkLog.id)
+
+def payroll_export_query(month, year, employee_id=None):
+    """Payments rows of one month; refresh_monthly_payments() must have run and committed"""
+    query = (
+        select(*(column for _, column in PAYROLL_COLUMNS))
+        .select_from(Payment)
+        .join(Employee, Employee.id == Payment.employee_id)
+        .where(Payment.month == month, Payment.year == year)
+    )
+    if employee_id:
+        query = query.where(Payment.employee_id == employee_id)
+    return query.order_by(Employee.employee_id)
+
+def iter_rows(query):
+    """Result rows of query fetched FETCH_SIZE at a time on a read-only connection"""
+    with report_connection() as connection:
+        result = connection.execution_options(yield_per=FETCH_SIZE).execute(query)
+        for partition in result.partitions():
+            yield from partition
+
+def iter_csv(header, rows):
+    """Yield CSV text in chunks of about CSV_CHUNK_SIZE characters"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CSV_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def iter_export(file_format, columns, query, sheet_name):
+    """Bytes of the export of query as 'csv' or 'xlsx', produced as rows are read"""
+    header = [label for label, _ in columns]
+    if file_format == 'xlsx':
+        return iter_xlsx(header, iter_rows(query), sheet_name)
+    # utf-8-sig so Excel opens the CSV with the right encoding
+    return (chunk.encode('utf-8') for chunk in _with_bom(iter_csv(header, iter_rows(query))))
+
+def _with_bom(chunks):
+    yield '\ufeff'
+    yield from chunks
+
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Bring plain backup copies from earlier versions into the backup store
+Usage:
+    python import_legacy_backups.py
+Each backups/oleema_backup_*.db file is chunked into the store so it shows up
+on the backup page and can be restored. The original files are not changed
+or removed; running the script again skips files it already imported.
+"""
+
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import backup_store, BACKUP_DIR
+
+def import_legacy_backups():
+    """Import every legacy backup file not yet in the store"""
+    print(f"📦 Importing legacy backups from {BACKUP_DIR}...")
+    try:
+        imported = backup_store.import_legacy_backups(BACKUP_DIR)
+    except Exception as e:
+        print(f"❌ Error importing legacy backups: {e}")
+        return False
+    if imported:
+        print(f"✅ Imported {imported} legacy backups into the backup store")
+    else:
+        print("✅ No legacy backups left to import")
+    return True
+
+if __name__ == '__main__':
+    print("Oleema Legacy Backup Import")
+    print("=" * 30)
+
+    success = import_legacy_backups()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Bulk import work logs from a CSV or JSON file
+Usage:
+    python import_work_logs.py FILE                 # import, format from the extension
+    python import_work_logs.py FILE --format json   # csv or json (array or one object per line)
+    python import_work_logs.py FILE --dry-run       # validate and report, save nothing
+    python import_work_logs.py FILE --errors errors.csv   # write every rejected row to a CSV
+See work_log_import.py for the expected columns.
+"""
+
+import argparse
+import csv
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db, startup
+from work_log_import import import_work_logs, format_from_filename, ImportFormatError
+
+# Errors printed to the console; --errors writes all of them
+ERRORS_PRINTED = 20
+
+def write_errors(path, errors):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=['line', 'error'])
+        writer.writeheader()
+        writer.writerows(errors)
+
+def run_import(path, file_format, dry_run, errors_path):
+    """Import one file and print a summary"""
+    with app.app_context():
+        print(f"📥 {'Checking' if dry_run else 'Importing'} {path} as {file_format}...")
+        try:
+            with open(path, 'rb') as f:
+                report = import_work_logs(f, file_format, dry_run=dry_run)
+        except (OSError, ImportFormatError, UnicodeDecodeError) as e:
+            print(f"❌ Import failed: {e}")
+            return False
+
+        verb = 'would be imported' if dry_run else 'imported'
+        print(f"✅ {report.imported} of {report.rows_read} rows {verb} in {report.duration:.2f}s")
+
+        if report.overages:
+            print(f"⚠️  {len(report.overages)} order/process combinations are over the order quantity:")
+            for overage in report.overages:
+                print(f"  - {overage['order_no']} / {overage['process']}: {overage['overage_units']} units over")
+
+        if report.errors:
+            print(f"❌ {len(report.errors)} rows were rejected:")
+            for error in report.errors[:ERRORS_PRINTED]:
+                print(f"  - line {error['line']}: {error['error']}")
+            if len(report.errors) > ERRORS_PRINTED:
+                print(f"  ... and {len(report.errors) - ERRORS_PRINTED} more")
+            if errors_path:
+                write_errors(errors_path, report.errors)
+                print(f"📝 All rejected rows written to {errors_path}")
+
+        if dry_run:
+            print("ℹ️  Dry run: nothing was saved")
+        return not report.errors
+
+if __name__ == '__main__':
+    print("Oleema Work Log Import")
+    print("=" * 30)
+
+    parser = argparse.ArgumentParser(description='Bulk import work logs from CSV or JSON')
+    parser.add_argument('file')
+    parser.add_argument('--format', choices=['csv', 'json'])
+    parser.add_argument('--dry-run', action='store_true')
+    parser.add_argument('--errors', metavar='PATH', help='write rejected rows to this CSV file')
+    args = parser.parse_args()
+
+    startup()
+    success = run_import(args.file, args.format or format_from_filename(args.file), args.dry_run, args.errors)
+    sys.exit(0 if success else 1)
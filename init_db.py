@@ -1,12 +1,13 @@
-from app import app, db
-from models import User, Employee, Process, Order, WorkLog, Payment, OrderStatus, Overage, WorkLogOverage
+from app import app, db, startup
+from models import User, Employee, Process, Order, WorkLog, Payment, OrderStatus, Overage, WorkLogOverage, OrderProcessTotal
+from migrations import upgrade_database
 from datetime import datetime, date
 from werkzeug.security import generate_password_hash
 
 def init_db():
     with app.app_context():
-        # Create all tables
-        db.create_all()
+        # Create all tables (or migrate an existing database)
+        upgrade_database()
         
         # Create default user if not exists
         if not User.query.first():
@@ -31,4 +32,5 @@ def init_db():
         print("Database initialized successfully!")
 
 if __name__ == '__main__':
+    startup(upgrade=False)
     init_db() 
\ No newline at end of file
@@ -0,0 +1,155 @@
+"""
+Referential integrity checks
+Older databases were written without SQLite's foreign key enforcement, so
+rows can point at employees, orders or processes that no longer exist. Every
+foreign key declared in models.py gets one check: a single anti-join
+(LEFT JOIN parent ... WHERE parent is missing) that finds child rows whose
+reference is dangling, or NULL where the column is required.
+
+Repairs delete the offending rows (or set an optional reference to NULL) in
+chunks by primary key, one short transaction per chunk. Rows that reference
+a row being deleted are removed (or unlinked) first, so the delete passes
+SQLite's foreign key enforcement. Deleted and updated rows are published to
+change_tracking, so running totals, payroll and overages stay in step with
+what was removed. Tables are checked parents first and derived tables last,
+so rows orphaned by an earlier repair are caught by a later check.
+"""
+
+from collections import namedtuple
+from sqlalchemy import select, func, and_, or_, tuple_
+from models import db
+from change_tracking import ModelChange, publish_changes
+
+# Primary keys per DELETE/UPDATE; also the unit of commit
+REPAIR_CHUNK_SIZE = 500
+
+# Offending primary keys listed per check in a report
+SAMPLE_SIZE = 10
+
+class IntegrityCheck(namedtuple('IntegrityCheck', ['table', 'column', 'parent', 'parent_column', 'required'])):
+    """One foreign key: table.column -> parent.parent_column"""
+
+    @property
+    def name(self):
+        return f"{self.table.name}.{self.column.name} -> {self.parent.name}"
+
+    @property
+    def repair(self):
+        return 'delete' if self.required else 'set NULL'
+
+# Maintained from work_logs by flush handlers; repairing work_logs first lets
+# the handlers update these before their own orphans are removed
+DERIVED_TABLES = ('order_process_totals', 'daily_employee_rollups', 'daily_order_rollups',
+                  'payments', 'work_log_overages')
+
+CheckResult = namedtuple('CheckResult', ['check', 'count', 'sample', 'repaired'])
+
+def integrity_checks(tables=None):
+    """Checks for every foreign key in the models, parent tables first and derived tables last"""
+    checks = []
+    ordered = sorted(db.metadata.sorted_tables, key=lambda table: table.name in DERIVED_TABLES)
+    for table in ordered:
+        if tables and table.name not in tables:
+            continue
+        for foreign_key in sorted(table.foreign_keys, key=lambda fk: fk.parent.name):
+            checks.append(IntegrityCheck(
+                table, foreign_key.parent, foreign_key.column.table, foreign_key.column,
+                required=not foreign_key.parent.nullable
+            ))
+    return checks
+
+def _primary_key(table):
+    columns = list(table.primary_key.columns)
+    return columns[0] if len(columns) == 1 else tuple_(*columns)
+
+def _violation(check):
+    """(FROM clause, WHERE clause) matching the rows that break the check"""
+    joined = check.table.outerjoin(check.parent, check.parent_column == check.column)
+    dangling = and_(check.column.isnot(None), check.parent_column.is_(None))
+    if check.required:
+        return joined, or_(check.column.is_(None), dangling)
+    return joined, dangling
+
+def _key_values(row):
+    return row[0] if len(row) == 1 else tuple(row)
+
+def find_violations(check, limit=None):
+    """Primary keys of the rows that break the check"""
+    joined, condition = _violation(check)
+    columns = list(check.table.primary_key.columns)
+    query = select(*columns).select_from(joined).where(condition).order_by(*columns)
+    if limit is not None:
+        query = query.limit(limit)
+    return [_key_values(row) for row in db.session.execute(query)]
+
+def count_violations(check):
+    joined, condition = _violation(check)
+    return db.session.execute(select(func.count()).select_from(joined).where(condition)).scalar()
+
+def _dependents(table):
+    """(child table, column, referenced column) for every foreign key pointing at table"""
+    for child in db.metadata.sorted_tables:
+        for foreign_key in child.foreign_keys:
+            if foreign_key.column.table is table:
+                yield child, foreign_key.parent, foreign_key.column
+
+def _delete_rows(table, rows, changes):
+    """Delete rows, children first; appends the published changes in the order they happened"""
+    for child, column, referenced in _dependents(table):
+        values = sorted({row[referenced.name] for row in rows} - {None})
+        if not values:
+            continue
+        child_rows = db.session.execute(select(child).where(column.in_(values))).mappings().all()
+        if not child_rows:
+            continue
+        if column.nullable:
+            db.session.execute(child.update().where(column.in_(values)).values({column.name: None}))
+            for row in child_rows:
+                new = dict(row, **{column.name: None})
+                changes.append(ModelChange(child.name, 'update', dict(row), new, {column.name}))
+        else:
+            _delete_rows(child, child_rows, changes)
+
+    key = _primary_key(table)
+    key_columns = list(table.primary_key.columns)
+    keys = [_key_values([row[column.name] for column in key_columns]) for row in rows]
+    db.session.execute(table.delete().where(key.in_(keys)))
+    changes.extend(ModelChange(table.name, 'delete', dict(row), None, set(row.keys())) for row in rows)
+
+def _repair_chunk(check, keys):
+    table = check.table
+    key = _primary_key(table)
+    rows = db.session.execute(select(table).where(key.in_(keys))).mappings().all()
+    changes = []
+    if check.required:
+        _delete_rows(table, rows, changes)
+    else:
+        db.session.execute(table.update().where(key.in_(keys)).values({check.column.name: None}))
+        for row in rows:
+            new = dict(row, **{check.column.name: None})
+            changes.append(ModelChange(table.name, 'update', dict(row), new, {check.column.name}))
+    publish_changes(db.session, changes)
+    db.session.commit()
+
+def run_check(check, fix=False):
+    """Count (and with fix=True repair) the rows that break one check"""
+    count = count_violations(check)
+    sample = find_violations(check, SAMPLE_SIZE) if count else []
+    repaired = 0
+    if fix and count:
+        keys = find_violations(check)
+        try:
+            for start in range(0, len(keys), REPAIR_CHUNK_SIZE):
+                chunk = keys[start:start + REPAIR_CHUNK_SIZE]
+                _repair_chunk(check, chunk)
+                repaired += len(chunk)
+        except Exception:
+            db.session.rollback()
+            raise
+    return CheckResult(check, count, sample, repaired)
+
+def check_integrity(tables=None, fix=False):
+    """Run every check (optionally only for some child tables) in dependency order"""
+    results = [run_check(check, fix) for check in integrity_checks(tables)]
+    db.session.rollback()
+    return results
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Apply or inspect schema migrations
+Usage:
+    python migrate.py            # apply pending migrations
+    python migrate.py --status   # show the schema version and pending migrations
+Migrations are also applied automatically when the app starts.
+"""
+
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db, startup
+from migrations import MIGRATIONS, get_schema_version, pending_migrations, upgrade_database
+
+def show_status():
+    """Print the current schema version and anything still pending"""
+    with app.app_context():
+        connection = db.session.connection()
+        version = get_schema_version(connection)
+        pending = pending_migrations(connection)
+        print(f"📋 Schema version {version} (latest {MIGRATIONS[-1][0]})")
+        if not pending:
+            print("✅ Database schema is up to date")
+        for number, description, _ in pending:
+            print(f"  - pending {number}: {description}")
+        return True
+
+def migrate():
+    """Apply pending migrations"""
+    with app.app_context():
+        try:
+            applied = upgrade_database()
+            if applied:
+                print(f"✅ Applied {len(applied)} migration(s)")
+            else:
+                print("✅ Database schema is up to date")
+            return True
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            return False
+
+if __name__ == '__main__':
+    print("Oleema Schema Migrations")
+    print("=" * 30)
+
+    # Pending migrations are left for migrate() (or reported by --status)
+    startup(upgrade=False)
+
+    if '--status' in sys.argv[1:]:
+        success = show_status()
+    else:
+        success = migrate() and show_status()
+
+    sys.exit(0 if success else 1)
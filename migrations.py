@@ -0,0 +1,127 @@
+"""
+Versioned schema migrations
+db.create_all() only creates missing tables, so indexes and columns added
+after a database was first created never reach deployed oleema.db files.
+The schema version is kept in SQLite's PRAGMA user_version and every
+migration newer than it is applied in order at startup. A new database is
+created from the models and stamped with the latest version directly.
+
+Migrations must be safe to re-run: if one fails part way the version is not
+bumped and the whole migration is retried on the next start.
+"""
+
+from sqlalchemy import inspect, text
+from models import db
+
+def get_schema_version(connection):
+    return connection.exec_driver_sql('PRAGMA user_version').scalar()
+
+def _set_schema_version(connection, version):
+    # PRAGMA does not accept bound parameters
+    connection.exec_driver_sql(f'PRAGMA user_version = {int(version)}')
+
+def _create_table(connection, table_name):
+    db.metadata.tables[table_name].create(bind=connection, checkfirst=True)
+
+def _create_index(connection, table_name, index_name):
+    """Create an index declared in models.py if it does not exist yet"""
+    table = db.metadata.tables[table_name]
+    index = next(index for index in table.indexes if index.name == index_name)
+    index.create(bind=connection, checkfirst=True)
+
+def _add_column(connection, table_name, column_ddl):
+    """ALTER TABLE ... ADD COLUMN unless the column already exists (column_ddl starts with its name)"""
+    column_name = column_ddl.split()[0]
+    existing = {column['name'] for column in inspect(connection).get_columns(table_name)}
+    if column_name not in existing:
+        connection.exec_driver_sql(f'ALTER TABLE {table_name} ADD COLUMN {column_ddl}')
+
+def _order_process_totals(connection):
+    from order_totals import rebuild_order_process_totals
+    _create_table(connection, 'order_process_totals')
+    rebuild_order_process_totals()
+
+def _unique_monthly_payments(connection):
+    # Older versions could store the same employee/month twice; keep the newest row
+    connection.execute(text(
+        'DELETE FROM payments WHERE id NOT IN ('
+        'SELECT MAX(id) FROM payments GROUP BY employee_id, month, year)'
+    ))
+    _create_index(connection, 'payments', 'uq_payments_employee_month')
+
+def _query_indexes(connection):
+    _create_index(connection, 'work_logs', 'ix_work_logs_employee_date')
+    _create_index(connection, 'work_logs', 'ix_work_logs_order_process')
+    _create_index(connection, 'work_logs', 'ix_work_logs_date_id')
+    _create_index(connection, 'overages', 'ix_overages_order_process_status')
+    _create_index(connection, 'orders', 'ix_orders_status')
+
+def _overage_attributions(connection):
+    from overage_attribution import attribute_all_overages
+    _create_index(connection, 'work_log_overages', 'ix_work_log_overages_overage')
+    _create_index(connection, 'work_log_overages', 'ix_work_log_overages_work_log')
+    attribute_all_overages()
+
+def _table_versions(connection):
+    from table_versions import VERSIONED_TABLES, bump_table_versions
+    _create_table(connection, 'table_versions')
+    bump_table_versions(connection, VERSIONED_TABLES)
+
+def _search_index(connection):
+    # FTS5 table and triggers are not declared in the models
+    from search_index import rebuild_search_index
+    rebuild_search_index(connection)
+
+def _orders_keyset_index(connection):
+    # Orders list pages seek by (created_at, id)
+    _create_index(connection, 'orders', 'ix_orders_created_at_id')
+
+def _daily_rollups(connection):
+    from rollups import rebuild_rollups
+    _create_table(connection, 'daily_employee_rollups')
+    _create_table(connection, 'daily_order_rollups')
+    rebuild_rollups(connection=connection)
+
+# (version, description, migration(connection)); append only, never renumber
+MIGRATIONS = [
+    (1, 'order/process running totals', _order_process_totals),
+    (2, 'one payments row per employee and month', _unique_monthly_payments),
+    (3, 'indexes for report, listing and overage queries', _query_indexes),
+    (4, 'attribute pending overages to work logs', _overage_attributions),
+    (5, 'version counters for reference data ETags', _table_versions),
+    (6, 'full-text search over notes', _search_index),
+    (7, 'daily employee and order rollups of work logs', _daily_rollups),
+    (8, 'index for orders list pages', _orders_keyset_index),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def pending_migrations(connection):
+    version = get_schema_version(connection)
+    return [migration for migration in MIGRATIONS if migration[0] > version]
+
+def upgrade_database():
+    """
+    Create a new database from the models or bring an existing one up to date.
+    Returns the descriptions of the migrations applied.
+    """
+    connection = db.session.connection()
+    if 'users' not in inspect(connection).get_table_names():
+        db.create_all()
+        _search_index(db.session.connection())
+        _set_schema_version(db.session.connection(), LATEST_VERSION)
+        db.session.commit()
+        return []
+
+    applied = []
+    for version, description, migration in pending_migrations(connection):
+        try:
+            migration(db.session.connection())
+            _set_schema_version(db.session.connection(), version)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        print(f"Applied schema migration {version}: {description}")
+        applied.append(description)
+    return applied
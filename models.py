@@ -59,6 +59,10 @@ class Process(db.Model):
 class Order(db.Model):
     """Order model"""
     __tablename__ = 'orders'
+    __table_args__ = (
+        db.Index('ix_orders_status', 'status'),
+        db.Index('ix_orders_created_at_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     order_no = db.Column(db.String(50), unique=True, nullable=False)
@@ -80,6 +84,11 @@ class Order(db.Model):
 class WorkLog(db.Model):
     """Work log model to track employee work on orders"""
     __tablename__ = 'work_logs'
+    __table_args__ = (
+        db.Index('ix_work_logs_employee_date', 'employee_id', 'date'),
+        db.Index('ix_work_logs_order_process', 'order_id', 'process_id'),
+        db.Index('ix_work_logs_date_id', 'date', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=False)
@@ -94,9 +103,60 @@ class WorkLog(db.Model):
     def __repr__(self):
         return f'<WorkLog {self.employee.name} - {self.order.order_no} - {self.process.name}>'
 
+class OrderProcessTotal(db.Model):
+    """Running total of work logged per order and process (maintained from work_logs)"""
+    __tablename__ = 'order_process_totals'
+    
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), primary_key=True)
+    process_id = db.Column(db.Integer, db.ForeignKey('processes.id'), primary_key=True)
+    total_quantity = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<OrderProcessTotal {self.order_id}-{self.process_id}: {self.total_quantity}>'
+
+class DailyEmployeeRollup(db.Model):
+    """Work logged per day, employee and process (maintained from work_logs)"""
+    __tablename__ = 'daily_employee_rollups'
+    __table_args__ = (
+        db.Index('ix_daily_employee_rollups_employee_date', 'employee_id', 'date'),
+    )
+
+    date = db.Column(db.Date, primary_key=True)
+    employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'), primary_key=True)
+    process_id = db.Column(db.Integer, db.ForeignKey('processes.id'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    hours = db.Column(db.Float, nullable=False, default=0.0)
+    labour_cost = db.Column(db.Float, nullable=False, default=0.0)
+    work_log_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DailyEmployeeRollup {self.date} {self.employee_id}-{self.process_id}: {self.quantity}>'
+
+class DailyOrderRollup(db.Model):
+    """Work logged per day, order and process (maintained from work_logs)"""
+    __tablename__ = 'daily_order_rollups'
+    __table_args__ = (
+        db.Index('ix_daily_order_rollups_order_date', 'order_id', 'date'),
+    )
+
+    date = db.Column(db.Date, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), primary_key=True)
+    process_id = db.Column(db.Integer, db.ForeignKey('processes.id'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    hours = db.Column(db.Float, nullable=False, default=0.0)
+    labour_cost = db.Column(db.Float, nullable=False, default=0.0)
+    work_log_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DailyOrderRollup {self.date} {self.order_id}-{self.process_id}: {self.quantity}>'
+
 class Payment(db.Model):
     """Payment model for calculated payments"""
     __tablename__ = 'payments'
+    __table_args__ = (
+        db.Index('uq_payments_employee_month', 'employee_id', 'month', 'year', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=False)
@@ -132,6 +192,9 @@ class OrderStatus(db.Model):
 class Overage(db.Model):
     """Overage tracking model"""
     __tablename__ = 'overages'
+    __table_args__ = (
+        db.Index('ix_overages_order_process_status', 'order_id', 'process_id', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
@@ -156,6 +219,10 @@ class Overage(db.Model):
 class WorkLogOverage(db.Model):
     """Work log overage tracking - tracks which work logs contributed to overages"""
     __tablename__ = 'work_log_overages'
+    __table_args__ = (
+        db.Index('ix_work_log_overages_overage', 'overage_id'),
+        db.Index('ix_work_log_overages_work_log', 'work_log_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     overage_id = db.Column(db.Integer, db.ForeignKey('overages.id'), nullable=False)
@@ -168,4 +235,15 @@ class WorkLogOverage(db.Model):
     work_log = db.relationship('WorkLog', backref='overage_contributions')
     
     def __repr__(self):
-        return f'<WorkLogOverage {self.work_log.employee.name} - {self.overage_units} units>' 
\ No newline at end of file
+        return f'<WorkLogOverage {self.work_log.employee.name} - {self.overage_units} units>'
+
+class TableVersion(db.Model):
+    """Version of a table's contents, bumped in the transaction that changes it (see table_versions.py)"""
+    __tablename__ = 'table_versions'
+    
+    table_name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<TableVersion {self.table_name} v{self.version}>'
@@ -0,0 +1,142 @@
+"""
+Order progress
+Per-process totals, completion and labour cost of an order come from one
+grouped query over work_logs joined to processes, instead of filtering the
+order's work logs in Python once per process. Results are cached per order
+and dropped when that order, its work logs or a process rate changes.
+"""
+
+import threading
+from collections import OrderedDict
+from sqlalchemy import select, func, and_, or_
+from models import db, Order, Process, WorkLog
+from change_tracking import on_commit
+from database_restore import on_restore
+
+# Orders kept in the cache
+MAX_CACHED_ORDERS = 256
+
+def compute_order_progress(order_id, order_quantity):
+    """
+    {'total_processed', 'total_payment', 'log_count', 'progress_percent',
+     'process_progress': {process name: {'total', 'completion', 'payment'}}}
+    process_progress lists every active process (and inactive ones with work);
+    the payment and totals cover all of the order's work logs.
+    """
+    rows = db.session.execute(
+        select(
+            Process.name,
+            Process.is_active,
+            func.coalesce(func.sum(WorkLog.quantity), 0),
+            func.coalesce(func.sum(WorkLog.quantity * Process.pay_rate), 0.0),
+            func.count(WorkLog.id)
+        )
+        .select_from(Process)
+        .outerjoin(WorkLog, and_(WorkLog.process_id == Process.id, WorkLog.order_id == order_id))
+        .group_by(Process.id)
+        .having(or_(Process.is_active == True, func.count(WorkLog.id) > 0))
+        .order_by(Process.id)
+    ).all()
+
+    process_progress = {}
+    total_processed = 0
+    total_payment = 0.0
+    log_count = 0
+    for name, is_active, quantity, payment, count in rows:
+        total_processed += quantity
+        total_payment += payment
+        log_count += count
+        if is_active:
+            completion = min(quantity / order_quantity * 100, 100) if order_quantity > 0 else 0
+            process_progress[name] = {'total': quantity, 'completion': completion, 'payment': payment}
+
+    # Overall progress (average of all processes that have work)
+    active_processes = [p for p in process_progress.values() if p['total'] > 0]
+    progress_percent = sum(p['completion'] for p in active_processes) / len(active_processes) if active_processes else 0
+
+    return {
+        'total_processed': total_processed,
+        'total_payment': total_payment,
+        'log_count': log_count,
+        'progress_percent': progress_percent,
+        'process_progress': process_progress,
+    }
+
+class OrderProgressCache:
+    """LRU of computed progress per order"""
+
+    def __init__(self, max_orders=MAX_CACHED_ORDERS):
+        self.max_orders = max_orders
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # order_id -> progress
+        # Lookups computing each order's progress right now, and how often the
+        # order was invalidated since the first of them started, so a result
+        # computed before an invalidation is not stored. Both only hold orders
+        # with a lookup in flight.
+        self._lookups = {}
+        self._generations = {}
+        self._clears = 0
+
+    def get(self, order):
+        with self._lock:
+            progress = self._entries.get(order.id)
+            if progress is not None:
+                self._entries.move_to_end(order.id)
+                return progress
+            self._lookups[order.id] = self._lookups.get(order.id, 0) + 1
+            token = (self._clears, self._generations.get(order.id, 0))
+        progress = None
+        try:
+            progress = compute_order_progress(order.id, order.quantity)
+        finally:
+            with self._lock:
+                if progress is not None and token == (self._clears, self._generations.get(order.id, 0)):
+                    self._entries[order.id] = progress
+                    while len(self._entries) > self.max_orders:
+                        self._entries.popitem(last=False)
+                self._lookups[order.id] -= 1
+                if not self._lookups[order.id]:
+                    del self._lookups[order.id]
+                    self._generations.pop(order.id, None)
+        return progress
+
+    def invalidate(self, order_ids):
+        with self._lock:
+            for order_id in order_ids:
+                self._entries.pop(order_id, None)
+                if order_id in self._lookups:
+                    self._generations[order_id] = self._generations.get(order_id, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+            self._clears += 1
+
+order_progress_cache = OrderProgressCache()
+
+def get_order_progress(order):
+    return order_progress_cache.get(order)
+
+@on_commit('work_logs')
+def _invalidate_progress_for_work_logs(changes):
+    order_ids = set()
+    for change in changes:
+        for values in (change.old, change.new):
+            if values:
+                order_ids.add(values['order_id'])
+    order_progress_cache.invalidate(order_ids)
+
+@on_commit('orders')
+def _invalidate_progress_for_orders(changes):
+    order_progress_cache.invalidate({(change.old or change.new)['id'] for change in changes})
+
+@on_commit('processes')
+def _invalidate_progress_for_processes(changes):
+    # A rate, name or active flag shows on every order's progress
+    if any(change.changed & {'pay_rate', 'name', 'is_active'} for change in changes):
+        order_progress_cache.clear()
+
+@on_restore
+def _clear_progress_after_restore():
+    order_progress_cache.clear()
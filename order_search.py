@@ -0,0 +1,167 @@
+"""
+In-memory order typeahead index
+Order numbers, colors and sizes are kept in a sorted list of lower-cased
+search keys, so prefix matches are a binary search plus a short scan and an
+order-number existence check is a set lookup; neither touches SQLite. The
+index is loaded on first use and kept in step by a commit handler on orders.
+Writes made by another process are picked up by comparing the orders table
+version (see table_versions.py), at most once every RECHECK_SECONDS; our own
+commits move the index to the version they produced without a reload.
+"""
+
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from sqlalchemy import select
+from models import db, Order
+from change_tracking import on_commit
+from database_restore import on_restore
+from table_versions import get_table_versions
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+# Seconds between checks for order changes made by other processes
+RECHECK_SECONDS = 10
+
+OPEN_ORDER_STATUSES = ('pending', 'in_progress')
+
+_WORD = re.compile(r'[^\W_]+')
+
+def _search_keys(order_no, color, size):
+    """(key, field rank) pairs: whole values and their words, order number first"""
+    keys = set()
+    for rank, value in enumerate((order_no, color, size)):
+        value = (value or '').lower()
+        if value:
+            keys.add((value, rank))
+            keys.update((word, rank) for word in _WORD.findall(value))
+    return keys
+
+class OrderSearchIndex:
+    """Sorted prefix index over order_no, color and size"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._orders = {}  # id -> {'id', 'order_no', 'color', 'size', 'quantity', 'status'}
+        self._order_nos = {}  # order_no -> id (exact, case-sensitive like the unique index)
+        self._keys = []  # sorted (key, rank, id)
+        self._loaded = False
+        self._version = None
+        self._checked = 0.0
+
+    # Maintenance
+
+    def _add(self, order):
+        self._orders[order['id']] = order
+        self._order_nos[order['order_no']] = order['id']
+        for key, rank in _search_keys(order['order_no'], order['color'], order['size']):
+            insort(self._keys, (key, rank, order['id']))
+
+    def _remove(self, order_id):
+        order = self._orders.pop(order_id, None)
+        if order is None:
+            return
+        if self._order_nos.get(order['order_no']) == order_id:
+            del self._order_nos[order['order_no']]
+        for key, rank in _search_keys(order['order_no'], order['color'], order['size']):
+            position = bisect_left(self._keys, (key, rank, order_id))
+            if position < len(self._keys) and self._keys[position] == (key, rank, order_id):
+                del self._keys[position]
+
+    def _load(self):
+        rows = db.session.execute(
+            select(Order.id, Order.order_no, Order.color, Order.size, Order.quantity, Order.status)
+        ).mappings().all()
+        self._orders = {}
+        self._order_nos = {}
+        keys = []
+        for row in rows:
+            order = dict(row)
+            self._orders[order['id']] = order
+            self._order_nos[order['order_no']] = order['id']
+            keys.extend((key, rank, order['id']) for key, rank in _search_keys(order['order_no'], order['color'], order['size']))
+        self._keys = sorted(keys)
+        self._loaded = True
+
+    def _ensure_current(self):
+        """Load on first use and reload if another process changed orders (called with the lock held)"""
+        now = time.monotonic()
+        if self._loaded and now - self._checked < RECHECK_SECONDS:
+            return
+        version = get_table_versions('orders')['orders']
+        if not self._loaded or version != self._version:
+            self._load()
+        self._version = version
+        self._checked = now
+
+    def apply_changes(self, changes):
+        with self._lock:
+            if not self._loaded:
+                return
+            for change in changes:
+                if change.table == 'table_versions':
+                    if change.new['table_name'] == 'orders':
+                        # Our version plus this commit is the new one, unless
+                        # another process committed in between: then reload
+                        # at the next recheck
+                        self._version = change.new['version'] if change.old['version'] == self._version else None
+                    continue
+                if change.old:
+                    self._remove(change.old['id'])
+                if change.new:
+                    self._add({key: change.new[key] for key in ('id', 'order_no', 'color', 'size', 'quantity', 'status')})
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+
+    # Lookups
+
+    def exists(self, order_no):
+        with self._lock:
+            self._ensure_current()
+            return order_no in self._order_nos
+
+    def search(self, query, limit=DEFAULT_LIMIT, open_only=False):
+        """Orders matching every word of query by prefix, best matches first"""
+        terms = _WORD.findall((query or '').lower())
+        if not terms:
+            return []
+        exact = (query or '').strip()
+        with self._lock:
+            self._ensure_current()
+            matched = None
+            best_rank = {}
+            for term in terms:
+                ids = {}
+                position = bisect_left(self._keys, (term,))
+                while position < len(self._keys) and self._keys[position][0].startswith(term):
+                    key, rank, order_id = self._keys[position]
+                    ids[order_id] = min(rank, ids.get(order_id, rank))
+                    position += 1
+                matched = set(ids) if matched is None else matched & set(ids)
+                for order_id, rank in ids.items():
+                    best_rank[order_id] = min(rank, best_rank.get(order_id, rank))
+                if not matched:
+                    return []
+            orders = [self._orders[order_id] for order_id in matched]
+        if open_only:
+            orders = [order for order in orders if order['status'] in OPEN_ORDER_STATUSES]
+        orders.sort(key=lambda order: (
+            order['order_no'] != exact,
+            best_rank[order['id']],
+            order['order_no'].lower()
+        ))
+        return [dict(order) for order in orders[:limit]]
+
+order_search_index = OrderSearchIndex()
+
+@on_commit('orders', 'table_versions')
+def _update_order_index(changes):
+    order_search_index.apply_changes(changes)
+
+@on_restore
+def _reload_order_index_after_restore():
+    order_search_index.invalidate()
@@ -0,0 +1,133 @@
+"""
+Running totals of work logged per order and process
+order_process_totals holds SUM(work_logs.quantity) for every order/process
+pair. It is updated in the same transaction as each work log insert, edit
+and delete, and can be rebuilt from work_logs at any time.
+"""
+
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import select, func, literal, union_all
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, WorkLog, OrderProcessTotal
+from change_tracking import on_flush
+from sqlite_profile import report_connection
+
+# Keep IN (...) lists well below SQLite's bound parameter limit
+LOOKUP_CHUNK_SIZE = 500
+
+def work_log_quantity_deltas(changes):
+    """Net quantity change per (order_id, process_id) for a list of work log changes"""
+    deltas = defaultdict(int)
+    for change in changes:
+        if change.old:
+            deltas[(change.old['order_id'], change.old['process_id'])] -= change.old['quantity'] or 0
+        if change.new:
+            deltas[(change.new['order_id'], change.new['process_id'])] += change.new['quantity'] or 0
+    return {key: delta for key, delta in deltas.items() if delta}
+
+def apply_quantity_deltas(connection, deltas):
+    """Add quantity deltas to the running totals, creating rows as needed"""
+    if not deltas:
+        return
+    table = OrderProcessTotal.__table__
+    now = datetime.utcnow()
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.order_id, table.c.process_id],
+        set_={
+            'total_quantity': table.c.total_quantity + stmt.excluded.total_quantity,
+            'updated_at': stmt.excluded.updated_at,
+        }
+    )
+    connection.execute(stmt, [
+        {'order_id': order_id, 'process_id': process_id, 'total_quantity': delta, 'updated_at': now}
+        for (order_id, process_id), delta in deltas.items()
+    ])
+
+@on_flush('work_logs')
+def _update_totals_on_flush(connection, changes):
+    apply_quantity_deltas(connection, work_log_quantity_deltas(changes))
+
+def get_order_process_total(order_id, process_id):
+    """Total quantity logged for one order/process pair"""
+    total = db.session.query(OrderProcessTotal.total_quantity).filter_by(
+        order_id=order_id,
+        process_id=process_id
+    ).scalar()
+    return total or 0
+
+def get_process_totals_for_order(order_id):
+    """Map process_id -> total quantity logged for one order"""
+    rows = db.session.query(OrderProcessTotal.process_id, OrderProcessTotal.total_quantity).filter_by(
+        order_id=order_id
+    ).all()
+    return {process_id: total for process_id, total in rows}
+
+def get_totals_for_orders(order_ids):
+    """Map (order_id, process_id) -> total quantity logged for the given orders"""
+    order_ids = list(order_ids)
+    totals = {}
+    for start in range(0, len(order_ids), LOOKUP_CHUNK_SIZE):
+        chunk = order_ids[start:start + LOOKUP_CHUNK_SIZE]
+        rows = db.session.query(
+            OrderProcessTotal.order_id,
+            OrderProcessTotal.process_id,
+            OrderProcessTotal.total_quantity
+        ).filter(OrderProcessTotal.order_id.in_(chunk)).all()
+        for order_id, process_id, total in rows:
+            totals[(order_id, process_id)] = total
+    return totals
+
+def delete_totals(order_id=None, process_id=None):
+    """Remove totals rows for a deleted order or process"""
+    query = OrderProcessTotal.query
+    if order_id is not None:
+        query = query.filter_by(order_id=order_id)
+    if process_id is not None:
+        query = query.filter_by(process_id=process_id)
+    return query.delete(synchronize_session=False)
+
+def rebuild_order_process_totals():
+    """Recompute every running total from work_logs (caller commits)"""
+    table = OrderProcessTotal.__table__
+    db.session.execute(table.delete())
+    aggregated = select(
+        WorkLog.order_id,
+        WorkLog.process_id,
+        func.sum(WorkLog.quantity),
+        literal(datetime.utcnow())
+    ).group_by(WorkLog.order_id, WorkLog.process_id)
+    result = db.session.execute(
+        table.insert().from_select(
+            ['order_id', 'process_id', 'total_quantity', 'updated_at'],
+            aggregated
+        )
+    )
+    return result.rowcount
+
+def verify_order_process_totals():
+    """Return (order_id, process_id, stored, actual) for every total that disagrees with work_logs"""
+    stored = select(
+        OrderProcessTotal.order_id.label('order_id'),
+        OrderProcessTotal.process_id.label('process_id'),
+        OrderProcessTotal.total_quantity.label('stored'),
+        literal(0).label('actual')
+    )
+    actual = select(
+        WorkLog.order_id.label('order_id'),
+        WorkLog.process_id.label('process_id'),
+        literal(0).label('stored'),
+        WorkLog.quantity.label('actual')
+    )
+    combined = union_all(stored, actual).subquery()
+    stored_sum = func.sum(combined.c.stored)
+    actual_sum = func.sum(combined.c.actual)
+    with report_connection() as connection:
+        mismatches = connection.execute(
+            select(combined.c.order_id, combined.c.process_id, stored_sum, actual_sum)
+            .group_by(combined.c.order_id, combined.c.process_id)
+            .having(stored_sum != actual_sum)
+            .order_by(combined.c.order_id, combined.c.process_id)
+        ).all()
+    return [tuple(row) for row in mismatches]
@@ -0,0 +1,105 @@
+"""
+Overage attribution
+work_log_overages records which work logs pushed an order/process past the
+order quantity and by how many units, first in first out: logs are ordered
+by (date, created_at, id) and a running SUM() OVER that order finds the log
+that crossed the limit (it gets the part above the limit) and every log
+after it (they get their whole quantity).
+
+Attributions of pending overages are recomputed in one INSERT ... SELECT per
+flush for just the order/process pairs that changed and are over quantity. Resolved overages keep
+the attributions they had when they were resolved.
+"""
+
+from datetime import datetime
+from sqlalchemy import select, func, case, literal, and_, tuple_
+from models import db, Order, WorkLog, Overage, WorkLogOverage
+
+# Pairs per statement; each pair uses two bound parameters
+ATTRIBUTION_CHUNK_SIZE = 400
+
+def _attribution_select(pairs=None):
+    """(overage_id, work_log_id, overage_units) for the pending overages of pairs (all if None)"""
+    work_logs = WorkLog.__table__
+    orders = Order.__table__
+    overages = Overage.__table__
+
+    running_total = func.sum(work_logs.c.quantity).over(
+        partition_by=(work_logs.c.order_id, work_logs.c.process_id),
+        order_by=(work_logs.c.date, work_logs.c.created_at, work_logs.c.id)
+    )
+    ranked = select(
+        work_logs.c.id,
+        work_logs.c.order_id,
+        work_logs.c.process_id,
+        work_logs.c.quantity,
+        running_total.label('running_total')
+    )
+    if pairs is not None:
+        ranked = ranked.where(tuple_(work_logs.c.order_id, work_logs.c.process_id).in_(pairs))
+    ranked = ranked.subquery()
+
+    limit = orders.c.quantity
+    previous_total = ranked.c.running_total - ranked.c.quantity
+    units = case(
+        (previous_total >= limit, ranked.c.quantity),
+        else_=ranked.c.running_total - limit
+    )
+    return select(
+        overages.c.id,
+        ranked.c.id,
+        units,
+        literal(datetime.utcnow())
+    ).select_from(
+        ranked
+        .join(orders, orders.c.id == ranked.c.order_id)
+        .join(overages, and_(
+            overages.c.order_id == ranked.c.order_id,
+            overages.c.process_id == ranked.c.process_id,
+            overages.c.status == 'pending'
+        ))
+    ).where(ranked.c.running_total > limit)
+
+def _pending_overages(connection, pairs=None):
+    """Map pending overage id -> (order_id, process_id)"""
+    overages = Overage.__table__
+    query = select(overages.c.id, overages.c.order_id, overages.c.process_id).where(overages.c.status == 'pending')
+    if pairs is not None:
+        query = query.where(tuple_(overages.c.order_id, overages.c.process_id).in_(pairs))
+    return {overage_id: (order_id, process_id) for overage_id, order_id, process_id in connection.execute(query)}
+
+def _replace_attributions(connection, pairs=None):
+    attributions = WorkLogOverage.__table__
+    pending = _pending_overages(connection, pairs)
+    if not pending:
+        return 0
+    connection.execute(attributions.delete().where(attributions.c.overage_id.in_(list(pending))))
+    if pairs is not None:
+        # Only pairs over their quantity need the running totals
+        pairs = sorted(set(pending.values()))
+    result = connection.execute(
+        attributions.insert().from_select(
+            ['overage_id', 'work_log_id', 'overage_units', 'created_at'],
+            _attribution_select(pairs)
+        )
+    )
+    return result.rowcount
+
+def attribute_overages(connection, pairs):
+    """Recompute attributions of the pending overages for the given (order_id, process_id) pairs"""
+    pairs = sorted(set(pairs))
+    written = 0
+    for start in range(0, len(pairs), ATTRIBUTION_CHUNK_SIZE):
+        written += _replace_attributions(connection, pairs[start:start + ATTRIBUTION_CHUNK_SIZE])
+    return written
+
+def attribute_all_overages():
+    """Recompute attributions of every pending overage (caller commits)"""
+    return _replace_attributions(db.session.connection())
+
+def get_attributions(overage_id):
+    """Map work_log_id -> units that work log contributed to the overage"""
+    rows = db.session.query(WorkLogOverage.work_log_id, WorkLogOverage.overage_units).filter_by(
+        overage_id=overage_id
+    ).all()
+    return {work_log_id: units for work_log_id, units in rows}
@@ -0,0 +1,170 @@
+"""
+Overage ledger
+A pending overage exists exactly while the work logged for an order/process
+exceeds the order quantity. It is kept in step from inside the flush that
+writes the work log, using the running total maintained by order_totals, so
+the check, the work log and the overage row commit or roll back together.
+
+Posting a work log inserts and flushes it first and only then reads the
+total. The insert takes SQLite's write lock, so a second tablet posting to
+the same order/process waits until the first transaction has committed or
+rolled back and then sees its total; two posts cannot both pass the check.
+
+The ledger writes overages with Core statements, so its flush handlers
+return the overage changes they made for commit handlers (the production
+board, report caches) to see.
+"""
+
+from datetime import datetime
+from sqlalchemy import select, and_, tuple_, false
+from models import db, Order, Overage, OrderProcessTotal, WorkLogOverage
+from change_tracking import ModelChange, on_flush
+from overage_attribution import attribute_overages
+# Registers the running totals flush handler before the ones below
+import order_totals
+
+# (order_id, process_id) pairs per IN (...) lookup, two bound variables each
+PAIR_CHUNK_SIZE = 400
+
+def _chunks(keys, key=None):
+    """Sorted keys in slices of PAIR_CHUNK_SIZE"""
+    keys = sorted(keys, key=key)
+    for start in range(0, len(keys), PAIR_CHUNK_SIZE):
+        yield keys[start:start + PAIR_CHUNK_SIZE]
+
+def _order_limits(connection, pairs):
+    """Map order_id -> order quantity for the orders of the given pairs that still exist"""
+    orders = Order.__table__
+    limits = {}
+    for chunk in _chunks({order_id for order_id, _ in pairs}):
+        limits.update(connection.execute(select(orders.c.id, orders.c.quantity).where(orders.c.id.in_(chunk))).all())
+    return limits
+
+def overage_units(order_id, process_id):
+    """Units logged beyond the order quantity for one order/process (0 if within it)"""
+    row = db.session.execute(
+        select(Order.quantity, OrderProcessTotal.total_quantity)
+        .select_from(Order)
+        .outerjoin(OrderProcessTotal, and_(
+            OrderProcessTotal.order_id == Order.id,
+            OrderProcessTotal.process_id == process_id
+        ))
+        .where(Order.id == order_id)
+    ).first()
+    if row is None:
+        return 0
+    limit, total = row
+    return max(0, (total or 0) - (limit or 0))
+
+def lock_for_overage_check(connection):
+    """
+    Take SQLite's write lock before reading totals, so totals read next stay
+    current until this transaction ends (a write that matches no rows still
+    takes the lock). Used when rows are checked before they are inserted.
+    """
+    totals = OrderProcessTotal.__table__
+    connection.execute(totals.update().where(false()).values(total_quantity=totals.c.total_quantity))
+
+def current_totals(connection, pairs):
+    """Map (order_id, process_id) -> (order quantity, units logged so far)"""
+    pairs = sorted(set(pairs))
+    totals = OrderProcessTotal.__table__
+    limits = _order_limits(connection, pairs)
+    logged = {}
+    for chunk in _chunks(pairs):
+        logged.update({
+            (order_id, process_id): total
+            for order_id, process_id, total in connection.execute(
+                select(totals.c.order_id, totals.c.process_id, totals.c.total_quantity)
+                .where(tuple_(totals.c.order_id, totals.c.process_id).in_(chunk))
+            )
+        })
+    return {pair: (limits.get(pair[0]) or 0, logged.get(pair, 0)) for pair in pairs}
+
+def sync_overages(connection, pairs):
+    """
+    Create, update or retire the pending overage of each (order_id, process_id)
+    so it matches the current running total. Resolved overages are history and
+    are never touched. Returns the overage changes made, for commit handlers.
+    """
+    pairs = sorted(set(pairs))
+    if not pairs:
+        return []
+    totals = OrderProcessTotal.__table__
+    overages = Overage.__table__
+    attributions = WorkLogOverage.__table__
+
+    limits = _order_limits(connection, pairs)
+    current = {}
+    pending = {}
+    for chunk in _chunks(pairs):
+        current.update({
+            (order_id, process_id): total
+            for order_id, process_id, total in connection.execute(
+                select(totals.c.order_id, totals.c.process_id, totals.c.total_quantity)
+                .where(tuple_(totals.c.order_id, totals.c.process_id).in_(chunk))
+            )
+        })
+        pending.update({
+            (row['order_id'], row['process_id']): dict(row)
+            for row in connection.execute(
+                select(overages)
+                .where(tuple_(overages.c.order_id, overages.c.process_id).in_(chunk), overages.c.status == 'pending')
+            ).mappings()
+        })
+
+    changes = []
+    retired = []
+    for pair in pairs:
+        if pair[0] not in limits:
+            continue  # order deleted in this transaction
+        limit = limits[pair[0]] or 0
+        total = current.get(pair, 0)
+        old = pending.get(pair)
+        if total > limit:
+            values = {'expected_units': limit, 'actual_units': total, 'overage_units': total - limit}
+            if old:
+                changed = {key for key, value in values.items() if old[key] != value}
+                if changed:
+                    connection.execute(overages.update().where(overages.c.id == old['id']).values(**values))
+                    changes.append(ModelChange('overages', 'update', old, dict(old, **values), changed))
+            else:
+                values.update(order_id=pair[0], process_id=pair[1], status='pending', created_at=datetime.utcnow())
+                result = connection.execute(overages.insert().values(**values))
+                new = dict.fromkeys(overages.c.keys(), None)
+                new.update(values, id=result.inserted_primary_key[0])
+                changes.append(ModelChange('overages', 'insert', None, new, set(new)))
+        elif old:
+            retired.append(old)
+
+    # Back within the order quantity: the overage no longer exists
+    for chunk in _chunks(retired, key=lambda old: old['id']):
+        ids = [old['id'] for old in chunk]
+        connection.execute(attributions.delete().where(attributions.c.overage_id.in_(ids)))
+        connection.execute(overages.delete().where(overages.c.id.in_(ids)))
+        changes.extend(ModelChange('overages', 'delete', old, None, set(old)) for old in chunk)
+
+    # Which work logs caused each remaining pending overage
+    attribute_overages(connection, pairs)
+    return changes
+
+@on_flush('work_logs')
+def _sync_overages_for_work_logs(connection, changes):
+    pairs = set()
+    for change in changes:
+        for values in (change.old, change.new):
+            if values:
+                pairs.add((values['order_id'], values['process_id']))
+    return sync_overages(connection, pairs)
+
+@on_flush('orders')
+def _sync_overages_for_order_quantity(connection, changes):
+    order_ids = [change.new['id'] for change in changes
+                 if change.action == 'update' and 'quantity' in change.changed]
+    if not order_ids:
+        return []
+    totals = OrderProcessTotal.__table__
+    pairs = connection.execute(
+        select(totals.c.order_id, totals.c.process_id).where(totals.c.order_id.in_(order_ids))
+    ).all()
+    return sync_overages(connection, [tuple(pair) for pair in pairs])
@@ -0,0 +1,76 @@
+"""
+Keyset (seek) pagination
+A page is addressed by an opaque cursor holding the sort key of the last row
+already shown, and the next page is fetched with WHERE (key) < (cursor).
+Unlike OFFSET paging the cost of a page does not grow with its position.
+"""
+
+import base64
+import json
+from collections import namedtuple
+from datetime import date, datetime
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+Page = namedtuple('Page', ['items', 'next_cursor'])
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor cannot be decoded for the requested listing"""
+
+def _encode_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def _decode_value(column, value):
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+def encode_cursor(row, columns):
+    """Opaque cursor for the sort key of row"""
+    values = [_encode_value(getattr(row, column.key)) for column in columns]
+    payload = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, columns):
+    """Sort key values from a cursor produced by encode_cursor()"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise InvalidCursor('Cursor does not match this listing')
+        return [_decode_value(column, value) for column, value in zip(columns, values)]
+    except InvalidCursor:
+        raise
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f'Invalid cursor: {e}')
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE):
+    """Clamp a requested page size to 1..MAX_PAGE_SIZE"""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+def keyset_page(query, columns, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    One page of query ordered by columns descending, starting after cursor.
+    columns must end with a unique column (the primary key) so the order is total.
+    """
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        query = query.filter(tuple_(*columns) < tuple_(*values))
+
+    rows = query.order_by(*[column.desc() for column in columns]).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1], columns)
+    return Page(rows, next_cursor)
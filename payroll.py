@@ -0,0 +1,151 @@
+"""
+Monthly payroll
+payments holds one row per employee and month with that month's pieces,
+hours and piece-rate pay. Rows are computed for all employees of a month in
+one grouped query over work_logs joined to processes, and a refresh only
+recomputes employees whose work logs changed since calculated_at.
+"""
+
+from datetime import date, datetime
+from sqlalchemy import select, func, union, or_, and_, update, bindparam
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, WorkLog, Process, Payment
+from change_tracking import on_flush
+
+def month_bounds(month, year):
+    """First day of the month and first day of the following month"""
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
+
+def _stale_employee_ids(month, year):
+    """Employees whose payment row is missing, invalidated or older than their work logs"""
+    start, end = month_bounds(month, year)
+    payments = Payment.__table__
+    work_logs = WorkLog.__table__
+
+    changed_logs = select(work_logs.c.employee_id).select_from(
+        work_logs.outerjoin(payments, and_(
+            payments.c.employee_id == work_logs.c.employee_id,
+            payments.c.month == month,
+            payments.c.year == year
+        ))
+    ).where(
+        work_logs.c.date >= start,
+        work_logs.c.date < end,
+        or_(
+            payments.c.id.is_(None),
+            payments.c.calculated_at.is_(None),
+            work_logs.c.created_at > payments.c.calculated_at
+        )
+    )
+    # Invalidated rows whose logs have all been moved out of the month
+    invalidated = select(payments.c.employee_id).where(
+        payments.c.month == month,
+        payments.c.year == year,
+        payments.c.calculated_at.is_(None)
+    )
+    return {row[0] for row in db.session.execute(union(changed_logs, invalidated))}
+
+def _monthly_totals(month, year, employee_ids=None):
+    """Map employee_id -> (total_quantity, total_hours, total_payment) in one grouped pass"""
+    start, end = month_bounds(month, year)
+    work_logs = WorkLog.__table__
+    processes = Process.__table__
+
+    query = select(
+        work_logs.c.employee_id,
+        func.sum(work_logs.c.quantity),
+        func.sum(func.coalesce(work_logs.c.hours_worked, 0.0)),
+        func.sum(work_logs.c.quantity * func.coalesce(processes.c.pay_rate, 0.0))
+    ).select_from(
+        work_logs.outerjoin(processes, processes.c.id == work_logs.c.process_id)
+    ).where(
+        work_logs.c.date >= start,
+        work_logs.c.date < end
+    ).group_by(work_logs.c.employee_id)
+    if employee_ids is not None:
+        query = query.where(work_logs.c.employee_id.in_(employee_ids))
+
+    return {
+        employee_id: (quantity or 0, hours or 0.0, payment or 0.0)
+        for employee_id, quantity, hours, payment in db.session.execute(query)
+    }
+
+def refresh_monthly_payments(month, year, force=False):
+    """
+    Bring the payments rows for a month up to date (caller commits).
+    Returns the number of employees recomputed.
+    """
+    employee_ids = None if force else _stale_employee_ids(month, year)
+    if employee_ids is not None and not employee_ids:
+        return 0
+
+    totals = _monthly_totals(month, year, None if force else sorted(employee_ids))
+    if employee_ids is not None:
+        # Employees with no logs left in the month are written as zero rows
+        for employee_id in employee_ids:
+            totals.setdefault(employee_id, (0, 0.0, 0.0))
+    if not totals:
+        return 0
+
+    now = datetime.utcnow()
+    table = Payment.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.employee_id, table.c.month, table.c.year],
+        set_={
+            'total_quantity': stmt.excluded.total_quantity,
+            'total_hours': stmt.excluded.total_hours,
+            'total_payment': stmt.excluded.total_payment,
+            'calculated_at': stmt.excluded.calculated_at,
+        }
+    )
+    db.session.execute(stmt, [{
+        'employee_id': employee_id,
+        'month': month,
+        'year': year,
+        'total_quantity': quantity,
+        'total_hours': hours,
+        'total_payment': payment,
+        'calculated_at': now
+    } for employee_id, (quantity, hours, payment) in totals.items()])
+    return len(totals)
+
+def get_monthly_payment(employee_id, month, year):
+    """Up-to-date payment row for one employee and month (None if nothing was logged)"""
+    refresh_monthly_payments(month, year)
+    return Payment.query.filter_by(employee_id=employee_id, month=month, year=year).first()
+
+@on_flush('work_logs')
+def _invalidate_payments_for_work_logs(connection, changes):
+    keys = set()
+    for change in changes:
+        for values in (change.old, change.new):
+            if values and values.get('date'):
+                keys.add((values['employee_id'], values['date'].month, values['date'].year))
+    if not keys:
+        return
+    table = Payment.__table__
+    connection.execute(
+        update(table).where(
+            table.c.employee_id == bindparam('b_employee_id'),
+            table.c.month == bindparam('b_month'),
+            table.c.year == bindparam('b_year')
+        ).values(calculated_at=None),
+        [{'b_employee_id': e, 'b_month': m, 'b_year': y} for e, m, y in keys]
+    )
+
+@on_flush('processes')
+def _invalidate_payments_for_rates(connection, changes):
+    process_ids = [change.new['id'] for change in changes
+                   if change.action == 'update' and 'pay_rate' in change.changed]
+    if not process_ids:
+        return
+    table = Payment.__table__
+    work_logs = WorkLog.__table__
+    connection.execute(
+        update(table).where(table.c.employee_id.in_(
+            select(work_logs.c.employee_id).where(work_logs.c.process_id.in_(process_ids)).distinct()
+        )).values(calculated_at=None)
+    )
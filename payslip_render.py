@@ -0,0 +1,107 @@
+"""
+Payslip rendering for worker processes
+The entry point of the payslip process pool. It only depends on ReportLab, so
+a worker never imports the app, its models or the database layer.
+"""
+
+from datetime import datetime
+from functools import lru_cache
+from io import BytesIO
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+@lru_cache(maxsize=1)
+def _styles():
+    """Paragraph styles, built once per process"""
+    styles = getSampleStyleSheet()
+    return {
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=18,
+            spaceAfter=30,
+            alignment=1  # Center alignment
+        ),
+        'heading': ParagraphStyle(
+            'CustomHeading',
+            parent=styles['Heading2'],
+            fontSize=14,
+            spaceAfter=20
+        ),
+        'normal': styles['Normal'],
+    }
+
+def render_payslip(data):
+    """Render one payslip to PDF bytes"""
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    styles = _styles()
+    story = []
+
+    # Add title
+    story.append(Paragraph("OLEEMA - Payment Report", styles['title']))
+    story.append(Spacer(1, 20))
+
+    # Add employee info
+    story.append(Paragraph(f"Employee: {data['employee_name']} ({data['employee_code']})", styles['heading']))
+    story.append(Paragraph(f"Period: {data['month']}/{data['year']}", styles['normal']))
+    story.append(Spacer(1, 20))
+
+    # Add summary
+    summary_data = [
+        ['Total Pieces', str(data['total_quantity'])],
+        ['Total Payment', f"LKR {data['total_payment']:.2f}"]
+    ]
+    summary_table = Table(summary_data, colWidths=[2*inch, 2*inch])
+    summary_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, -1), colors.lightblue),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    story.append(summary_table)
+    story.append(Spacer(1, 20))
+
+    # Add work logs table if any
+    if data['rows']:
+        story.append(Paragraph("Work Log Details", styles['heading']))
+
+        table_data = [['Date', 'Order', 'Process', 'Pieces', 'Rate/Piece', 'Payment']]
+        for work_date, order_no, process_name, quantity, rate in data['rows']:
+            table_data.append([
+                work_date,
+                order_no,
+                process_name,
+                str(quantity),
+                f"LKR {rate:.2f}",
+                f"LKR {quantity * rate:.2f}"
+            ])
+
+        work_log_table = Table(table_data, colWidths=[1*inch, 1.2*inch, 1.2*inch, 0.8*inch, 1*inch, 1*inch])
+        work_log_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]))
+        story.append(work_log_table)
+    else:
+        story.append(Paragraph("No work logs found for the selected period.", styles['normal']))
+
+    # Add footer
+    story.append(Spacer(1, 30))
+    story.append(Paragraph(f"Report generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", styles['normal']))
+
+    doc.build(story)
+    return buffer.getvalue()
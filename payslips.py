@@ -0,0 +1,180 @@
+"""
+Payslip PDFs
+render_payslip() (in payslip_render.py) turns plain payslip data into a PDF.
+render_payslips() renders a whole month for every active employee across a
+bounded ProcessPoolExecutor and returns either one merged PDF or a ZIP of
+per-employee files.
+"""
+
+import multiprocessing
+import os
+import threading
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from io import BytesIO
+from pypdf import PdfReader, PdfWriter
+from sqlalchemy import select
+from models import db, Employee, Order, Process, WorkLog, Payment
+from payroll import month_bounds, refresh_monthly_payments
+from payslip_render import render_payslip
+from sqlite_profile import report_connection
+
+# Upper bound on render processes regardless of configuration
+MAX_PAYSLIP_WORKERS = 8
+
+# Finished batch jobs kept for download
+MAX_FINISHED_JOBS = 10
+
+def payslip_data(employee, month, year, total_quantity, total_payment, rows):
+    """
+    Plain (picklable) payslip data.
+    rows are (date, order_no, process_name, quantity, rate) tuples.
+    """
+    return {
+        'employee_name': employee.name,
+        'employee_code': employee.employee_id,
+        'month': month,
+        'year': year,
+        'total_quantity': total_quantity,
+        'total_payment': total_payment,
+        'rows': [
+            (work_date.strftime('%Y-%m-%d'), order_no or 'N/A', process_name or 'N/A', quantity, rate or 0)
+            for work_date, order_no, process_name, quantity, rate in rows
+        ],
+    }
+
+def payslip_filename(employee_code, month, year):
+    return f"payment_report_{employee_code}_{year}_{month:02d}.pdf"
+
+def collect_month_payslips(month, year):
+    """Payslip data for every active employee of a month (three queries in total)"""
+    refresh_monthly_payments(month, year)
+    db.session.commit()
+
+    employees = Employee.query.filter_by(is_active=True).order_by(Employee.employee_id).all()
+    payments = {
+        payment.employee_id: payment
+        for payment in Payment.query.filter_by(month=month, year=year).all()
+    }
+
+    start, end = month_bounds(month, year)
+    rows_by_employee = {}
+    with report_connection() as connection:
+        log_rows = connection.execute(
+            select(WorkLog.employee_id, WorkLog.date, Order.order_no, Process.name, WorkLog.quantity, Process.pay_rate)
+            .select_from(WorkLog)
+            .outerjoin(Order, Order.id == WorkLog.order_id)
+            .outerjoin(Process, Process.id == WorkLog.process_id)
+            .where(WorkLog.date >= start, WorkLog.date < end)
+            .order_by(WorkLog.employee_id, WorkLog.date, WorkLog.id)
+        )
+        for employee_id, *row in log_rows:
+            rows_by_employee.setdefault(employee_id, []).append(row)
+
+    payslips = []
+    for employee in employees:
+        payment = payments.get(employee.id)
+        payslips.append(payslip_data(
+            employee, month, year,
+            payment.total_quantity if payment else 0,
+            payment.total_payment if payment else 0,
+            rows_by_employee.get(employee.id, [])
+        ))
+    return payslips
+
+def worker_count(requested=None):
+    """Bounded number of render processes"""
+    available = os.cpu_count() or 1
+    count = requested or available
+    return max(1, min(count, available, MAX_PAYSLIP_WORKERS))
+
+def render_payslips(payslips, output='zip', max_workers=None, progress=None):
+    """
+    Render payslips in a process pool.
+    output is 'zip' (one PDF per employee) or 'pdf' (one merged PDF).
+    progress(done, total) is called as each payslip finishes.
+    """
+    total = len(payslips)
+    rendered = [None] * total
+    if total:
+        # spawn behaves the same on every platform and is safe from threaded servers.
+        # Workers re-run the main module, which is why app.py keeps its setup in startup()
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(worker_count(max_workers), total), mp_context=context) as pool:
+            futures = {pool.submit(render_payslip, data): index for index, data in enumerate(payslips)}
+            for done, future in enumerate(as_completed(futures), start=1):
+                rendered[futures[future]] = future.result()
+                if progress:
+                    progress(done, total)
+
+    buffer = BytesIO()
+    if output == 'pdf':
+        writer = PdfWriter()
+        for pdf in rendered:
+            writer.append(PdfReader(BytesIO(pdf)))
+        writer.write(buffer)
+    else:
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for data, pdf in zip(payslips, rendered):
+                archive.writestr(payslip_filename(data['employee_code'], data['month'], data['year']), pdf)
+    return buffer.getvalue()
+
+def batch_filename(month, year, output):
+    extension = 'pdf' if output == 'pdf' else 'zip'
+    return f"payslips_{year}_{month:02d}.{extension}"
+
+# Background batch jobs so month-end runs never tie up a request thread
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+def start_batch_job(app, month, year, output='zip', max_workers=None):
+    """Start rendering a month's payslips in the background; returns the job id or None if one is running"""
+    with _jobs_lock:
+        if any(job['status'] == 'running' for job in _jobs.values()):
+            return None
+        finished = [job_id for job_id, job in _jobs.items() if job['status'] != 'running']
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS + 1)]:
+            del _jobs[job_id]
+
+        job_id = uuid.uuid4().hex
+        _jobs[job_id] = {
+            'id': job_id,
+            'status': 'running',
+            'month': month,
+            'year': year,
+            'output': output,
+            'done': 0,
+            'total': 0,
+            'error': None,
+            'result': None,
+            'started_at': datetime.now(),
+            'finished_at': None,
+        }
+
+    def progress(done, total):
+        _jobs[job_id]['done'] = done
+        _jobs[job_id]['total'] = total
+
+    def run():
+        job = _jobs[job_id]
+        try:
+            with app.app_context():
+                payslips = collect_month_payslips(month, year)
+                db.session.remove()
+            job['total'] = len(payslips)
+            job['result'] = render_payslips(payslips, output, max_workers, progress)
+            job['status'] = 'finished'
+        except Exception as e:
+            print(f"Error generating payslips for {month}/{year}: {e}")
+            job['error'] = str(e)
+            job['status'] = 'failed'
+        finally:
+            job['finished_at'] = datetime.now()
+
+    threading.Thread(target=run, name=f'payslips-{job_id}', daemon=True).start()
+    return job_id
+
+def get_batch_job(job_id):
+    return _jobs.get(job_id)
@@ -0,0 +1,284 @@
+"""
+Live production board
+Wall screens open one Server-Sent Events stream each. On connect a screen
+gets a snapshot (today's pieces per process, orders in progress with their
+per-process totals, recent work and the pending overage count); after that
+it only receives deltas. A single commit handler turns committed work log,
+order and overage changes into events, looks up the names they need with
+one query per table, encodes each event once and hands the same bytes to
+every connected screen, so the cost of a commit does not grow with the
+number of screens and no screen polls the database.
+"""
+
+import json
+import queue
+import threading
+from datetime import date
+from sqlalchemy import select, func
+from models import db, Employee, Order, Process, WorkLog, Overage, OrderProcessTotal, DailyEmployeeRollup
+from order_totals import get_totals_for_orders, work_log_quantity_deltas
+from change_tracking import on_commit
+from database_restore import on_restore
+from sqlite_profile import report_connection
+
+# Seconds between keep-alive comments; also how soon a closed screen is noticed
+HEARTBEAT_SECONDS = 15
+
+# Events buffered per screen before it is considered stalled and dropped
+MAX_QUEUED_EVENTS = 500
+
+# Milliseconds a browser waits before reconnecting
+RETRY_MS = 3000
+
+# Changes per commit sent as deltas; a bigger commit (e.g. an import) makes
+# screens reload the snapshot instead
+MAX_DELTA_CHANGES = 200
+
+BOARD_ORDERS = 50
+RECENT_WORK_LOGS = 20
+
+# Columns whose changes the board shows
+ORDER_FIELDS = {'status', 'quantity', 'order_no', 'color', 'size'}
+WORK_LOG_FIELDS = {'quantity', 'hours_worked', 'date', 'order_id', 'process_id'}
+
+def encode_event(event, data, event_id=None):
+    """One SSE frame"""
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.extend(f"data: {line}" for line in json.dumps(data, default=str).splitlines())
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+class Subscription:
+    """One connected screen"""
+
+    def __init__(self):
+        self.queue = queue.Queue(MAX_QUEUED_EVENTS)
+        self.closed = False
+
+class Broadcaster:
+    """Fans encoded events out to every subscribed screen"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._sequence = 0
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self):
+        subscription = Subscription()
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event, data):
+        with self._lock:
+            if not self._subscribers:
+                return
+            self._sequence += 1
+            frame = encode_event(event, data, self._sequence)
+            self.published += 1
+            for subscription in list(self._subscribers):
+                try:
+                    subscription.queue.put_nowait(frame)
+                except queue.Full:
+                    # A stalled screen is cut off; its browser reconnects and gets a fresh snapshot
+                    subscription.closed = True
+                    self._subscribers.discard(subscription)
+                    self.dropped += 1
+
+    def stream(self, subscription, snapshot):
+        """Frames for one screen: retry interval, snapshot, then deltas and keep-alives"""
+        try:
+            yield f"retry: {RETRY_MS}\n\n".encode('utf-8')
+            yield encode_event('snapshot', snapshot)
+            while not subscription.closed:
+                try:
+                    yield subscription.queue.get(timeout=HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield b": keep-alive\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self):
+        with self._lock:
+            return {'subscribers': len(self._subscribers), 'published': self.published, 'dropped': self.dropped}
+
+broadcaster = Broadcaster()
+
+# Snapshot
+
+def _work_log_rows(connection_or_session, condition, limit=None):
+    query = (
+        select(WorkLog.id, WorkLog.date, WorkLog.quantity, WorkLog.order_id, WorkLog.process_id,
+               WorkLog.created_at, Employee.name.label('employee'), Order.order_no, Process.name.label('process'))
+        .join(Employee, Employee.id == WorkLog.employee_id)
+        .join(Order, Order.id == WorkLog.order_id)
+        .join(Process, Process.id == WorkLog.process_id)
+        .where(condition)
+        .order_by(WorkLog.created_at.desc(), WorkLog.id.desc())
+    )
+    if limit:
+        query = query.limit(limit)
+    return [dict(row) for row in connection_or_session.execute(query).mappings()]
+
+def _order_row(row, totals):
+    return {
+        'id': row['id'], 'order_no': row['order_no'], 'color': row['color'], 'size': row['size'],
+        'quantity': row['quantity'], 'status': row['status'],
+        'totals': {str(process_id): total for (order_id, process_id), total in totals.items() if order_id == row['id']},
+    }
+
+def board_snapshot():
+    """Everything a screen shows when it connects (reads through the app session)"""
+    today = date.today()
+    processes = db.session.execute(
+        select(Process.id, Process.name).where(Process.is_active == True).order_by(Process.id)
+    ).all()
+    today_totals = db.session.execute(
+        select(DailyEmployeeRollup.process_id, func.sum(DailyEmployeeRollup.quantity),
+               func.sum(DailyEmployeeRollup.hours))
+        .where(DailyEmployeeRollup.date == today)
+        .group_by(DailyEmployeeRollup.process_id)
+    ).all()
+    orders = db.session.execute(
+        select(Order.id, Order.order_no, Order.color, Order.size, Order.quantity, Order.status)
+        .where(Order.status == 'in_progress')
+        .order_by(Order.created_at.desc())
+        .limit(BOARD_ORDERS)
+    ).mappings().all()
+    totals = get_totals_for_orders(order['id'] for order in orders)
+    pending_overages = db.session.execute(
+        select(func.count(Overage.id)).where(Overage.status == 'pending')
+    ).scalar()
+
+    return {
+        'today': today.isoformat(),
+        'processes': [{'id': process_id, 'name': name} for process_id, name in processes],
+        'today_totals': {str(process_id): quantity for process_id, quantity, _ in today_totals},
+        'today_hours': sum(hours or 0 for _, _, hours in today_totals),
+        'orders': [_order_row(order, totals) for order in orders],
+        'recent': _work_log_rows(db.session, WorkLog.date == today, RECENT_WORK_LOGS),
+        'pending_overages': pending_overages,
+    }
+
+# Deltas
+
+def _work_log_values(values):
+    if not values:
+        return None
+    return {key: values[key] for key in ('id', 'date', 'quantity', 'hours_worked', 'order_id', 'process_id')}
+
+def _events_for_orders(connection, changes, work_log_changes):
+    """
+    Orders added, removed or changed in a way the board shows. An order that
+    enters the board carries its totals as they were before work_log_changes,
+    which follow as work log events.
+    """
+    entering = [change.new['id'] for change in changes
+                if change.new and change.new['status'] == 'in_progress'
+                and (not change.old or change.old['status'] != 'in_progress')]
+    totals = {}
+    if entering:
+        totals = {
+            (order_id, process_id): total for order_id, process_id, total in connection.execute(
+                select(OrderProcessTotal.order_id, OrderProcessTotal.process_id, OrderProcessTotal.total_quantity)
+                .where(OrderProcessTotal.order_id.in_(entering))
+            )
+        }
+        for key, delta in work_log_quantity_deltas(work_log_changes).items():
+            if key in totals:
+                totals[key] -= delta
+    events = []
+    for change in changes:
+        if change.new is None:
+            events.append({'id': change.old['id'], 'status': None, 'old_status': change.old['status']})
+        elif change.action == 'insert' or ORDER_FIELDS & change.changed:
+            event = _order_row(change.new, totals)
+            event['old_status'] = change.old['status'] if change.old else None
+            events.append(event)
+    return events
+
+def _events_for_work_logs(connection, changes):
+    """Net change per work log; inserts carry the names shown in the activity feed"""
+    inserted = [change.new['id'] for change in changes if change.action == 'insert']
+    described = {row['id']: row for row in _work_log_rows(connection, WorkLog.id.in_(inserted))} if inserted else {}
+    events = []
+    for change in changes:
+        if change.action == 'update' and not WORK_LOG_FIELDS & change.changed:
+            continue
+        events.append({
+            'action': change.action,
+            'old': _work_log_values(change.old),
+            'new': _work_log_values(change.new),
+            'entry': described.get(change.new['id']) if change.action == 'insert' else None,
+        })
+    return events
+
+def _events_for_overages(connection, changes):
+    ids = [change.new['id'] for change in changes if change.action == 'insert']
+    names = {}
+    if ids:
+        names = {
+            overage_id: (order_no, process) for overage_id, order_no, process in connection.execute(
+                select(Overage.id, Order.order_no, Process.name)
+                .join(Order, Order.id == Overage.order_id)
+                .join(Process, Process.id == Overage.process_id)
+                .where(Overage.id.in_(ids))
+            )
+        }
+    events = []
+    for change in changes:
+        if change.action == 'update' and 'status' not in change.changed:
+            continue
+        values = change.new or change.old
+        order_no, process = names.get(values['id'], (None, None))
+        events.append({
+            'id': values['id'],
+            'status': change.new['status'] if change.new else None,
+            'old_status': change.old['status'] if change.old else None,
+            'overage_units': values['overage_units'],
+            'order_no': order_no,
+            'process': process,
+        })
+    return events
+
+@on_commit('orders', 'work_logs', 'overages')
+def _publish_board_changes(changes):
+    if not broadcaster.subscriber_count:
+        return
+    # A big import reports one sample row per employee/day and order, without ids (see work_log_import.py)
+    summarised = any(change.table == 'work_logs' and (change.new or change.old)['id'] is None for change in changes)
+    if len(changes) > MAX_DELTA_CHANGES or summarised:
+        broadcaster.publish('reset', {})
+        return
+    by_table = {}
+    for change in changes:
+        by_table.setdefault(change.table, []).append(change)
+    today = date.today().isoformat()
+    with report_connection() as connection:
+        # Orders first, so a screen knows an order before work logged against it
+        if 'orders' in by_table:
+            for event in _events_for_orders(connection, by_table['orders'], by_table.get('work_logs', [])):
+                broadcaster.publish('order', event)
+        if 'work_logs' in by_table:
+            for event in _events_for_work_logs(connection, by_table['work_logs']):
+                event['today'] = today
+                broadcaster.publish('work_log', event)
+        if 'overages' in by_table:
+            for event in _events_for_overages(connection, by_table['overages']):
+                broadcaster.publish('overage', event)
+
+@on_restore
+def _reset_board_after_restore():
+    broadcaster.publish('reset', {})
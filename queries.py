@@ -0,0 +1,93 @@
+"""
+Query helpers for list pages
+Each list page eager-loads exactly the relationships its template renders,
+so rows never lazy-load their employee/order/process one SELECT at a time.
+"""
+
+from datetime import datetime
+from sqlalchemy.orm import joinedload, contains_eager
+from models import Employee, Order, WorkLog, Overage
+from pagination import keyset_page, DEFAULT_PAGE_SIZE
+
+def with_relationships(model, *relationships):
+    """Query for model with the named many-to-one relationships joined in"""
+    return model.query.options(*[joinedload(getattr(model, name)) for name in relationships])
+
+def work_logs_with(*relationships):
+    """Work log query, e.g. work_logs_with('employee', 'order', 'process')"""
+    return with_relationships(WorkLog, *relationships)
+
+def overages_with(*relationships):
+    """Overage query, e.g. overages_with('order', 'process')"""
+    return with_relationships(Overage, *relationships)
+
+def work_logs_for_order_process(order_id, process_id):
+    """Work logs for one order/process with their employee, newest first (overage_detail.html)"""
+    return WorkLog.query.filter_by(
+        order_id=order_id,
+        process_id=process_id
+    ).join(Employee).options(contains_eager(WorkLog.employee)).order_by(WorkLog.date.desc())
+
+def _parse_date_arg(args, key):
+    value = args.get(key)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+def parse_work_log_filters(args):
+    """Work log list filters from request args; invalid values are ignored"""
+    filters = {}
+    for key in ('employee_id', 'order_id', 'process_id'):
+        value = args.get(key, type=int)
+        if value:
+            filters[key] = value
+    for key in ('date_from', 'date_to'):
+        value = _parse_date_arg(args, key)
+        if value:
+            filters[key] = value
+    return filters
+
+def filter_work_logs(query, filters):
+    """Apply filters from parse_work_log_filters() to a work log query"""
+    if 'employee_id' in filters:
+        query = query.filter(WorkLog.employee_id == filters['employee_id'])
+    if 'order_id' in filters:
+        query = query.filter(WorkLog.order_id == filters['order_id'])
+    if 'process_id' in filters:
+        query = query.filter(WorkLog.process_id == filters['process_id'])
+    if 'date_from' in filters:
+        query = query.filter(WorkLog.date >= filters['date_from'])
+    if 'date_to' in filters:
+        query = query.filter(WorkLog.date <= filters['date_to'])
+    return query
+
+def work_log_page(filters, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """One page of work logs, newest first by (date, id) (work_logs.html)"""
+    query = filter_work_logs(work_logs_with('employee', 'order', 'process'), filters)
+    return keyset_page(query, [WorkLog.date, WorkLog.id], cursor, limit)
+
+def parse_order_filters(args):
+    """Order list filters from request args; invalid values are ignored"""
+    filters = {}
+    status = args.get('status')
+    if status in ('pending', 'in_progress', 'completed', 'cancelled'):
+        filters['status'] = status
+    for key in ('date_from', 'date_to'):
+        value = _parse_date_arg(args, key)
+        if value:
+            filters[key] = value
+    return filters
+
+def order_page(filters, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """One page of orders, newest first by (created_at, id) (orders.html)"""
+    query = Order.query
+    if 'status' in filters:
+        query = query.filter(Order.status == filters['status'])
+    if 'date_from' in filters:
+        query = query.filter(Order.date >= filters['date_from'])
+    if 'date_to' in filters:
+        query = query.filter(Order.date <= filters['date_to'])
+    return keyset_page(query, [Order.created_at, Order.id], cursor, limit)
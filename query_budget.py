@@ -0,0 +1,90 @@
+"""
+Per-request SQL statement budgets
+Opt in with QUERY_BUDGET_ENABLED (or OLEEMA_QUERY_BUDGET=1 in the
+environment); the flag is read per request, so tests can switch it on after
+importing the app. Every statement executed while handling a request is counted
+and compared with the budget for its method and endpoint, so a page and the
+form that posts to it have separate budgets. In strict mode (the default
+when app.testing is set) an overrun raises QueryBudgetExceeded so N+1
+regressions fail the test that rendered the page; otherwise it is logged.
+"""
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Statements allowed per (method, endpoint), measured with a cold cache; list
+# pages must not scale with row count, and writes pay for the flush handlers
+# that keep totals, rollups, overages and the search index in step
+DEFAULT_BUDGETS = {
+    ('GET', 'dashboard'): 3,
+    ('GET', 'work_log'): 5,
+    ('POST', 'work_log'): 15,
+    ('GET', 'work_logs'): 4,
+    ('GET', 'api_work_logs'): 1,
+    ('GET', 'orders'): 1,
+    ('GET', 'api_order_list'): 1,
+    ('GET', 'view_order'): 3,
+    ('GET', 'overages'): 2,
+    ('GET', 'overage_detail'): 5,
+    ('GET', 'employees'): 1,
+    ('GET', 'processes'): 1,
+}
+
+# Budget for requests without an entry above
+DEFAULT_ENDPOINT_BUDGET = 50
+
+# Statements kept per request for the error message
+MAX_RECORDED_STATEMENTS = 20
+
+class QueryBudgetExceeded(Exception):
+    """Raised in strict mode when a request executes more statements than its budget"""
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context():
+        return
+    counter = g.get('query_budget')
+    if counter is None:
+        return
+    counter['count'] += 1
+    if len(counter['statements']) < MAX_RECORDED_STATEMENTS:
+        counter['statements'].append(statement)
+
+def _start_counting():
+    if not current_app.config.get('QUERY_BUDGET_ENABLED'):
+        return
+    g.query_budget = {'count': 0, 'statements': []}
+
+def _check_budget(response):
+    counter = g.pop('query_budget', None)
+    if counter is None or not request.endpoint:
+        return response
+
+    count = counter['count']
+    response.headers['X-Query-Count'] = str(count)
+
+    budgets = current_app.config['QUERY_BUDGETS']
+    budget = budgets.get((request.method, request.endpoint), current_app.config['QUERY_BUDGET_DEFAULT'])
+    if budget is not None and count > budget:
+        message = (f"{request.endpoint} executed {count} SQL statements "
+                   f"(budget {budget}) for {request.method} {request.path}")
+        strict = current_app.config['QUERY_BUDGET_STRICT']
+        if strict is None:
+            strict = current_app.testing
+        if strict:
+            raise QueryBudgetExceeded(message + "\n" + "\n".join(counter['statements']))
+        print(f"Query budget exceeded: {message}")
+    return response
+
+def init_query_budget(app):
+    """Install per-request statement counting on app (active while QUERY_BUDGET_ENABLED is set)"""
+    app.config.setdefault('QUERY_BUDGET_ENABLED', False)
+    app.config.setdefault('QUERY_BUDGETS', dict(DEFAULT_BUDGETS))
+    app.config.setdefault('QUERY_BUDGET_DEFAULT', DEFAULT_ENDPOINT_BUDGET)
+    # None means strict only when app.testing is set
+    app.config.setdefault('QUERY_BUDGET_STRICT', None)
+
+    if not event.contains(Engine, 'before_cursor_execute', _count_statement):
+        event.listen(Engine, 'before_cursor_execute', _count_statement)
+    app.before_request(_start_counting)
+    app.after_request(_check_budget)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Rebuild or verify the daily production rollups
+Usage:
+    python rebuild_rollups.py                                    # recompute every day from work_logs
+    python rebuild_rollups.py --from 2025-01-01 --to 2025-01-31  # recompute a date range only
+    python rebuild_rollups.py --verify [--from ...] [--to ...]   # only report rows that disagree
+The rollups are kept up to date on every work log write; a rebuild is only
+needed after work logs were changed outside the app.
+"""
+
+import os
+import sys
+import time
+from datetime import datetime
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db, startup
+from rollups import rebuild_rollups, verify_rollups
+
+# Mismatched rows listed per table
+SHOWN_MISMATCHES = 10
+
+def parse_args(args):
+    """Return (verify_only, date_from, date_to)"""
+    verify_only = '--verify' in args
+    dates = {'--from': None, '--to': None}
+    for flag in dates:
+        if flag in args:
+            position = args.index(flag)
+            if position + 1 >= len(args):
+                raise ValueError(f"{flag} needs a date (YYYY-MM-DD)")
+            dates[flag] = datetime.strptime(args[position + 1], '%Y-%m-%d').date()
+    return verify_only, dates['--from'], dates['--to']
+
+def describe_range(date_from, date_to):
+    if not date_from and not date_to:
+        return "all dates"
+    return f"{date_from or 'the start'} to {date_to or 'today'}"
+
+def verify(date_from, date_to):
+    """Report rollup rows that disagree with work_logs"""
+    with app.app_context():
+        mismatches = verify_rollups(date_from, date_to)
+        total = sum(len(rows) for rows in mismatches.values())
+        if not total:
+            print(f"✅ Rollups match work_logs ({describe_range(date_from, date_to)})")
+            return True
+
+        for table, rows in mismatches.items():
+            if not rows:
+                continue
+            print(f"Found {len(rows)} rows in {table} that disagree with work_logs:")
+            for row in rows[:SHOWN_MISMATCHES]:
+                day, key, process_id = row[:3]
+                stored, actual = row[3:7], row[7:]
+                print(f"  - {day} / {key} / process {process_id}: stored {stored}, actual {actual}")
+            if len(rows) > SHOWN_MISMATCHES:
+                print(f"  ... and {len(rows) - SHOWN_MISMATCHES} more")
+        return False
+
+def rebuild(date_from, date_to):
+    """Recompute the rollups from work_logs"""
+    with app.app_context():
+        print(f"🔧 Rebuilding daily rollups for {describe_range(date_from, date_to)}...")
+        started = time.perf_counter()
+        try:
+            written = rebuild_rollups(date_from, date_to)
+            db.session.commit()
+            for table, rows in written.items():
+                print(f"  - {table}: {rows} rows")
+            print(f"✅ Rebuilt rollups in {time.perf_counter() - started:.2f}s")
+            return True
+        except Exception as e:
+            print(f"❌ Error rebuilding rollups: {e}")
+            db.session.rollback()
+            return False
+
+if __name__ == '__main__':
+    print("Oleema Daily Rollups")
+    print("=" * 30)
+    startup()
+
+    try:
+        verify_only, date_from, date_to = parse_args(sys.argv[1:])
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+
+    if verify_only:
+        success = verify(date_from, date_to)
+    else:
+        success = rebuild(date_from, date_to) and verify(date_from, date_to)
+
+    sys.exit(0 if success else 1)
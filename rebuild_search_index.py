@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Rebuild the full-text search index over notes
+Usage:
+    python rebuild_search_index.py            # re-index order, work log and overage notes
+    python rebuild_search_index.py --status   # only show how many notes are indexed
+The index is kept up to date by triggers; a rebuild is only needed after
+restoring an old copy of the database by hand or if the index is damaged.
+"""
+
+import os
+import sys
+import time
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db, startup
+from search_index import rebuild_search_index, index_counts
+
+def show_status():
+    """Print indexed documents per kind"""
+    with app.app_context():
+        counts = index_counts()
+        print(f"📋 {sum(counts.values())} notes indexed")
+        for kind, count in counts.items():
+            print(f"  - {kind.replace('_', ' ')}: {count}")
+        return True
+
+def rebuild_index():
+    """Re-index every note"""
+    with app.app_context():
+        print("🔧 Rebuilding search index...")
+        started = time.perf_counter()
+        try:
+            indexed = rebuild_search_index()
+            db.session.commit()
+            print(f"✅ Indexed {indexed} notes in {time.perf_counter() - started:.2f}s")
+            return True
+        except Exception as e:
+            print(f"❌ Error rebuilding search index: {e}")
+            db.session.rollback()
+            return False
+
+if __name__ == '__main__':
+    print("Oleema Search Index")
+    print("=" * 30)
+    startup()
+
+    if '--status' in sys.argv[1:]:
+        success = show_status()
+    else:
+        success = rebuild_index() and show_status()
+
+    sys.exit(0 if success else 1)
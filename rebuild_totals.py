@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Rebuild or verify the order/process running totals
+Usage:
+    python rebuild_totals.py            # recompute totals from work_logs
+    python rebuild_totals.py --verify   # only report totals that disagree with work_logs
+"""
+
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db, startup
+from order_totals import rebuild_order_process_totals, verify_order_process_totals
+
+def verify_totals():
+    """Report totals that disagree with work_logs"""
+    with app.app_context():
+        mismatches = verify_order_process_totals()
+        if not mismatches:
+            print("✅ All order/process totals match work_logs")
+            return True
+
+        print(f"Found {len(mismatches)} order/process totals that disagree with work_logs:")
+        for order_id, process_id, stored, actual in mismatches:
+            print(f"  - Order {order_id} / Process {process_id}: stored {stored}, actual {actual}")
+        return False
+
+def rebuild_totals():
+    """Recompute every order/process total from work_logs"""
+    with app.app_context():
+        print("🔧 Rebuilding order/process totals from work_logs...")
+        try:
+            rows = rebuild_order_process_totals()
+            db.session.commit()
+            print(f"✅ Rebuilt {rows} order/process totals")
+            return True
+        except Exception as e:
+            print(f"❌ Error rebuilding totals: {e}")
+            db.session.rollback()
+            return False
+
+if __name__ == '__main__':
+    print("Oleema Order/Process Totals")
+    print("=" * 30)
+    startup()
+
+    if '--verify' in sys.argv[1:]:
+        success = verify_totals()
+    else:
+        success = rebuild_totals() and verify_totals()
+
+    sys.exit(0 if success else 1)
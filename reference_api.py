@@ -0,0 +1,115 @@
+"""
+Read-only reference data API
+Orders, processes and employees as JSON with field selection and filtering,
+for tablets and pages that poll for reference data. Every response carries a
+strong ETag built from the table's version (see table_versions.py) and the
+normalised query, so a conditional request is answered 304 after a single
+primary-key lookup, without reading or serialising any rows.
+"""
+
+import hashlib
+from collections import namedtuple
+from datetime import date, datetime
+from flask import request, jsonify, Response
+from sqlalchemy import select
+from models import db, Order, Process, Employee
+from table_versions import get_table_versions
+
+# model, selectable fields, fields returned when none are asked for, filterable fields
+Resource = namedtuple('Resource', ['model', 'fields', 'default_fields', 'filters'])
+
+RESOURCES = {
+    'orders': Resource(
+        Order,
+        ('id', 'order_no', 'date', 'color', 'size', 'quantity', 'status', 'notes', 'created_at', 'updated_at'),
+        ('id', 'order_no', 'color', 'size', 'quantity', 'status'),
+        ('id', 'order_no', 'status'),
+    ),
+    'processes': Resource(
+        Process,
+        ('id', 'name', 'pay_rate', 'description', 'is_active', 'created_at', 'updated_at'),
+        ('id', 'name', 'pay_rate', 'is_active'),
+        ('id', 'name', 'is_active'),
+    ),
+    'employees': Resource(
+        Employee,
+        ('id', 'employee_id', 'name', 'pay_rate', 'is_active', 'created_at', 'updated_at'),
+        ('id', 'employee_id', 'name', 'is_active'),
+        ('id', 'employee_id', 'is_active'),
+    ),
+}
+
+class InvalidQuery(ValueError):
+    """Raised for unknown fields, filters or filter values"""
+
+def _split(value):
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+def _filter_value(column, text):
+    python_type = column.type.python_type
+    if python_type is bool:
+        if text.lower() in ('1', 'true', 'yes'):
+            return True
+        if text.lower() in ('0', 'false', 'no'):
+            return False
+        raise InvalidQuery(f"Invalid value '{text}' for {column.name} (use true or false)")
+    if python_type is int:
+        try:
+            return int(text)
+        except ValueError:
+            raise InvalidQuery(f"Invalid value '{text}' for {column.name}")
+    return text
+
+def parse_query(resource, args):
+    """(fields, {filter field: [values]}) from request arguments"""
+    fields = _split(args.get('fields', '')) or list(resource.default_fields)
+    unknown = [field for field in fields if field not in resource.fields]
+    if unknown:
+        raise InvalidQuery(f"Unknown field(s): {', '.join(unknown)}")
+
+    table = resource.model.__table__
+    filters = {}
+    for key in args:
+        if key == 'fields':
+            continue
+        if key not in resource.filters:
+            raise InvalidQuery(f"Unknown filter '{key}' (available: {', '.join(resource.filters)})")
+        values = [value for arg in args.getlist(key) for value in _split(arg)]
+        filters[key] = sorted({_filter_value(table.c[key], value) for value in values}, key=str)
+    return fields, filters
+
+def resource_etag(name, version, fields, filters):
+    """Strong ETag for one table version and normalised query"""
+    query = repr((sorted(fields), sorted(filters.items())))
+    digest = hashlib.sha256(query.encode('utf-8')).hexdigest()[:16]
+    return f"{name}-{version}-{digest}"
+
+def _json_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def query_resource(resource, fields, filters):
+    table = resource.model.__table__
+    query = select(*(table.c[field] for field in fields))
+    for key, values in filters.items():
+        query = query.where(table.c[key].in_(values))
+    query = query.order_by(table.c.id)
+    return [
+        {field: _json_value(value) for field, value in zip(fields, row)}
+        for row in db.session.execute(query)
+    ]
+
+def conditional_response(name, fields, filters):
+    """200 with the rows, or 304 if the client's ETag is still current"""
+    resource = RESOURCES[name]
+    version = get_table_versions(name)[name]
+    etag = resource_etag(name, version, fields, filters)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(query_resource(resource, fields, filters))
+    response.set_etag(etag)
+    # Clients may keep the body but must revalidate before using it
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,250 @@
+"""
+Rendered payment-report cache
+Payment-report PDFs are cached in memory and on disk under a content address:
+the SHA-256 of the employee, month, year and a data version built from the
+rows that feed the report. Any change to those rows yields a new key, so a
+stale PDF is never served; commit handlers additionally drop entries for
+data that changed so dead files do not wait for LRU eviction.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from sqlalchemy import select, func
+from models import db, Employee, Order, Process, WorkLog, Payment
+from payroll import month_bounds
+from change_tracking import on_commit
+from database_restore import on_restore
+
+DEFAULT_MEMORY_MB = 32
+DEFAULT_DISK_MB = 256
+
+def report_data_version(employee_id, month, year):
+    """
+    Version of everything a payment report for this employee and month shows.
+    Call after get_monthly_payment() so payments.calculated_at is current.
+    """
+    start, end = month_bounds(month, year)
+    logs = db.session.execute(
+        select(
+            func.count(WorkLog.id),
+            func.max(WorkLog.created_at),
+            func.max(Order.updated_at),
+            func.max(Process.updated_at)
+        ).select_from(WorkLog)
+        .outerjoin(Order, Order.id == WorkLog.order_id)
+        .outerjoin(Process, Process.id == WorkLog.process_id)
+        .where(WorkLog.employee_id == employee_id, WorkLog.date >= start, WorkLog.date < end)
+    ).one()
+    # Payment rows are recomputed (new calculated_at) whenever a log or a rate changes
+    calculated_at = db.session.execute(
+        select(Payment.calculated_at).where(
+            Payment.employee_id == employee_id, Payment.month == month, Payment.year == year
+        )
+    ).scalar()
+    employee_updated_at = db.session.execute(
+        select(Employee.updated_at).where(Employee.id == employee_id)
+    ).scalar()
+    return '|'.join(str(value) for value in (*logs, calculated_at, employee_updated_at))
+
+def _tag(employee_id, month, year):
+    return f"{employee_id}-{year}-{month:02d}"
+
+class ReportCache:
+    """Two-tier (memory, disk) LRU cache of rendered PDFs bounded by total bytes"""
+
+    def __init__(self, directory, memory_limit, disk_limit):
+        self.directory = directory
+        self.memory_limit = memory_limit
+        self.disk_limit = disk_limit
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> bytes
+        self._memory_bytes = 0
+        self._disk = OrderedDict()  # key -> size in bytes
+        self._disk_bytes = 0
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_disk_index()
+
+    @staticmethod
+    def key(employee_id, month, year, version):
+        digest = hashlib.sha256(f"{employee_id}|{month}|{year}|{version}".encode('utf-8')).hexdigest()
+        return f"{_tag(employee_id, month, year)}-{digest}"
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def _load_disk_index(self):
+        """Index files left by earlier runs, least recently used first"""
+        entries = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.pdf'):
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, filename[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        self._evict_disk()
+
+    def get(self, key):
+        with self._lock:
+            pdf = self._memory.get(key)
+            if pdf is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                return pdf
+            if key in self._disk:
+                try:
+                    with open(self._path(key), 'rb') as f:
+                        pdf = f.read()
+                    os.utime(self._path(key))
+                except OSError:
+                    self._disk_bytes -= self._disk.pop(key)
+                else:
+                    self._disk.move_to_end(key)
+                    self._remember(key, pdf)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return pdf
+            self.misses += 1
+            return None
+
+    def put(self, key, pdf):
+        with self._lock:
+            self._remember(key, pdf)
+            if key in self._disk or len(pdf) > self.disk_limit:
+                return
+            path = self._path(key)
+            temp_path = f"{path}.tmp"
+            try:
+                with open(temp_path, 'wb') as f:
+                    f.write(pdf)
+                os.replace(temp_path, path)
+            except OSError as e:
+                print(f"Error writing report cache file {path}: {e}")
+                return
+            self._disk[key] = len(pdf)
+            self._disk_bytes += len(pdf)
+            self._evict_disk()
+
+    def _remember(self, key, pdf):
+        if len(pdf) > self.memory_limit:
+            return
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        self._memory[key] = pdf
+        self._memory_bytes += len(pdf)
+        while self._memory_bytes > self.memory_limit:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _evict_disk(self):
+        while self._disk_bytes > self.disk_limit:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self._remove_file(key)
+
+    def _remove_file(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def invalidate(self, employee_id, month=None, year=None):
+        """Drop cached reports for an employee (one month or all of them)"""
+        prefix = f"{employee_id}-" if month is None else f"{_tag(employee_id, month, year)}-"
+        with self._lock:
+            for key in [key for key in self._memory if key.startswith(prefix)]:
+                self._memory_bytes -= len(self._memory.pop(key))
+            for key in [key for key in self._disk if key.startswith(prefix)]:
+                self._disk_bytes -= self._disk.pop(key)
+                self._remove_file(key)
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            for key in self._disk:
+                self._remove_file(key)
+            self._memory.clear()
+            self._disk.clear()
+            self._memory_bytes = 0
+            self._disk_bytes = 0
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'invalidations': self.invalidations,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'memory_limit': self.memory_limit,
+                'disk_entries': len(self._disk),
+                'disk_bytes': self._disk_bytes,
+                'disk_limit': self.disk_limit,
+            }
+
+_cache = None
+
+def init_report_cache(app, base_dir):
+    """Create the process-wide report cache from app config"""
+    global _cache
+    directory = app.config.get('REPORT_CACHE_DIR') or os.path.join(base_dir, 'cache', 'reports')
+    memory_mb = app.config.get('REPORT_CACHE_MEMORY_MB', DEFAULT_MEMORY_MB)
+    disk_mb = app.config.get('REPORT_CACHE_DISK_MB', DEFAULT_DISK_MB)
+    _cache = ReportCache(directory, int(memory_mb * 1024 * 1024), int(disk_mb * 1024 * 1024))
+    return _cache
+
+def get_report_cache():
+    return _cache
+
+@on_commit('work_logs')
+def _invalidate_reports_for_work_logs(changes):
+    if _cache is None:
+        return
+    tags = set()
+    for change in changes:
+        for values in (change.old, change.new):
+            if values and values.get('date'):
+                tags.add((values['employee_id'], values['date'].month, values['date'].year))
+    for employee_id, month, year in tags:
+        _cache.invalidate(employee_id, month, year)
+
+@on_commit('employees')
+def _invalidate_reports_for_employees(changes):
+    if _cache is None:
+        return
+    for change in changes:
+        if change.action != 'insert' and change.changed & {'name', 'employee_id'}:
+            _cache.invalidate((change.old or change.new)['id'])
+
+@on_commit('processes', 'orders')
+def _invalidate_reports_for_rates(changes):
+    # A rate, process name or order number can appear on any employee's report
+    if _cache is None:
+        return
+    if any(change.action != 'insert' and change.changed & {'pay_rate', 'name', 'order_no'}
+           for change in changes):
+        _cache.clear()
+
+@on_restore
+def _clear_reports_after_restore():
+    if _cache is not None:
+        _cache.clear()
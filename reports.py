@@ -0,0 +1,381 @@
+"""
+Pivot reports
+A report groups production by up to two row dimensions and an optional
+column dimension (employee, process, order, color, size, week, month) and
+sums the chosen measures (pieces, hours, labour cost, overage units) over a
+date range.
+
+Each query is planned against the smallest source that has every dimension
+asked for: daily_employee_rollups when employees are involved,
+daily_order_rollups for orders, colors and sizes, whichever rollup is
+smaller when neither is, and raw work_logs only when a report needs
+employees and orders together. Overage units come from work_log_overages,
+which attributes them to the work logs (and so the days and employees)
+that caused them.
+
+Finished pivots are cached per parameter set. A committed work log only
+drops reports whose date range covers its date (and any showing overage
+units), overage changes drop reports showing overage units, changes to
+names or rates drop them all, and a TTL bounds staleness from writes made
+by other processes.
+"""
+
+import threading
+import time
+from collections import namedtuple, OrderedDict
+from datetime import date
+from sqlalchemy import select, func
+from models import (Employee, Order, Process, WorkLog, WorkLogOverage,
+                    DailyEmployeeRollup, DailyOrderRollup)
+from change_tracking import on_commit
+from database_restore import on_restore
+from sqlite_profile import report_connection
+
+MAX_ROW_DIMENSIONS = 2
+
+# Pivot rows returned at most; the rest is reported as truncated
+MAX_ROWS = 2000
+
+DEFAULT_TTL = 300  # seconds
+CACHE_ENTRIES = 64
+
+class ReportError(ValueError):
+    """Raised for report parameters that cannot be run"""
+
+# needs: which rollup key the dimension requires ('employee_id', 'order_id' or None)
+Dimension = namedtuple('Dimension', ['name', 'label', 'needs'])
+
+DIMENSIONS = OrderedDict((dimension.name, dimension) for dimension in (
+    Dimension('employee', 'Employee', 'employee_id'),
+    Dimension('process', 'Process', None),
+    Dimension('order', 'Order', 'order_id'),
+    Dimension('color', 'Color', 'order_id'),
+    Dimension('size', 'Size', 'order_id'),
+    Dimension('week', 'Week', None),
+    Dimension('month', 'Month', None),
+))
+
+Measure = namedtuple('Measure', ['name', 'label'])
+
+MEASURES = OrderedDict((measure.name, measure) for measure in (
+    Measure('pieces', 'Pieces'),
+    Measure('hours', 'Hours'),
+    Measure('labour_cost', 'Labour Cost'),
+    Measure('overage_units', 'Overage Units'),
+))
+
+PRODUCTION_MEASURES = ('pieces', 'hours', 'labour_cost')
+
+# What a report is asked for; hashable, so it is also the cache key
+ReportParams = namedtuple('ReportParams', ['rows', 'column', 'measures', 'date_from', 'date_to'])
+
+Pivot = namedtuple('Pivot', [
+    'params', 'columns', 'rows', 'column_totals', 'total', 'truncated', 'sources', 'elapsed'
+])
+# columns: [(key, label)]; rows: [(labels, {column key: {measure: value}}, {measure: total})]
+
+def default_date_range(today=None):
+    """The last twelve whole months and the current one"""
+    today = today or date.today()
+    return date(today.year - 1, today.month, 1), today
+
+def parse_report_params(args):
+    """ReportParams from request arguments; raises ReportError"""
+    rows = [name for name in args.getlist('rows') if name]
+    if not rows:
+        rows = ['process']
+    column = args.get('column') or None
+    measures = [name for name in args.getlist('measures') if name] or ['pieces', 'labour_cost']
+
+    unknown = [name for name in rows + [column] if name and name not in DIMENSIONS]
+    if unknown:
+        raise ReportError(f"Unknown dimension '{unknown[0]}'")
+    if len(rows) > MAX_ROW_DIMENSIONS:
+        raise ReportError(f"At most {MAX_ROW_DIMENSIONS} row dimensions")
+    if len(set(rows)) != len(rows) or column in rows:
+        raise ReportError("A dimension can only be used once")
+    unknown = [name for name in measures if name not in MEASURES]
+    if unknown:
+        raise ReportError(f"Unknown measure '{unknown[0]}'")
+
+    date_from, date_to = default_date_range()
+    try:
+        if args.get('date_from'):
+            date_from = date.fromisoformat(args['date_from'])
+        if args.get('date_to'):
+            date_to = date.fromisoformat(args['date_to'])
+    except ValueError:
+        raise ReportError("Dates must be YYYY-MM-DD")
+    if date_from > date_to:
+        raise ReportError("The start date is after the end date")
+
+    ordered_measures = tuple(name for name in MEASURES if name in measures)
+    return ReportParams(tuple(rows), column, ordered_measures, date_from, date_to)
+
+# Query sources
+
+class _Source:
+    """A table (or join) to aggregate from and the columns reports use"""
+
+    def __init__(self, name, base, date, employee_id, order_id, process_id, measures):
+        self.name = name
+        self.base = base
+        self.date = date
+        self.employee_id = employee_id
+        self.order_id = order_id
+        self.process_id = process_id
+        self.measures = measures
+
+def _rollup_source(model):
+    return _Source(
+        model.__tablename__, model.__table__, model.date,
+        getattr(model, 'employee_id', None), getattr(model, 'order_id', None), model.process_id,
+        {
+            'pieces': func.sum(model.quantity),
+            'hours': func.sum(model.hours),
+            'labour_cost': func.sum(model.labour_cost),
+        }
+    )
+
+def _work_log_source():
+    return _Source(
+        'work_logs', WorkLog.__table__.join(Process, Process.id == WorkLog.process_id), WorkLog.date,
+        WorkLog.employee_id, WorkLog.order_id, WorkLog.process_id,
+        {
+            'pieces': func.sum(WorkLog.quantity),
+            'hours': func.coalesce(func.sum(WorkLog.hours_worked), 0.0),
+            'labour_cost': func.coalesce(func.sum(WorkLog.quantity * Process.pay_rate), 0.0),
+        }
+    )
+
+def _overage_source():
+    # Attributions are few, so they should drive the join with work logs looked
+    # up by id; "date || ''" keeps SQLite from range-scanning work_logs by date
+    # instead and probing work_log_overages for every row
+    return _Source(
+        'work_log_overages', WorkLogOverage.__table__.join(WorkLog, WorkLog.id == WorkLogOverage.work_log_id),
+        WorkLog.date.concat(''), WorkLog.employee_id, WorkLog.order_id, WorkLog.process_id,
+        {'overage_units': func.sum(WorkLogOverage.overage_units)}
+    )
+
+def _grouping_column(name, source):
+    """(column name, expression) a dimension needs from the source rows"""
+    if name == 'employee':
+        return 'employee_id', source.employee_id
+    if name == 'process':
+        return 'process_id', source.process_id
+    if name in ('order', 'color', 'size'):
+        return 'order_id', source.order_id
+    if name == 'week':
+        # Monday of the week
+        return 'week', func.date(source.date, 'weekday 0', '-6 days')
+    # Dates are stored as YYYY-MM-DD text; substr() is much cheaper than strftime()
+    return 'month', func.substr(source.date, 1, 7)
+
+def _dimension_columns(name, grouped):
+    """(key, label, model to join) of a dimension over the grouped rows"""
+    if name == 'employee':
+        return grouped.c.employee_id, Employee.name + ' (' + Employee.employee_id + ')', Employee
+    if name == 'process':
+        return grouped.c.process_id, Process.name, Process
+    if name == 'order':
+        return grouped.c.order_id, Order.order_no, Order
+    if name in ('color', 'size'):
+        column = getattr(Order, name)
+        return column, column, Order
+    column = grouped.c[name]
+    return column, column, None
+
+_JOIN_KEYS = {Employee: 'employee_id', Process: 'process_id', Order: 'order_id'}
+
+def _aggregate_query(source, dimensions, measures, date_from, date_to):
+    """
+    Sum measures by dimensions in two steps: group the source rows by ids and
+    periods, then join names onto the (much smaller) result and group by the
+    dimensions themselves.
+    """
+    grouping = OrderedDict(_grouping_column(name, source) for name in dimensions)
+    grouped = (
+        select(
+            *(expression.label(column) for column, expression in grouping.items()),
+            *(source.measures[measure].label(measure) for measure in measures)
+        )
+        .select_from(source.base)
+        .where(source.date >= date_from, source.date <= date_to)
+        .group_by(*grouping.values())
+        .subquery()
+    )
+
+    keys, labels, base = [], [], grouped
+    joined = set()
+    for index, name in enumerate(dimensions):
+        key, label, model = _dimension_columns(name, grouped)
+        keys.append(key.label(f'key_{index}'))
+        labels.append(label.label(f'label_{index}'))
+        if model is not None and model not in joined:
+            base = base.join(model, model.id == grouped.c[_JOIN_KEYS[model]])
+            joined.add(model)
+    return (
+        select(*keys, *labels, *(func.sum(grouped.c[measure]) for measure in measures))
+        .select_from(base)
+        .group_by(*(key.element for key in keys), *(label.element for label in labels))
+    )
+
+def _row_counts(connection):
+    return {
+        model.__tablename__: connection.execute(select(func.count()).select_from(model.__table__)).scalar()
+        for model in (DailyEmployeeRollup, DailyOrderRollup)
+    }
+
+def plan_sources(params, connection):
+    """[(source, measures)] answering params, smallest adequate source first"""
+    dimensions = params.rows + ((params.column,) if params.column else ())
+    needs = {DIMENSIONS[name].needs for name in dimensions} - {None}
+    plan = []
+    production = [measure for measure in params.measures if measure in PRODUCTION_MEASURES]
+    if production:
+        if needs == {'employee_id', 'order_id'}:
+            source = _work_log_source()
+        elif needs == {'employee_id'}:
+            source = _rollup_source(DailyEmployeeRollup)
+        elif needs == {'order_id'}:
+            source = _rollup_source(DailyOrderRollup)
+        else:
+            counts = _row_counts(connection)
+            smaller = min((DailyEmployeeRollup, DailyOrderRollup), key=lambda model: counts[model.__tablename__])
+            source = _rollup_source(smaller)
+        plan.append((source, production))
+    if 'overage_units' in params.measures:
+        plan.append((_overage_source(), ['overage_units']))
+    return plan
+
+def _sort_key(value):
+    return (value is None, str(value).lower() if value is not None else '')
+
+def build_pivot(params):
+    """Run params against the planned sources and assemble the pivot table"""
+    started = time.perf_counter()
+    dimensions = params.rows + ((params.column,) if params.column else ())
+    width = len(dimensions)
+    # (dimension keys) -> [labels, {measure: value}]
+    cells = {}
+    sources = []
+    with report_connection() as connection:
+        for source, measures in plan_sources(params, connection):
+            sources.append(source.name)
+            query = _aggregate_query(source, dimensions, measures, params.date_from, params.date_to)
+            for row in connection.execute(query):
+                keys, labels, values = tuple(row[:width]), row[width:2 * width], row[2 * width:]
+                cell = cells.setdefault(keys, [labels, {}])
+                cell[1].update(zip(measures, values))
+
+    row_width = len(params.rows)
+    columns = {}
+    rows = {}
+    for keys, (labels, values) in cells.items():
+        row_key = keys[:row_width]
+        column_key = keys[row_width] if params.column else None
+        if params.column:
+            columns.setdefault(column_key, labels[row_width])
+        row = rows.setdefault(row_key, [labels[:row_width], {}])
+        row[1][column_key] = {measure: values.get(measure) or 0 for measure in params.measures}
+
+    ordered_columns = sorted(columns.items(), key=lambda item: _sort_key(item[1]))
+    ordered_rows = sorted(rows.values(), key=lambda row: tuple(_sort_key(label) for label in row[0]))
+    truncated = len(ordered_rows) > MAX_ROWS
+
+    column_totals = {}
+    total = dict.fromkeys(params.measures, 0)
+    pivot_rows = []
+    for index, (labels, by_column) in enumerate(ordered_rows):
+        row_total = dict.fromkeys(params.measures, 0)
+        for column_key, values in by_column.items():
+            column_total = column_totals.setdefault(column_key, dict.fromkeys(params.measures, 0))
+            for measure, value in values.items():
+                row_total[measure] += value
+                column_total[measure] += value
+                total[measure] += value
+        if index < MAX_ROWS:
+            pivot_rows.append((tuple(labels), by_column, row_total))
+
+    return Pivot(params, ordered_columns, pivot_rows, column_totals, total, truncated,
+                 sources, time.perf_counter() - started)
+
+class PivotCache:
+    """LRU of finished pivots keyed by ReportParams"""
+
+    def __init__(self, ttl=DEFAULT_TTL, entries=CACHE_ENTRIES):
+        self.ttl = ttl
+        self.entries = entries
+        self._lock = threading.Lock()
+        self._pivots = OrderedDict()  # params -> (pivot, expires)
+        # Bumped by every invalidation so a pivot computed before it is not stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, params):
+        """(pivot, cached)"""
+        with self._lock:
+            entry = self._pivots.get(params)
+            if entry and time.monotonic() < entry[1]:
+                self._pivots.move_to_end(params)
+                self.hits += 1
+                return entry[0], True
+            self.misses += 1
+            generation = self._generation
+        pivot = build_pivot(params)
+        with self._lock:
+            if generation == self._generation:
+                self._pivots[params] = (pivot, time.monotonic() + self.ttl)
+                self._pivots.move_to_end(params)
+                while len(self._pivots) > self.entries:
+                    self._pivots.popitem(last=False)
+        return pivot, False
+
+    def invalidate(self, dates=None, measures=None):
+        """Drop pivots covering any of dates or using any of measures (everything if both are None)"""
+        with self._lock:
+            self._generation += 1
+            if dates is None and measures is None:
+                self._pivots.clear()
+                return
+            for params in list(self._pivots):
+                if dates and any(params.date_from <= day <= params.date_to for day in dates):
+                    del self._pivots[params]
+                elif measures and set(measures) & set(params.measures):
+                    del self._pivots[params]
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._pivots), 'ttl': self.ttl}
+
+pivot_cache = PivotCache()
+
+def get_pivot(params):
+    return pivot_cache.get(params)
+
+@on_commit('work_logs')
+def _invalidate_pivots_for_work_logs(changes):
+    dates = {values['date'] for change in changes for values in (change.old, change.new)
+             if values and values.get('date')}
+    # Overage units move between later work logs of the same order too
+    pivot_cache.invalidate(dates=dates, measures=['overage_units'])
+
+@on_commit('overages', 'work_log_overages')
+def _invalidate_pivots_for_overages(changes):
+    pivot_cache.invalidate(measures=['overage_units'])
+
+# Reference data columns pivots show as labels or price labour cost with
+PIVOT_REFERENCE_FIELDS = {'name', 'employee_id', 'order_no', 'color', 'size', 'pay_rate'}
+
+@on_commit('employees', 'orders', 'processes')
+def _invalidate_pivots_for_reference_data(changes):
+    # New rows have no work logs yet and a status change shows nowhere, so
+    # only changes to names or rates drop them all
+    if any(change.action != 'insert' and change.changed & PIVOT_REFERENCE_FIELDS for change in changes):
+        pivot_cache.invalidate()
+
+@on_restore
+def _invalidate_pivots_after_restore():
+    pivot_cache.invalidate()
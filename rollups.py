@@ -0,0 +1,192 @@
+"""
+Daily production rollups
+daily_employee_rollups and daily_order_rollups hold work_logs aggregated to
+one row per day x employee x process and day x order x process: pieces,
+hours, labour cost (pieces at the process's pay rate) and the number of work
+logs. A flush handler applies each work log insert, edit and delete as a
+delta in the same transaction, a pay-rate change re-prices the process's
+rows, and any date range can be rebuilt from work_logs.
+"""
+
+from collections import namedtuple, defaultdict
+from sqlalchemy import select, func, literal, union_all, update, delete, bindparam, or_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, WorkLog, Process, DailyEmployeeRollup, DailyOrderRollup
+from change_tracking import on_flush
+from sqlite_profile import report_connection
+
+# One rollup: its model and the work_logs columns it is grouped by besides date and process
+Rollup = namedtuple('Rollup', ['model', 'key'])
+
+ROLLUPS = (
+    Rollup(DailyEmployeeRollup, 'employee_id'),
+    Rollup(DailyOrderRollup, 'order_id'),
+)
+
+MEASURES = ('quantity', 'hours', 'labour_cost', 'work_log_count')
+
+# Differences below these are float rounding, not missing work
+HOURS_TOLERANCE = 1e-6
+COST_TOLERANCE = 0.005
+
+def _key_columns(rollup):
+    return ('date', rollup.key, 'process_id')
+
+def _process_rates(connection, process_ids):
+    if not process_ids:
+        return {}
+    return dict(connection.execute(
+        select(Process.id, Process.pay_rate).where(Process.id.in_(sorted(process_ids)))
+    ).all())
+
+def work_log_rollup_deltas(changes, rates):
+    """Per rollup, map key -> [quantity, hours, labour_cost, work_log_count] net change"""
+    deltas = {rollup: defaultdict(lambda: [0, 0.0, 0.0, 0]) for rollup in ROLLUPS}
+    for change in changes:
+        for values, sign in ((change.old, -1), (change.new, 1)):
+            if not values or not values.get('date'):
+                continue
+            quantity = values['quantity'] or 0
+            hours = values['hours_worked'] or 0.0
+            cost = quantity * (rates.get(values['process_id']) or 0.0)
+            for rollup in ROLLUPS:
+                measures = deltas[rollup][tuple(values[column] for column in _key_columns(rollup))]
+                measures[0] += sign * quantity
+                measures[1] += sign * hours
+                measures[2] += sign * cost
+                measures[3] += sign
+    return {
+        rollup: {key: measures for key, measures in by_key.items() if any(measures)}
+        for rollup, by_key in deltas.items()
+    }
+
+def apply_rollup_deltas(connection, rollup, deltas):
+    """Add deltas to a rollup, creating rows as needed and dropping rows left with no work logs"""
+    if not deltas:
+        return
+    table = rollup.model.__table__
+    key_columns = _key_columns(rollup)
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c[column] for column in key_columns],
+        set_={measure: table.c[measure] + stmt.excluded[measure] for measure in MEASURES}
+    )
+    connection.execute(stmt, [
+        dict(zip(key_columns, key), **dict(zip(MEASURES, measures)))
+        for key, measures in deltas.items()
+    ])
+
+    emptied = [key for key, measures in deltas.items() if measures[3] < 0]
+    if emptied:
+        connection.execute(
+            delete(table).where(
+                *(table.c[column] == bindparam(f'b_{column}') for column in key_columns),
+                table.c.work_log_count <= 0
+            ),
+            [{f'b_{column}': value for column, value in zip(key_columns, key)} for key in emptied]
+        )
+
+@on_flush('work_logs')
+def _update_rollups_on_flush(connection, changes):
+    process_ids = set()
+    for change in changes:
+        for values in (change.old, change.new):
+            if values:
+                process_ids.add(values['process_id'])
+    deltas = work_log_rollup_deltas(changes, _process_rates(connection, process_ids))
+    for rollup in ROLLUPS:
+        apply_rollup_deltas(connection, rollup, deltas[rollup])
+
+@on_flush('processes')
+def _reprice_rollups_for_rates(connection, changes):
+    rates = {change.new['id']: change.new['pay_rate'] or 0.0 for change in changes
+             if change.action == 'update' and 'pay_rate' in change.changed}
+    if not rates:
+        return
+    for rollup in ROLLUPS:
+        table = rollup.model.__table__
+        connection.execute(
+            update(table).where(table.c.process_id == bindparam('b_process_id'))
+            .values(labour_cost=table.c.quantity * bindparam('b_pay_rate')),
+            [{'b_process_id': process_id, 'b_pay_rate': rate} for process_id, rate in rates.items()]
+        )
+
+def _date_range(column, date_from, date_to):
+    conditions = []
+    if date_from:
+        conditions.append(column >= date_from)
+    if date_to:
+        conditions.append(column <= date_to)
+    return conditions
+
+def _aggregated_work_logs(rollup, date_from=None, date_to=None):
+    """work_logs grouped to the rollup's grain, columns in the rollup's order"""
+    key = getattr(WorkLog, rollup.key)
+    quantity = func.sum(WorkLog.quantity)
+    return (
+        select(
+            WorkLog.date, key, WorkLog.process_id,
+            quantity,
+            func.coalesce(func.sum(WorkLog.hours_worked), 0.0),
+            quantity * func.coalesce(Process.pay_rate, 0.0),
+            func.count(WorkLog.id)
+        )
+        .join(Process, Process.id == WorkLog.process_id)
+        .where(*_date_range(WorkLog.date, date_from, date_to))
+        .group_by(WorkLog.date, key, WorkLog.process_id)
+    )
+
+def rebuild_rollups(date_from=None, date_to=None, connection=None):
+    """
+    Recompute both rollups from work_logs for a date range (all dates by
+    default); caller commits. Returns rows written per rollup table.
+    """
+    connection = connection or db.session.connection()
+    written = {}
+    for rollup in ROLLUPS:
+        table = rollup.model.__table__
+        connection.execute(delete(table).where(*_date_range(table.c.date, date_from, date_to)))
+        result = connection.execute(
+            table.insert().from_select(
+                list(_key_columns(rollup)) + list(MEASURES),
+                _aggregated_work_logs(rollup, date_from, date_to)
+            )
+        )
+        written[table.name] = result.rowcount
+    return written
+
+def verify_rollups(date_from=None, date_to=None):
+    """Map rollup table -> [(key..., stored measures, actual measures)] for rows that disagree with work_logs"""
+    mismatches = {}
+    with report_connection() as connection:
+        for rollup in ROLLUPS:
+            table = rollup.model.__table__
+            key_columns = _key_columns(rollup)
+            stored = select(
+                *(table.c[column] for column in key_columns),
+                *(table.c[measure].label(measure) for measure in MEASURES),
+                *(literal(0).label(f'actual_{measure}') for measure in MEASURES)
+            ).where(*_date_range(table.c.date, date_from, date_to))
+            actual = _aggregated_work_logs(rollup, date_from, date_to).subquery()
+            actual = select(
+                *actual.c[:3],
+                *(literal(0).label(measure) for measure in MEASURES),
+                *(column.label(f'actual_{measure}') for column, measure in zip(actual.c[3:], MEASURES))
+            )
+            combined = union_all(stored, actual).subquery()
+            keys = list(combined.c[:3])
+            stored_sums = [func.sum(combined.c[measure]) for measure in MEASURES]
+            actual_sums = [func.sum(combined.c[f'actual_{measure}']) for measure in MEASURES]
+            rows = connection.execute(
+                select(*keys, *stored_sums, *actual_sums)
+                .group_by(*keys)
+                .having(or_(
+                    stored_sums[0] != actual_sums[0],
+                    func.abs(stored_sums[1] - actual_sums[1]) > HOURS_TOLERANCE,
+                    func.abs(stored_sums[2] - actual_sums[2]) > COST_TOLERANCE,
+                    stored_sums[3] != actual_sums[3]
+                ))
+                .order_by(*keys)
+            ).all()
+            mismatches[table.name] = [tuple(row) for row in rows]
+    return mismatches
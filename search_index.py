@@ -0,0 +1,179 @@
+"""
+Full-text search over notes
+search_index is an SQLite FTS5 table holding order notes, work log notes
+and overage resolution notes. Each document's rowid encodes where it came
+from (id * 4 + kind), so triggers on the three tables can replace or drop a
+document by rowid without scanning the index; being triggers, they also see
+bulk Core writes and other processes. rebuild_search_index() re-creates the
+whole index with one INSERT ... SELECT per table.
+"""
+
+import re
+from collections import namedtuple
+from markupsafe import Markup, escape
+from sqlalchemy import select, text
+from models import db, Order, Process, Employee, WorkLog, Overage
+
+# Source table, text column and rowid kind of each indexed column
+Source = namedtuple('Source', ['kind', 'table', 'column', 'code'])
+
+SOURCES = (
+    Source('order', 'orders', 'notes', 1),
+    Source('work_log', 'work_logs', 'notes', 2),
+    Source('overage', 'overages', 'resolution_notes', 3),
+)
+
+_KINDS = {source.code: source.kind for source in SOURCES}
+
+RESULTS_PER_PAGE = 25
+
+# Snippet markers; never present in notes, swapped for <mark> after escaping
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+
+def _has_text(expression):
+    return f"{expression} IS NOT NULL AND trim({expression}) != ''"
+
+def _schema_statements():
+    statements = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(body, tokenize = 'porter unicode61')"
+    ]
+    for source in SOURCES:
+        new_rowid = f"new.id * 4 + {source.code}"
+        old_rowid = f"old.id * 4 + {source.code}"
+        statements += [
+            f"CREATE TRIGGER IF NOT EXISTS search_index_{source.table}_insert AFTER INSERT ON {source.table} "
+            f"WHEN {_has_text('new.' + source.column)} BEGIN "
+            f"INSERT INTO search_index(rowid, body) VALUES ({new_rowid}, new.{source.column}); END",
+
+            f"CREATE TRIGGER IF NOT EXISTS search_index_{source.table}_update AFTER UPDATE OF {source.column} ON {source.table} BEGIN "
+            f"DELETE FROM search_index WHERE rowid = {old_rowid}; "
+            f"INSERT INTO search_index(rowid, body) SELECT {new_rowid}, new.{source.column} "
+            f"WHERE {_has_text('new.' + source.column)}; END",
+
+            f"CREATE TRIGGER IF NOT EXISTS search_index_{source.table}_delete AFTER DELETE ON {source.table} BEGIN "
+            f"DELETE FROM search_index WHERE rowid = {old_rowid}; END",
+        ]
+    return statements
+
+def create_search_index(connection):
+    """Create the FTS5 table and its triggers if they do not exist"""
+    for statement in _schema_statements():
+        connection.exec_driver_sql(statement)
+
+def rebuild_search_index(connection=None):
+    """Re-index every note from scratch (caller commits); returns documents indexed"""
+    connection = connection or db.session.connection()
+    create_search_index(connection)
+    connection.exec_driver_sql("DELETE FROM search_index")
+    indexed = 0
+    for source in SOURCES:
+        result = connection.exec_driver_sql(
+            f"INSERT INTO search_index(rowid, body) "
+            f"SELECT id * 4 + {source.code}, {source.column} FROM {source.table} "
+            f"WHERE {_has_text(source.column)}"
+        )
+        indexed += result.rowcount
+    # Merge the b-tree segments written by the bulk insert
+    connection.exec_driver_sql("INSERT INTO search_index(search_index) VALUES ('optimize')")
+    return indexed
+
+def index_counts():
+    """Documents per kind currently in the index"""
+    rows = db.session.execute(text("SELECT rowid % 4, count(*) FROM search_index GROUP BY 1")).all()
+    counts = dict.fromkeys((source.kind for source in SOURCES), 0)
+    counts.update({_KINDS[code]: count for code, count in rows if code in _KINDS})
+    return counts
+
+_TERM = re.compile(r'"([^"]*)"|(\S+)')
+
+def build_match_query(query):
+    """
+    FTS5 MATCH expression for free text typed by a user: quoted phrases are
+    kept together, other words must all appear, and a trailing * makes a word
+    a prefix. Everything is quoted, so FTS5 operators in the input are inert.
+    """
+    terms = []
+    for phrase, word in _TERM.findall(query or ''):
+        prefix = False
+        if word:
+            prefix = word.endswith('*')
+            phrase = word.rstrip('*')
+        phrase = phrase.replace('"', '').strip()
+        if phrase:
+            terms.append(f'"{phrase}"' + ('*' if prefix else ''))
+    return ' '.join(terms)
+
+def _snippet_html(snippet):
+    return Markup(str(escape(snippet)).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>'))
+
+SearchHit = namedtuple('SearchHit', ['kind', 'id', 'snippet', 'title', 'subtitle', 'url_args'])
+
+def _describe(hits):
+    """Title, subtitle and link target per (kind, id), three queries at most"""
+    ids = {source.kind: [] for source in SOURCES}
+    for kind, ref_id in hits:
+        ids[kind].append(ref_id)
+    described = {}
+    if ids['order']:
+        for order_id, order_no, status, color, size in db.session.execute(
+            select(Order.id, Order.order_no, Order.status, Order.color, Order.size).where(Order.id.in_(ids['order']))
+        ):
+            described[('order', order_id)] = (
+                f"Order {order_no}", f"{color}, {size} - {status.replace('_', ' ')}",
+                ('view_order', {'order_id': order_id})
+            )
+    if ids['work_log']:
+        for work_log_id, work_date, employee, order_no, process in db.session.execute(
+            select(WorkLog.id, WorkLog.date, Employee.name, Order.order_no, Process.name)
+            .join(Employee, Employee.id == WorkLog.employee_id)
+            .join(Order, Order.id == WorkLog.order_id)
+            .join(Process, Process.id == WorkLog.process_id)
+            .where(WorkLog.id.in_(ids['work_log']))
+        ):
+            described[('work_log', work_log_id)] = (
+                f"Work log - {order_no} / {process}", f"{employee}, {work_date.strftime('%b %d, %Y')}",
+                ('edit_work_log', {'work_log_id': work_log_id})
+            )
+    if ids['overage']:
+        for overage_id, order_no, process, units, status in db.session.execute(
+            select(Overage.id, Order.order_no, Process.name, Overage.overage_units, Overage.status)
+            .join(Order, Order.id == Overage.order_id)
+            .join(Process, Process.id == Overage.process_id)
+            .where(Overage.id.in_(ids['overage']))
+        ):
+            described[('overage', overage_id)] = (
+                f"Overage - {order_no} / {process}", f"+{units} units, {status}",
+                ('overage_detail', {'overage_id': overage_id})
+            )
+    return described
+
+def search_notes(query, kinds=None, page=1, per_page=RESULTS_PER_PAGE):
+    """
+    Ranked (bm25) matches for query, optionally only some kinds.
+    Returns (hits, has_more); hits whose row has gone are skipped.
+    """
+    match = build_match_query(query)
+    if not match:
+        return [], False
+    codes = [source.code for source in SOURCES if not kinds or source.kind in kinds]
+    params = {'match': match, 'limit': per_page + 1, 'offset': (max(page, 1) - 1) * per_page}
+    kind_filter = ', '.join(str(code) for code in codes)
+    rows = db.session.execute(text(
+        "SELECT rowid, snippet(search_index, 0, :start, :end, ' … ', 16) "
+        "FROM search_index WHERE search_index MATCH :match "
+        f"AND rowid % 4 IN ({kind_filter}) "
+        "ORDER BY rank LIMIT :limit OFFSET :offset"
+    ), dict(params, start=_MARK_START, end=_MARK_END)).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    located = [(_KINDS[rowid % 4], rowid // 4, snippet) for rowid, snippet in rows]
+    described = _describe((kind, ref_id) for kind, ref_id, _ in located)
+    hits = []
+    for kind, ref_id, snippet in located:
+        if (kind, ref_id) not in described:
+            continue
+        title, subtitle, url_args = described[(kind, ref_id)]
+        hits.append(SearchHit(kind, ref_id, _snippet_html(snippet), title, subtitle, url_args))
+    return hits, has_more
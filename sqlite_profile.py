@@ -0,0 +1,163 @@
+"""
+SQLite engine profile
+Every connection the app opens gets the same pragmas: WAL so a long report
+does not block tablets posting work logs, a busy timeout instead of instant
+"database is locked" errors, memory-mapped reads, a larger page cache and
+enforced foreign keys. Override single values with app.config['SQLITE_PRAGMAS'].
+
+Report-only queries can run on report_connection(), a separate engine that
+opens the file read-only, so they never take a write lock. Its checked-out
+connections are counted, so a restore can wait until none is in use.
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from urllib.parse import quote
+from sqlalchemy import create_engine, event
+
+# Applied in this order on every new connection; journal_mode is persistent
+# but is checked each time in case the file was replaced (e.g. a restore)
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,  # ms
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -32000,  # negative = KiB, so about 32 MB
+    'temp_store': 'MEMORY',
+    'foreign_keys': 'ON',
+}
+
+# Pragmas that only matter on connections that write
+_WRITE_ONLY_PRAGMAS = {'journal_mode', 'synchronous'}
+
+# Numeric PRAGMA results mapped back to the names used in DEFAULT_PRAGMAS
+_ENUM_VALUES = {
+    'synchronous': {0: 'OFF', 1: 'NORMAL', 2: 'FULL', 3: 'EXTRA'},
+    'temp_store': {0: 'DEFAULT', 1: 'FILE', 2: 'MEMORY'},
+    'foreign_keys': {0: 'OFF', 1: 'ON'},
+    'query_only': {0: 'OFF', 1: 'ON'},
+}
+
+_state = {'pragmas': dict(DEFAULT_PRAGMAS), 'read_only_engine': None, 'database_path': None,
+          'report_connections': 0}
+
+# Notified whenever a read-only connection is checked back in
+_report_checkins = threading.Condition()
+
+def _apply_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            # PRAGMA does not accept bound parameters; names and values come from config
+            cursor.execute(f'PRAGMA {name} = {value}')
+    finally:
+        cursor.close()
+
+def _read_pragmas(dbapi_connection, names):
+    cursor = dbapi_connection.cursor()
+    try:
+        values = {}
+        for name in names:
+            row = cursor.execute(f'PRAGMA {name}').fetchone()
+            value = row[0] if row else None
+            values[name] = _ENUM_VALUES.get(name, {}).get(value, value)
+        return values
+    finally:
+        cursor.close()
+
+def install_sqlite_profile(engine, pragmas=None):
+    """Apply pragmas to every connection engine opens"""
+    pragmas = dict(pragmas or DEFAULT_PRAGMAS)
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        _apply_pragmas(dbapi_connection, pragmas)
+
+    return pragmas
+
+def _read_only_uri(database_path):
+    path = os.path.abspath(database_path).replace(os.sep, '/')
+    if not path.startswith('/'):
+        path = '/' + path  # Windows drive letter: file:///C:/...
+    return f"sqlite:///file://{quote(path, safe='/:')}?mode=ro&uri=true"
+
+def _create_read_only_engine(database_path, pragmas):
+    engine = create_engine(
+        _read_only_uri(database_path),
+        connect_args={'check_same_thread': False}
+    )
+    read_pragmas = {name: value for name, value in pragmas.items() if name not in _WRITE_ONLY_PRAGMAS}
+    read_pragmas['query_only'] = 'ON'
+    install_sqlite_profile(engine, read_pragmas)
+
+    @event.listens_for(engine, 'checkout')
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        with _report_checkins:
+            _state['report_connections'] += 1
+
+    @event.listens_for(engine, 'checkin')
+    def _on_checkin(dbapi_connection, connection_record):
+        with _report_checkins:
+            _state['report_connections'] -= 1
+            _report_checkins.notify_all()
+
+    return engine
+
+def init_sqlite_profile(app, db, database_path):
+    """Install the profile on the app's engine (call inside an app context, before first use)"""
+    pragmas = dict(DEFAULT_PRAGMAS)
+    pragmas.update(app.config.get('SQLITE_PRAGMAS') or {})
+    _state['pragmas'] = install_sqlite_profile(db.engine, pragmas)
+    _state['database_path'] = database_path
+    _state['read_only_engine'] = None
+    return _state['pragmas']
+
+def read_only_engine():
+    """Engine that opens the database read-only (created on first use)"""
+    if _state['read_only_engine'] is None:
+        _state['read_only_engine'] = _create_read_only_engine(_state['database_path'], _state['pragmas'])
+    return _state['read_only_engine']
+
+@contextmanager
+def report_connection():
+    """Read-only connection for report queries; sees only committed data"""
+    with read_only_engine().connect() as connection:
+        yield connection
+
+def wait_for_report_connections(timeout):
+    """
+    Wait until no read-only connection is checked out (dispose() does not
+    close those); returns False on timeout
+    """
+    with _report_checkins:
+        return _report_checkins.wait_for(lambda: _state['report_connections'] <= 0, timeout)
+
+def dispose_read_only_engine():
+    """Close pooled read-only connections (e.g. before the database file is replaced)"""
+    engine = _state['read_only_engine']
+    if engine is not None:
+        engine.dispose()
+
+def checkpoint_wal(database_path):
+    """Fold the WAL back into the main file so a plain file copy of it is complete"""
+    timeout = _state['pragmas'].get('busy_timeout', 5000) / 1000
+    connection = sqlite3.connect(database_path, timeout=timeout)
+    try:
+        connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    finally:
+        connection.close()
+
+def profile_report(db):
+    """Pragma values requested and actually in effect, for the main and read-only engines"""
+    names = list(_state['pragmas'])
+    with db.engine.connect() as connection:
+        main = _read_pragmas(connection.connection.dbapi_connection, names)
+    with report_connection() as connection:
+        read_only = _read_pragmas(connection.connection.dbapi_connection, names + ['query_only'])
+    return {
+        'requested': dict(_state['pragmas']),
+        'main': main,
+        'read_only': read_only,
+    }
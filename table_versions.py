@@ -0,0 +1,69 @@
+"""
+Table version counters
+table_versions holds one version number per table, bumped inside the flush
+that inserts, updates or deletes rows of that table, so it commits or rolls
+back with the change and is shared by every process using the database.
+Versions are microsecond timestamps (or the previous version + 1 if the
+clock has not moved on), so a number is never reused for different contents,
+not even after a backup is restored. They make cheap, strong HTTP ETags.
+Each bump is also handed to commit handlers as a table_versions change
+(old and new version), so an in-memory cache can tell whether the version
+it holds plus this commit's changes is the new version.
+"""
+
+import time
+from datetime import datetime
+from sqlalchemy import select, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, TableVersion
+from change_tracking import ModelChange, on_flush
+
+# Tables whose contents are served as versioned reference data
+VERSIONED_TABLES = ('orders', 'processes', 'employees')
+
+def bump_table_versions(connection, table_names):
+    """Give each table a new version in the current transaction; returns name -> (old version, new version)"""
+    table_names = sorted(set(table_names))
+    table = TableVersion.__table__
+    old = _versions(connection, table_names)
+    now = datetime.utcnow()
+    clock = int(time.time() * 1000000)
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.table_name],
+        set_={
+            'version': func.max(table.c.version + 1, stmt.excluded.version),
+            'updated_at': stmt.excluded.updated_at,
+        }
+    )
+    connection.execute(stmt, [
+        {'table_name': name, 'version': clock, 'updated_at': now}
+        for name in table_names
+    ])
+    new = _versions(connection, table_names)
+    return {name: (old[name], new[name]) for name in table_names}
+
+def _versions(connection, table_names):
+    table = TableVersion.__table__
+    versions = dict.fromkeys(table_names, 0)
+    versions.update(connection.execute(
+        select(table.c.table_name, table.c.version).where(table.c.table_name.in_(table_names))
+    ).all())
+    return versions
+
+@on_flush(*VERSIONED_TABLES)
+def _bump_versions_on_flush(connection, changes):
+    versions = bump_table_versions(connection, {change.table for change in changes})
+    return [
+        ModelChange('table_versions', 'update', {'table_name': name, 'version': old}, {'table_name': name, 'version': new}, {'version'})
+        for name, (old, new) in versions.items()
+    ]
+
+def get_table_versions(*table_names):
+    """Map table name -> current version (0 for a table never changed since versioning began)"""
+    rows = db.session.execute(
+        select(TableVersion.table_name, TableVersion.version).where(TableVersion.table_name.in_(table_names))
+    ).all()
+    versions = dict.fromkeys(table_names, 0)
+    versions.update(dict(rows))
+    return versions
@@ -0,0 +1,72 @@
+"""
+Shared fixtures: the app runs against a temporary database created by
+startup(), so the tests never touch oleema.db.
+"""
+
+import os
+import sys
+import tempfile
+from datetime import date
+
+import pytest
+
+_data_dir = tempfile.mkdtemp(prefix='oleema-tests-')
+os.environ['OLEEMA_DATABASE_PATH'] = os.path.join(_data_dir, 'oleema.db')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as flask_app, db, startup
+from models import Employee, Order, Process, WorkLog
+
+flask_app.config['TESTING'] = True
+flask_app.config['REPORT_CACHE_DIR'] = os.path.join(_data_dir, 'reports')
+startup()
+
+@pytest.fixture
+def app():
+    with flask_app.app_context():
+        yield flask_app
+        db.session.rollback()
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['logged_in'] = True
+        session['user_id'] = 1
+        session['username'] = 'admin'
+    return client
+
+_sequence = iter(range(1, 1000000))
+
+@pytest.fixture
+def make_order(app):
+    """Create an order (unique order number) and return it"""
+    def make(quantity=10, status='in_progress'):
+        order = Order(order_no=f"T{next(_sequence)}", date=date.today(), color='red', size='M', quantity=quantity, status=status)
+        db.session.add(order)
+        db.session.commit()
+        return order
+    return make
+
+@pytest.fixture
+def employee(app):
+    employee = Employee(employee_id=f"E{next(_sequence)}", name='Test Employee', pay_rate=0)
+    db.session.add(employee)
+    db.session.commit()
+    return employee
+
+@pytest.fixture
+def process(app):
+    return Process.query.order_by(Process.id).first()
+
+@pytest.fixture
+def log_work(app, employee, process):
+    """Commit a work log for the test employee (first process unless given)"""
+    def log(order, quantity, process_id=None, work_date=None):
+        work_log = WorkLog(employee_id=employee.id, order_id=order.id, process_id=process_id or process.id,
+                           quantity=quantity, hours_worked=1.0, date=work_date or date.today())
+        db.session.add(work_log)
+        db.session.commit()
+        return work_log
+    return log
@@ -0,0 +1,36 @@
+"""Backup store shared by the web app and auto_backup.py"""
+
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+from backup_store import BackupStore
+
+def _database(path, label, rows):
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE notes (body TEXT)")
+    connection.executemany("INSERT INTO notes VALUES (?)", [(f"{label} {n} " * 20,) for n in range(rows)])
+    connection.commit()
+    connection.close()
+    return path
+
+def test_two_stores_on_one_directory_keep_each_others_snapshots(tmp_path):
+    directory = str(tmp_path / 'store')
+    retention = {'recent_hours': 1, 'daily': 1, 'weekly': 0, 'monthly': 0}
+    # The web app's store is built at import, long before cron runs
+    web = BackupStore(directory, retention)
+    cron = BackupStore(directory, retention)
+
+    old = web.add_file(_database(str(tmp_path / 'old.db'), 'old', 500), datetime.now() - timedelta(days=400))
+    cron_entry = cron.add_file(_database(str(tmp_path / 'cron.db'), 'cron', 2000))
+    web_entry = web.add_file(_database(str(tmp_path / 'web.db'), 'web', 2000))
+    assert web.apply_retention() == [old['id']]
+
+    for store in (web, cron, BackupStore(directory, retention)):
+        assert [entry['id'] for entry in store.list_snapshots()] == [web_entry['id'], cron_entry['id']]
+    # The chunks only the cron snapshot uses survived garbage collection
+    restored = cron.restore_to(cron_entry['id'], str(tmp_path / 'restored.db'))
+    connection = sqlite3.connect(restored)
+    assert connection.execute("SELECT count(*) FROM notes").fetchone() == (2000,)
+    connection.close()
+    assert os.path.exists(os.path.join(directory, 'catalog.lock'))
@@ -0,0 +1,36 @@
+"""Restore waits for everything still reading the database"""
+
+import os
+
+import pytest
+
+from app import app as flask_app, db, DATABASE_PATH
+import database_restore
+from backup_manager import BackupError, backup_database
+from database_restore import request_gate, restore_database
+from sqlite_profile import report_connection
+
+def test_streamed_export_holds_the_gate_until_closed(client, make_order, log_work):
+    log_work(make_order(), 3)
+    active = request_gate.active
+    response = client.get('/export/work-logs.csv')
+    assert response.status_code == 200
+    assert request_gate.active == active + 1
+
+    assert next(response.response)
+    response.close()
+    assert request_gate.active == active
+
+def test_restore_waits_for_report_connections(app, monkeypatch, tmp_path):
+    backup_path = str(tmp_path / 'backup.db')
+    backup_database(DATABASE_PATH, backup_path)
+    monkeypatch.setattr(database_restore, 'DRAIN_TIMEOUT', 0.1)
+
+    with flask_app.test_request_context():
+        with report_connection():
+            with pytest.raises(BackupError, match='report queries'):
+                restore_database(db, backup_path, DATABASE_PATH)
+        # The gate is open again and the staged copy was not swapped in
+        assert not os.path.exists(f"{DATABASE_PATH}.restore")
+        assert request_gate.enter(timeout=0)
+        request_gate.leave()
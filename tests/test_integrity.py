@@ -0,0 +1,49 @@
+"""Integrity checker repairs under SQLite's foreign key enforcement"""
+
+from sqlalchemy import text
+
+from app import db
+from integrity import check_integrity
+from models import Order, Overage, WorkLogOverage
+
+def _without_foreign_keys(*statements):
+    """Run statements with enforcement off, the way old databases were written"""
+    with db.engine.connect() as connection:
+        connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+        try:
+            for statement, params in statements:
+                connection.execute(text(statement), params)
+            connection.commit()
+        finally:
+            connection.exec_driver_sql('PRAGMA foreign_keys=ON')
+
+def _overage_with_attributions(make_order, log_work):
+    order = make_order(quantity=10)
+    log_work(order, 8)
+    log_work(order, 5)
+    overage = Overage.query.filter_by(order_id=order.id, status='pending').one()
+    assert WorkLogOverage.query.filter_by(overage_id=overage.id).count() > 0
+    return order.id, overage.id
+
+def test_fix_removes_orphaned_overage_with_attributions(app, make_order, log_work):
+    _, overage_id = _overage_with_attributions(make_order, log_work)
+    _without_foreign_keys(("UPDATE overages SET order_id = :missing WHERE id = :id",
+                           {'missing': 999999999, 'id': overage_id}))
+
+    results = check_integrity(['overages', 'work_log_overages'], fix=True)
+
+    assert sum(result.count for result in results) == 1
+    assert db.session.get(Overage, overage_id) is None
+    assert WorkLogOverage.query.filter_by(overage_id=overage_id).count() == 0
+    assert not any(result.count for result in check_integrity(['overages', 'work_log_overages']))
+
+def test_fix_removes_everything_left_by_a_deleted_order(app, make_order, log_work):
+    order_id, overage_id = _overage_with_attributions(make_order, log_work)
+    _without_foreign_keys(("DELETE FROM orders WHERE id = :id", {'id': order_id}))
+    db.session.expire_all()
+
+    check_integrity(fix=True)
+
+    assert not any(result.count for result in check_integrity())
+    assert db.session.get(Overage, overage_id) is None
+    assert db.session.get(Order, order_id) is None
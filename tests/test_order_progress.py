@@ -0,0 +1,32 @@
+"""Order progress cache bookkeeping"""
+
+import order_progress
+from order_progress import OrderProgressCache
+
+def test_invalidation_keeps_no_state_for_idle_orders(app, make_order):
+    cache = OrderProgressCache(max_orders=2)
+    orders = [make_order() for _ in range(5)]
+    for order in orders:
+        cache.get(order)
+    cache.invalidate(range(10000))
+
+    assert not cache._entries and not cache._generations and not cache._lookups
+
+def test_result_computed_across_an_invalidation_is_not_stored(app, monkeypatch, make_order):
+    cache = OrderProgressCache()
+    order = make_order()
+    compute = order_progress.compute_order_progress
+
+    def compute_while_order_changes(order_id, quantity):
+        progress = compute(order_id, quantity)
+        cache.invalidate([order_id])
+        return progress
+
+    monkeypatch.setattr(order_progress, 'compute_order_progress', compute_while_order_changes)
+    cache.get(order)
+    assert order.id not in cache._entries
+    assert not cache._generations and not cache._lookups
+
+    monkeypatch.setattr(order_progress, 'compute_order_progress', compute)
+    cache.get(order)
+    assert order.id in cache._entries
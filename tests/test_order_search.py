@@ -0,0 +1,36 @@
+"""Order typeahead index kept current from commits"""
+
+from app import db
+import order_search
+from order_search import order_search_index
+from table_versions import bump_table_versions, get_table_versions
+
+def _count_loads(monkeypatch):
+    loads = []
+    load = order_search.OrderSearchIndex._load
+    monkeypatch.setattr(order_search.OrderSearchIndex, '_load', lambda self: (loads.append(1), load(self)))
+    monkeypatch.setattr(order_search, 'RECHECK_SECONDS', 0)
+    return loads
+
+def test_own_commit_moves_index_to_new_version(app, monkeypatch, make_order):
+    loads = _count_loads(monkeypatch)
+    order_search_index.invalidate()
+    assert not order_search_index.exists('missing')
+    order = make_order()
+
+    assert order_search_index._version == get_table_versions('orders')['orders']
+    assert order_search_index.exists(order.order_no)
+    assert len(loads) == 1
+
+def test_version_bumped_elsewhere_still_reloads(app, monkeypatch, make_order):
+    loads = _count_loads(monkeypatch)
+    order_search_index.invalidate()
+    order_search_index.exists('missing')
+    # Another process commits an order change between our load and our commit
+    with db.engine.begin() as connection:
+        bump_table_versions(connection, ['orders'])
+    order = make_order()
+
+    assert order_search_index.exists(order.order_no)
+    assert len(loads) == 2
+    assert order_search_index._version == get_table_versions('orders')['orders']
@@ -0,0 +1,27 @@
+"""Overage ledger lookups over many order/process pairs"""
+
+from app import db
+import overage_ledger
+from overage_ledger import sync_overages
+from models import Overage, OrderProcessTotal
+
+def test_sync_overages_chunks_pair_lookups(app, monkeypatch, make_order, log_work):
+    orders = [make_order(quantity=5) for _ in range(5)]
+    for index, order in enumerate(orders):
+        log_work(order, 6 + index)
+    process_id = Overage.query.filter_by(order_id=orders[0].id).one().process_id
+    order_ids = [order.id for order in orders]
+    pairs = [(order_id, process_id) for order_id in order_ids]
+
+    # Totals drop back within the quantity for two orders behind the ledger's back
+    db.session.execute(
+        OrderProcessTotal.__table__.update()
+        .where(OrderProcessTotal.order_id.in_(order_ids[:2]))
+        .values(total_quantity=5)
+    )
+    monkeypatch.setattr(overage_ledger, 'PAIR_CHUNK_SIZE', 2)
+    sync_overages(db.session.connection(), pairs)
+
+    pending = {overage.order_id: overage.overage_units
+               for overage in Overage.query.filter(Overage.order_id.in_(order_ids), Overage.status == 'pending')}
+    assert pending == {order_ids[2]: 3, order_ids[3]: 4, order_ids[4]: 5}
@@ -0,0 +1,31 @@
+"""Keyset listings seek on an index instead of sorting the table"""
+
+from sqlalchemy import event
+
+from app import db
+from queries import order_page
+
+def _statements(run):
+    statements = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        run()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+    return statements
+
+def test_order_pages_seek_on_created_at_index(app, make_order):
+    for _ in range(3):
+        make_order()
+    first = order_page({}, limit=2)
+    [(statement, parameters)] = _statements(lambda: order_page({}, first.next_cursor, limit=2))
+
+    plan = ' '.join(row[-1] for row in db.session.connection().exec_driver_sql(
+        f'EXPLAIN QUERY PLAN {statement}', parameters))
+    assert 'ix_orders_created_at_id' in plan
+    assert 'TEMP B-TREE' not in plan
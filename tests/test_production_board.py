@@ -0,0 +1,42 @@
+"""Production board events for committed changes"""
+
+import json
+from datetime import date
+
+import pytest
+
+from app import db
+from models import Overage, WorkLog
+from production_board import broadcaster
+
+@pytest.fixture
+def screen(app):
+    subscription = broadcaster.subscribe()
+    yield subscription
+    broadcaster.unsubscribe(subscription)
+
+def _events(subscription, name):
+    events = []
+    while not subscription.queue.empty():
+        lines = subscription.queue.get_nowait().decode('utf-8').splitlines()
+        if f"event: {name}" in lines:
+            events.append(json.loads(''.join(line[len('data: '):] for line in lines if line.startswith('data: '))))
+    return events
+
+def test_over_quantity_work_log_broadcasts_overage(client, screen, make_order, employee, process):
+    order = make_order(quantity=5)
+    form = {'employee_id': employee.id, 'order_id': order.id, 'process_id': process.id,
+            'quantity': 8, 'date': date.today().isoformat()}
+    assert client.post('/work-log', data=form).headers['Location'].endswith('/approve-overage')
+    client.post('/approve-overage', data={'action': 'approve'})
+
+    overage_id = Overage.query.filter_by(order_id=order.id, status='pending').one().id
+    [event] = _events(screen, 'overage')
+    assert (event['id'], event['status'], event['old_status']) == (overage_id, 'pending', None)
+    assert (event['overage_units'], event['order_no'], event['process']) == (3, order.order_no, process.name)
+
+    # Deleting the work log brings the order back within its quantity and retires the overage
+    work_log_id = db.session.execute(db.select(WorkLog.id).where(WorkLog.order_id == order.id)).scalar()
+    client.post(f'/work-logs/{work_log_id}/delete')
+    [event] = _events(screen, 'overage')
+    assert (event['id'], event['status'], event['old_status']) == (overage_id, None, 'pending')
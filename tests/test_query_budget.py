@@ -0,0 +1,69 @@
+"""Per-request statement budgets catch N+1 queries on list pages and work logging"""
+
+from datetime import date
+
+import pytest
+
+from app import db
+from models import Overage
+from query_budget import DEFAULT_BUDGETS, QueryBudgetExceeded
+
+@pytest.fixture
+def budgets(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'QUERY_BUDGET_ENABLED', True)
+    monkeypatch.setitem(app.config, 'QUERY_BUDGETS', dict(DEFAULT_BUDGETS))
+    return app.config['QUERY_BUDGETS']
+
+@pytest.fixture
+def production(make_order, log_work, process):
+    """Several orders with work logged against them and one overage, so a query per row would show"""
+    orders = [make_order(quantity=10) for _ in range(3)]
+    for order in orders:
+        log_work(order, 4)
+        log_work(order, 4)
+    log_work(orders[0], 5)
+    overage = Overage.query.filter_by(order_id=orders[0].id, status='pending').one()
+    return {'order': orders[0], 'overage': overage}
+
+def _page_urls(production):
+    return [
+        '/dashboard', '/work-log', '/work-logs', '/api/work-logs', '/orders', '/api/orders/list',
+        f"/orders/{production['order'].id}", '/overages', f"/overages/{production['overage'].id}",
+        '/employees', '/processes',
+    ]
+
+def test_list_pages_stay_within_their_budgets(app, client, budgets, production):
+    urls = app.url_map.bind('localhost')
+    visited = set()
+    for url in _page_urls(production):
+        response = client.get(url)
+        assert response.status_code == 200, url
+        assert 'X-Query-Count' in response.headers
+        visited.add(('GET', urls.match(url)[0]))
+    assert visited == {key for key in DEFAULT_BUDGETS if key[0] == 'GET'}
+
+def test_posting_a_work_log_stays_within_its_budget(client, budgets, make_order, employee, process):
+    order = make_order(quantity=100, status='pending')
+    form = {'employee_id': employee.id, 'order_id': order.id, 'process_id': process.id,
+            'quantity': 3, 'date': date.today().isoformat()}
+
+    for _ in range(2):
+        response = client.post('/work-log', data=form)
+        assert response.status_code == 302
+        assert int(response.headers['X-Query-Count']) <= budgets[('POST', 'work_log')]
+
+def test_posts_and_pages_have_separate_budgets(client, budgets, make_order, employee, process):
+    budgets[('POST', 'work_log')] = 0
+    assert client.get('/work-log').status_code == 200
+
+    order = make_order(quantity=100)
+    form = {'employee_id': employee.id, 'order_id': order.id, 'process_id': process.id,
+            'quantity': 3, 'date': date.today().isoformat()}
+    with pytest.raises(QueryBudgetExceeded):
+        client.post('/work-log', data=form)
+    db.session.rollback()
+
+def test_overrun_fails_in_testing(client, budgets, production):
+    budgets[('GET', 'work_logs')] = 0
+    with pytest.raises(QueryBudgetExceeded):
+        client.get('/work-logs')
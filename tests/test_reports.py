@@ -0,0 +1,25 @@
+"""Pivot cache invalidation by reference data changes"""
+
+from werkzeug.datastructures import MultiDict
+
+from app import db
+from reports import parse_report_params, pivot_cache
+
+def _pivot_cached(params):
+    return pivot_cache.get(params)[1]
+
+def test_status_change_keeps_cached_pivots(app, make_order, log_work):
+    order = make_order(quantity=10, status='pending')
+    log_work(order, 4)
+    params = parse_report_params(MultiDict([('rows', 'order'), ('measures', 'pieces')]))
+    pivot_cache.invalidate()
+    pivot_cache.get(params)
+
+    order.status = 'completed'
+    db.session.commit()
+    make_order()
+    assert _pivot_cached(params)
+
+    order.order_no = f"{order.order_no}-R"
+    db.session.commit()
+    assert not _pivot_cached(params)
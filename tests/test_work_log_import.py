@@ -0,0 +1,31 @@
+"""Bulk work log import across several insert batches"""
+
+import io
+
+from app import db
+import work_log_import
+from order_totals import verify_order_process_totals
+from rollups import verify_rollups
+from models import Order, Overage, WorkLog, WorkLogOverage
+
+def _csv(rows):
+    lines = ['employee_id,order_no,process,quantity,date,hours_worked']
+    lines += [','.join(str(value) for value in row) for row in rows]
+    return io.BytesIO('\n'.join(lines).encode())
+
+def test_multi_batch_import_keeps_derived_data_exact(app, monkeypatch, make_order, employee, process):
+    monkeypatch.setattr(work_log_import, 'INSERT_BATCH_SIZE', 3)
+    order = make_order(quantity=20, status='pending')
+    rows = [(employee.employee_id, order.order_no, process.name, 3, order.date, 1.0) for _ in range(8)]
+    report = work_log_import.import_work_logs(_csv(rows))
+
+    assert report.imported == 8 and not report.errors
+    assert not verify_order_process_totals()
+    assert not any(verify_rollups().values())
+    assert db.session.get(Order, order.id).status == 'in_progress'
+    # 24 pieces against 20 ordered: attributed to the real imported rows
+    assert [entry['overage_units'] for entry in report.overages] == [4]
+    imported_ids = {work_log.id for work_log in WorkLog.query.filter_by(order_id=order.id)}
+    overage = Overage.query.filter_by(order_id=order.id, status='pending').one()
+    attributed = {attribution.work_log_id for attribution in WorkLogOverage.query.filter_by(overage_id=overage.id)}
+    assert attributed and attributed <= imported_ids
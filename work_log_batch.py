@@ -0,0 +1,171 @@
+"""
+Multi-row work log entry
+A shop-floor grid submits a whole shift's work logs at once. All rows are
+applied in one transaction and one flush, so running totals, payroll and
+overages are evaluated once per touched order/process instead of once per
+entry.
+
+Rows are checked against the order quantity in submission order, the same
+way the single-entry form checks one row: a row that would take its
+order/process over the quantity is not saved and comes back as
+needs_approval, unless it carries "approve": true (or the whole batch is
+approved), in which case it is saved and the overage is recorded.
+"""
+
+from datetime import datetime
+from sqlalchemy import select
+from models import db, Employee, Order, Process, WorkLog
+from overage_ledger import lock_for_overage_check, current_totals
+
+# Largest batch accepted in one request
+MAX_BATCH_ROWS = 500
+
+OPEN_ORDER_STATUSES = ('pending', 'in_progress')
+
+class BatchError(ValueError):
+    """Raised when the request as a whole is invalid"""
+
+def _int(value):
+    if isinstance(value, bool):
+        raise ValueError
+    return int(value)
+
+def _parse_row(row, employees, orders, processes):
+    """Return (values, None) or (None, error message) for one submitted row"""
+    if not isinstance(row, dict):
+        return None, 'Row must be an object'
+    try:
+        employee_id = _int(row.get('employee_id'))
+        order_id = _int(row.get('order_id'))
+        process_id = _int(row.get('process_id'))
+    except (TypeError, ValueError):
+        return None, 'employee_id, order_id and process_id are required'
+    if employee_id not in employees:
+        return None, f'Unknown or inactive employee {employee_id}'
+    if order_id not in orders:
+        return None, f'Unknown order {order_id}'
+    if orders[order_id] not in OPEN_ORDER_STATUSES:
+        return None, f'Order {order_id} is {orders[order_id]}'
+    if process_id not in processes:
+        return None, f'Unknown or inactive process {process_id}'
+    try:
+        quantity = _int(row.get('quantity'))
+    except (TypeError, ValueError):
+        return None, 'Invalid quantity'
+    if quantity <= 0:
+        return None, 'Quantity must be greater than 0'
+    try:
+        work_date = datetime.strptime(str(row.get('date') or ''), '%Y-%m-%d').date()
+    except ValueError:
+        return None, 'Invalid date (expected YYYY-MM-DD)'
+    try:
+        hours_worked = float(row.get('hours_worked') or 0)
+    except (TypeError, ValueError):
+        return None, 'Invalid hours_worked'
+    return {
+        'employee_id': employee_id,
+        'order_id': order_id,
+        'process_id': process_id,
+        'quantity': quantity,
+        'date': work_date,
+        'hours_worked': hours_worked,
+        'notes': row.get('notes') or None,
+    }, None
+
+def _lookups(rows):
+    """Active employees, order statuses and active processes referenced by the rows"""
+    def ids(key):
+        found = set()
+        for row in rows:
+            if isinstance(row, dict):
+                try:
+                    found.add(_int(row.get(key)))
+                except (TypeError, ValueError):
+                    pass
+        return found
+
+    employees = set(db.session.execute(
+        select(Employee.id).where(Employee.id.in_(ids('employee_id')), Employee.is_active == True)
+    ).scalars())
+    orders = dict(db.session.execute(
+        select(Order.id, Order.status).where(Order.id.in_(ids('order_id')))
+    ).all())
+    processes = set(db.session.execute(
+        select(Process.id).where(Process.id.in_(ids('process_id')), Process.is_active == True)
+    ).scalars())
+    return employees, orders, processes
+
+def apply_work_log_batch(rows, approve_all=False, dry_run=False):
+    """
+    Apply submitted work log rows in one transaction.
+    Returns a summary with one result per row, in submission order:
+    {'index', 'status': 'created' | 'needs_approval' | 'error' | 'valid', ...}
+    ('valid' is used instead of 'created' for a dry run).
+    """
+    if not isinstance(rows, list):
+        raise BatchError('rows must be a list')
+    if len(rows) > MAX_BATCH_ROWS:
+        raise BatchError(f'At most {MAX_BATCH_ROWS} rows per request')
+
+    employees, orders, processes = _lookups(rows)
+    results = []
+    accepted = []
+    try:
+        parsed = []
+        for index, row in enumerate(rows):
+            values, error = _parse_row(row, employees, orders, processes)
+            if error:
+                results.append({'index': index, 'status': 'error', 'error': error})
+            else:
+                approved = approve_all or (isinstance(row, dict) and row.get('approve') is True)
+                parsed.append((index, values, approved))
+                results.append(None)
+
+        # Hold the write lock from here so the totals cannot move under us
+        connection = db.session.connection()
+        lock_for_overage_check(connection)
+        totals = current_totals(connection, [(values['order_id'], values['process_id']) for _, values, _ in parsed])
+        running = {pair: logged for pair, (_, logged) in totals.items()}
+
+        for index, values, approved in parsed:
+            pair = (values['order_id'], values['process_id'])
+            limit = totals[pair][0]
+            after = running[pair] + values['quantity']
+            excess = max(0, after - max(limit, running[pair]))
+            result = {'index': index, 'order_id': pair[0], 'process_id': pair[1]}
+            if excess and not approved:
+                result.update(status='needs_approval', overage_units=excess,
+                              error=f'Overage: {excess} units over limit')
+            else:
+                result.update(status='valid' if dry_run else 'created', overage_units=excess)
+                running[pair] = after
+                accepted.append((result, WorkLog(**values)))
+            results[index] = result
+
+        if dry_run or not accepted:
+            db.session.rollback()
+        else:
+            db.session.add_all(work_log for _, work_log in accepted)
+            for order in Order.query.filter(
+                Order.id.in_({work_log.order_id for _, work_log in accepted}), Order.status == 'pending'
+            ):
+                order.status = 'in_progress'
+            db.session.flush()
+            for result, work_log in accepted:
+                result['id'] = work_log.id
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    counts = {status: 0 for status in ('created', 'valid', 'needs_approval', 'error')}
+    for result in results:
+        counts[result['status']] += 1
+    return {
+        'dry_run': dry_run,
+        'created': counts['created'],
+        'valid': counts['valid'],
+        'needs_approval': counts['needs_approval'],
+        'errors': counts['error'],
+        'rows': results,
+    }
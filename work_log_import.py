@@ -0,0 +1,379 @@
+"""
+Bulk work log import
+Work logs are read from CSV or JSON one record at a time, so file size does
+not matter. Records are checked against employee/order/process lookups
+loaded once per import and inserted in batches with executemany. Derived
+data (running totals, rollups, payroll invalidation and overages) is
+updated after each batch from that batch's rows, so memory is bounded by
+the batch size rather than the file. Records that fail validation are
+skipped and listed in the report with their line number.
+
+Columns (CSV header or JSON keys):
+    employee_id   employee code, e.g. E001
+    order_no      order number
+    process       process name
+    quantity      pieces (> 0)
+    date          YYYY-MM-DD
+    hours_worked  optional
+    notes         optional
+"""
+
+import csv
+import io
+import json
+import time
+from datetime import datetime
+from sqlalchemy import select, func, tuple_
+from models import db, Employee, Order, Process, WorkLog, Overage
+from change_tracking import ModelChange, publish_changes, queue_commit_changes
+
+# Rows per executemany
+INSERT_BATCH_SIZE = 5000
+
+# Keys per IN (...) lookup, well under SQLite's bound-variable limit
+LOOKUP_CHUNK_SIZE = 400
+
+# Characters read from a JSON array per chunk
+JSON_READ_SIZE = 64 * 1024
+
+# Orders that can still receive work logs (same as the work log form)
+OPEN_ORDER_STATUSES = ('pending', 'in_progress')
+
+class ImportFormatError(ValueError):
+    """Raised when the file itself cannot be parsed"""
+
+class ImportReport:
+    """Outcome of one import"""
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.rows_read = 0
+        self.imported = 0
+        self.errors = []  # {'line': n, 'error': message}
+        self.overages = []  # {'order_no', 'process', 'overage_units'}
+        self.duration = 0.0
+
+    def add_error(self, line, message):
+        self.errors.append({'line': line, 'error': message})
+
+    def to_dict(self, max_errors=None):
+        errors = self.errors if max_errors is None else self.errors[:max_errors]
+        return {
+            'dry_run': self.dry_run,
+            'rows_read': self.rows_read,
+            'imported': self.imported,
+            'error_count': len(self.errors),
+            'errors': errors,
+            'overages': self.overages,
+            'duration': round(self.duration, 3),
+        }
+
+# Parsing
+
+def _text_stream(binary_stream):
+    return io.TextIOWrapper(binary_stream, encoding='utf-8-sig', newline='')
+
+def iter_csv_records(binary_stream):
+    """Yield (line number, record dict) from a CSV file with a header row"""
+    text = _text_stream(binary_stream)
+    try:
+        reader = csv.DictReader(text)
+        if reader.fieldnames is None:
+            return
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+        for record in reader:
+            yield reader.line_num, record
+    except csv.Error as e:
+        raise ImportFormatError(f'Invalid CSV: {e}')
+    finally:
+        text.detach()
+
+def _iter_json_array(text, buffer):
+    """Yield (item number, item) from a JSON array without loading the whole array"""
+    decoder = json.JSONDecoder()
+    position = buffer.index('[') + 1
+    eof = False
+    index = 0
+    expect_value = True
+    while True:
+        # Skip whitespace and separators, reading more text as needed
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n':
+                position += 1
+            if position < len(buffer) or eof:
+                break
+            chunk = text.read(JSON_READ_SIZE)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+        if position >= len(buffer):
+            raise ImportFormatError('Invalid JSON: unexpected end of file')
+        char = buffer[position]
+        if char == ']':
+            return
+        if not expect_value:
+            if char != ',':
+                raise ImportFormatError(f'Invalid JSON: expected "," after item {index}')
+            position += 1
+            expect_value = True
+            continue
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as e:
+            if eof:
+                raise ImportFormatError(f'Invalid JSON: {e.msg} in item {index + 1}')
+            chunk = text.read(JSON_READ_SIZE)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        index += 1
+        yield index, item
+        position = end
+        expect_value = False
+
+def iter_json_records(binary_stream):
+    """Yield (item/line number, record dict) from a JSON array or JSON Lines file"""
+    text = _text_stream(binary_stream)
+    try:
+        buffer = ''
+        while not buffer.strip():
+            chunk = text.read(JSON_READ_SIZE)
+            if not chunk:
+                return
+            buffer += chunk
+        if buffer.lstrip().startswith('['):
+            yield from _iter_json_array(text, buffer)
+            return
+        # JSON Lines: one object per line
+        line_number = 0
+        for line in _lines(buffer, text):
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, ImportFormatError(f'Invalid JSON: {e.msg}')
+    finally:
+        text.detach()
+
+def _lines(buffer, text):
+    """Lines of buffer followed by the rest of text"""
+    pending = buffer
+    while True:
+        *complete, pending = pending.split('\n')
+        yield from complete
+        chunk = text.read(JSON_READ_SIZE)
+        if not chunk:
+            if pending:
+                yield pending
+            return
+        pending += chunk
+
+def iter_records(binary_stream, file_format):
+    if file_format == 'csv':
+        return iter_csv_records(binary_stream)
+    if file_format in ('json', 'jsonl'):
+        return iter_json_records(binary_stream)
+    raise ImportFormatError(f'Unsupported format: {file_format}')
+
+def format_from_filename(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if filename and '.' in filename else ''
+    return 'json' if extension in ('json', 'jsonl', 'ndjson') else 'csv'
+
+# Validation
+
+class ImportLookups:
+    """Employees, orders and processes by the keys used in import files (one query each)"""
+
+    def __init__(self):
+        self.employees = {
+            code.strip().lower(): employee_id
+            for employee_id, code in db.session.execute(
+                select(Employee.id, Employee.employee_id).where(Employee.is_active == True)
+            )
+        }
+        self.orders = {
+            order_no.strip().lower(): (order_id, status)
+            for order_id, order_no, status in db.session.execute(select(Order.id, Order.order_no, Order.status))
+        }
+        self.processes = {
+            name.strip().lower(): process_id
+            for process_id, name in db.session.execute(
+                select(Process.id, Process.name).where(Process.is_active == True)
+            )
+        }
+        # Import files repeat a handful of dates; parse each once
+        self.dates = {}
+
+def _text(record, key):
+    value = record.get(key)
+    if value is None:
+        return ''
+    return str(value).strip()
+
+def validate_record(record, lookups):
+    """Return (row values, None) or (None, error message) for one record"""
+    if isinstance(record, Exception):
+        return None, str(record)
+    if not isinstance(record, dict):
+        return None, 'Each item must be an object'
+    record = {str(key).strip().lower(): value for key, value in record.items()}
+
+    employee_code = _text(record, 'employee_id')
+    employee_id = lookups.employees.get(employee_code.lower())
+    if employee_id is None:
+        return None, f"Unknown or inactive employee '{employee_code}'"
+
+    order_no = _text(record, 'order_no')
+    order = lookups.orders.get(order_no.lower())
+    if order is None:
+        return None, f"Unknown order '{order_no}'"
+    order_id, status = order
+    if status not in OPEN_ORDER_STATUSES:
+        return None, f"Order '{order_no}' is {status}"
+
+    process_name = _text(record, 'process')
+    process_id = lookups.processes.get(process_name.lower())
+    if process_id is None:
+        return None, f"Unknown or inactive process '{process_name}'"
+
+    try:
+        quantity = int(_text(record, 'quantity'))
+    except ValueError:
+        return None, f"Invalid quantity '{_text(record, 'quantity')}'"
+    if quantity <= 0:
+        return None, 'Quantity must be greater than 0'
+
+    date_text = _text(record, 'date')
+    work_date = lookups.dates.get(date_text)
+    if work_date is None:
+        try:
+            work_date = datetime.strptime(date_text, '%Y-%m-%d').date()
+        except ValueError:
+            return None, f"Invalid date '{date_text}' (expected YYYY-MM-DD)"
+        lookups.dates[date_text] = work_date
+
+    hours = _text(record, 'hours_worked')
+    try:
+        hours_worked = float(hours) if hours else 0.0
+    except ValueError:
+        return None, f"Invalid hours_worked '{hours}'"
+
+    return {
+        'employee_id': employee_id,
+        'order_id': order_id,
+        'process_id': process_id,
+        'quantity': quantity,
+        'date': work_date,
+        'hours_worked': hours_worked,
+        'notes': _text(record, 'notes') or None,
+    }, None
+
+# Import
+
+def _pending_overages(pairs):
+    """Pending overages of the given (order_id, process_id) pairs"""
+    pairs = sorted(pairs)
+    overages = []
+    for start in range(0, len(pairs), LOOKUP_CHUNK_SIZE):
+        chunk = pairs[start:start + LOOKUP_CHUNK_SIZE]
+        overages.extend(db.session.execute(
+            select(Order.order_no, Process.name, Overage.overage_units)
+            .join(Order, Order.id == Overage.order_id)
+            .join(Process, Process.id == Overage.process_id)
+            .where(Overage.status == 'pending', tuple_(Overage.order_id, Overage.process_id).in_(chunk))
+            .order_by(Order.order_no, Process.name)
+        ).all())
+    return [{'order_no': order_no, 'process': name, 'overage_units': units} for order_no, name, units in overages]
+
+def _start_orders(order_ids):
+    """Same status change as adding a single work log: pending orders become in progress"""
+    order_ids = sorted(order_ids)
+    if not order_ids:
+        return
+    for start in range(0, len(order_ids), LOOKUP_CHUNK_SIZE):
+        chunk = order_ids[start:start + LOOKUP_CHUNK_SIZE]
+        for order in Order.query.filter(Order.id.in_(chunk), Order.status == 'pending'):
+            order.status = 'in_progress'
+    db.session.flush()
+
+def _inserted_changes(connection, table, rows):
+    """Insert rows and return their insert changes, ids included"""
+    # The transaction holds the write lock, so the new rows are the ones above the current maximum id
+    last_id = connection.execute(select(func.coalesce(func.max(table.c.id), 0))).scalar()
+    connection.execute(table.insert(), rows)
+    ids = connection.execute(select(table.c.id).where(table.c.id > last_id).order_by(table.c.id)).scalars().all()
+    if len(ids) != len(rows):
+        raise RuntimeError(f"Expected {len(rows)} new work log ids, found {len(ids)}")
+    return [ModelChange('work_logs', 'insert', None, dict(values, id=work_log_id), set(values) | {'id'})
+            for values, work_log_id in zip(rows, ids)]
+
+def import_work_logs(binary_stream, file_format='csv', dry_run=False):
+    """
+    Import work logs from a CSV/JSON byte stream in one transaction.
+    Valid records are imported even if others fail; dry_run rolls everything
+    back but still reports errors and the overages the import would cause.
+    """
+    started = time.perf_counter()
+    report = ImportReport(dry_run)
+    lookups = ImportLookups()
+    table = WorkLog.__table__
+    connection = db.session.connection()
+    now = datetime.utcnow()
+    batch = []
+    # Commit handlers only invalidate caches by employee/day and order, so
+    # an import bigger than one batch hands them one row of each instead of
+    # every row; an import that fits in one batch hands them all of its rows
+    first_batch = []
+    sample = {}
+    pairs = set()
+
+    def flush_batch():
+        if not batch:
+            return
+        changes = _inserted_changes(connection, table, batch)
+        # Totals, rollups, payroll and overages for this batch, inside the import's transaction
+        publish_changes(db.session, changes, notify_commit=False)
+        if not report.imported:
+            first_batch.extend(changes)
+        report.imported += len(batch)
+        batch.clear()
+
+    try:
+        for line, record in iter_records(binary_stream, file_format):
+            report.rows_read += 1
+            values, error = validate_record(record, lookups)
+            if error:
+                report.add_error(line, error)
+                continue
+            values['created_at'] = now
+            batch.append(values)
+            sample.setdefault((values['employee_id'], values['date']), values)
+            sample.setdefault(values['order_id'], values)
+            pairs.add((values['order_id'], values['process_id']))
+            if len(batch) >= INSERT_BATCH_SIZE:
+                flush_batch()
+        flush_batch()
+
+        if report.imported > len(first_batch):
+            queue_commit_changes(db.session, [
+                ModelChange('work_logs', 'insert', None, dict(values, id=None), set(values) | {'id'})
+                for values in {id(values): values for values in sample.values()}.values()
+            ])
+        else:
+            queue_commit_changes(db.session, first_batch)
+        _start_orders({order_id for order_id, _ in pairs})
+        report.overages = _pending_overages(pairs)
+
+        if dry_run:
+            db.session.rollback()
+        else:
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        report.duration = time.perf_counter() - started
+    return report
@@ -0,0 +1,218 @@
+"""
+Streaming XLSX writer
+Writes a workbook row by row into a zip stream and hands back the bytes as
+they are produced, so a sheet of millions of rows is never held in memory.
+Only what exports need is supported: strings, numbers, dates and booleans
+in plain sheets, with a new sheet started when one is full. No third-party
+package is needed (the workbook parts are small XML documents).
+"""
+
+import re
+import zipfile
+from datetime import date, datetime
+
+# Excel's row limit per sheet, including the header row
+MAX_SHEET_ROWS = 1048576
+
+# Bytes collected before they are handed to the caller
+CHUNK_SIZE = 64 * 1024
+
+# Rows encoded and compressed together
+WRITE_ROWS = 500
+
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+_EXCEL_EPOCH_DATE = _EXCEL_EPOCH.date()
+
+# Characters XML 1.0 does not allow
+_ILLEGAL_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+# Style ids from styles.xml: 0 default, 1 date, 2 date and time, 3 bold header
+_DATE_STYLE = 1
+_DATETIME_STYLE = 2
+_HEADER_STYLE = 3
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '{sheets}</Types>'
+)
+
+_SHEET_CONTENT_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{n}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/></Relationships>'
+)
+
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets>{sheets}</sheets></workbook>'
+)
+
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '{sheets}'
+    '<Relationship Id="rIdStyles" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/></Relationships>'
+)
+
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd hh:mm:ss"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="4">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '</cellXfs></styleSheet>'
+)
+
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" state="frozen"/>'
+    '</sheetView></sheetViews><sheetData>'
+)
+
+_SHEET_END = '</sheetData></worksheet>'
+
+class _Sink:
+    """Write-only file object that collects what zipfile writes"""
+
+    def __init__(self):
+        self._parts = []
+        self.size = 0
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        self.size = 0
+        return data
+
+def _text(value):
+    if _ILLEGAL_XML.search(value):
+        value = _ILLEGAL_XML.sub('', value)
+    return value.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+def _number_cell(value):
+    return f'<c><v>{value!r}</v></c>'
+
+def _bool_cell(value):
+    return f'<c t="b"><v>{int(value)}</v></c>'
+
+def _datetime_cell(value):
+    serial = (value - _EXCEL_EPOCH).total_seconds() / 86400
+    return f'<c s="{_DATETIME_STYLE}"><v>{serial!r}</v></c>'
+
+def _date_cell(value):
+    return f'<c s="{_DATE_STYLE}"><v>{(value - _EXCEL_EPOCH_DATE).days}</v></c>'
+
+def _text_cell(value):
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{_text(str(value))}</t></is></c>'
+
+# Cell writer per value type; other types are written as text
+_CELL_WRITERS = {
+    int: _number_cell,
+    float: _number_cell,
+    bool: _bool_cell,
+    datetime: _datetime_cell,
+    date: _date_cell,
+    str: _text_cell,
+}
+
+def _row(values):
+    cells = []
+    for value in values:
+        if value is None:
+            cells.append('<c/>')
+        else:
+            cells.append(_CELL_WRITERS.get(type(value), _text_cell)(value))
+    return '<row>' + ''.join(cells) + '</row>'
+
+def _header_row(values):
+    return '<row>' + ''.join(
+        f'<c t="inlineStr" s="{_HEADER_STYLE}"><is><t xml:space="preserve">{_text(str(value))}</t></is></c>'
+        for value in values
+    ) + '</row>'
+
+def iter_xlsx(header, rows, sheet_name='Sheet'):
+    """Yield the bytes of an XLSX workbook with header and rows, as they are produced"""
+    sink = _Sink()
+    workbook = zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED)
+    header_xml = _header_row(header).encode('utf-8')
+    sheets = 0
+    sheet = None
+    sheet_rows = MAX_SHEET_ROWS
+    pending = []
+    for values in rows:
+        if sheet_rows >= MAX_SHEET_ROWS:
+            if sheet is not None:
+                pending.append(_SHEET_END)
+                sheet.write(''.join(pending).encode('utf-8'))
+                pending = []
+                sheet.close()
+            sheets += 1
+            sheet = workbook.open(f'xl/worksheets/sheet{sheets}.xml', 'w', force_zip64=True)
+            sheet.write(_SHEET_START.encode('utf-8') + header_xml)
+            sheet_rows = 1
+        pending.append(_row(values))
+        sheet_rows += 1
+        if len(pending) >= WRITE_ROWS:
+            sheet.write(''.join(pending).encode('utf-8'))
+            pending = []
+            if sink.size >= CHUNK_SIZE:
+                yield sink.drain()
+    if sheet is None:
+        sheets = 1
+        sheet = workbook.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True)
+        sheet.write(_SHEET_START.encode('utf-8') + header_xml)
+    pending.append(_SHEET_END)
+    sheet.write(''.join(pending).encode('utf-8'))
+    sheet.close()
+
+    # The workbook parts list the sheets, so they are written last
+    numbers = range(1, sheets + 1)
+    names = [sheet_name if sheets == 1 else f'{sheet_name} {n}' for n in numbers]
+    workbook.writestr('[Content_Types].xml', _CONTENT_TYPES.format(
+        sheets=''.join(_SHEET_CONTENT_TYPE.format(n=n) for n in numbers)))
+    workbook.writestr('_rels/.rels', _ROOT_RELS)
+    workbook.writestr('xl/workbook.xml', _WORKBOOK.format(sheets=''.join(
+        f'<sheet name="{_text(name)}" sheetId="{n}" r:id="rId{n}"/>' for n, name in zip(numbers, names))))
+    workbook.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS.format(sheets=''.join(
+        f'<Relationship Id="rId{n}" '
+        f'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        f'Target="worksheets/sheet{n}.xml"/>' for n in numbers)))
+    workbook.writestr('xl/styles.xml', _STYLES)
+    workbook.close()
+    yield sink.drain()